@@ -0,0 +1,140 @@
+"""
+In-process caches: serialized API responses, and indexes derived from the
+story table.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.compression import CompressedPayload
+from app.config import settings
+
+
+class ResponseCache:
+    """
+    LRU cache of CompressedPayload objects with a per-entry TTL.
+
+    Payloads are stored together with their compressed variants, so a hit
+    serves bytes straight from memory without re-serializing or recompressing.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple[float, CompressedPayload]]" = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        # Background ingestion warms the cache from a worker thread
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CompressedPayload]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: Hashable, payload: CompressedPayload) -> CompressedPayload:
+        if self.ttl <= 0:
+            return payload
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache(
+    ttl=settings.RESPONSE_CACHE_TTL,
+    max_entries=settings.RESPONSE_CACHE_SIZE,
+)
+
+
+class SourceCache:
+    """
+    A value derived from the whole story table (e.g. an index), recomputed
+    when its source changes (a remapped snapshot), after `max_age` seconds,
+    or after invalidate(). Building runs under the lock, so concurrent
+    requests wait for one build instead of each running their own; peek()
+    never waits and builds in a background thread instead.
+    """
+
+    def __init__(self):
+        # (source, value, built at), replaced as a whole so peek() can read it unlocked
+        self._entry: tuple[Optional[Hashable], Any, float] = (None, None, 0.0)
+        self._lock = threading.Lock()
+        # Guards only _building, so peek() never waits for a build under _lock
+        self._building_lock = threading.Lock()
+        self._building = False
+
+    def get(
+        self, source: Hashable, load: Callable[[], Any], max_age: float = math.inf
+    ) -> Any:
+        with self._lock:
+            built_for, value, built_at = self._entry
+            if source != built_for or time.monotonic() - built_at > max_age:
+                value = load()
+                self._entry = (source, value, time.monotonic())
+            return value
+
+    def peek(
+        self, source: Hashable, load: Callable[[], Any], max_age: float = math.inf
+    ) -> Any:
+        """
+        The value for `source` without waiting, or None until it has been
+        built. A missing or expired value is (re)built in a background
+        thread; an expired one is still returned meanwhile.
+        """
+        built_for, value, built_at = self._entry
+        if source != built_for or time.monotonic() - built_at > max_age:
+            self._build_in_background(source, load, max_age)
+        return value if source == built_for else None
+
+    def _build_in_background(
+        self, source: Hashable, load: Callable[[], Any], max_age: float
+    ) -> None:
+        with self._building_lock:
+            if self._building:
+                return
+            self._building = True
+
+        def build():
+            try:
+                self.get(source, load, max_age)
+            except Exception as e:
+                print(f"Background index build failed: {e}")
+            finally:
+                self._building = False
+
+        threading.Thread(target=build, name="source-cache-build", daemon=True).start()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entry = (None, None, 0.0)
+
+
+# Rows hidden by ?dedupe=true (see dedupe.py), per snapshot or for the Supabase table
+duplicate_rows_cache = SourceCache()
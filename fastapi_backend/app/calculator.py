@@ -0,0 +1,88 @@
+"""
+Bounded arithmetic evaluator for the calculate tool.
+
+Expressions are parsed with `ast` and only numbers, + - * / // % ** and
+parentheses are evaluated, so nothing but arithmetic can run. The cost is
+bounded before any work is done: the expression length and node count are
+capped, and every integer operation checks the size of its result first,
+so "9**9**9" is rejected at once rather than pinning a CPU (big-integer
+arithmetic runs in one C call that holds the GIL).
+"""
+
+import ast
+import operator
+from typing import Union
+
+MAX_EXPRESSION_LENGTH = 200
+MAX_NODES = 64
+# Largest integer any step may produce (about 1200 decimal digits)
+MAX_INT_BITS = 4096
+
+Number = Union[int, float]
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class CalculationError(ValueError):
+    """The expression is not plain arithmetic, too costly, or has no value."""
+
+
+def _check_size(op: type, left: Number, right: Number) -> None:
+    """Refuse integer operations whose result would exceed MAX_INT_BITS."""
+    if not (isinstance(left, int) and isinstance(right, int)):
+        return
+    if op is ast.Mult and left.bit_length() + right.bit_length() > MAX_INT_BITS:
+        raise CalculationError("Result too large")
+    if op is ast.Pow and right > 0 and abs(left) > 1:
+        # bit_length(left ** right) <= right * bit_length(left)
+        if right > MAX_INT_BITS or right * left.bit_length() > MAX_INT_BITS:
+            raise CalculationError("Result too large")
+
+
+def _evaluate(node: ast.AST) -> Number:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        return _UNARY[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        _check_size(type(node.op), left, right)
+        result = _BINARY[type(node.op)](left, right)
+        # e.g. (-8) ** 0.5
+        if isinstance(result, complex):
+            raise CalculationError("Result is not a real number")
+        return result
+    raise CalculationError("Only basic mathematical operations are allowed "
+                           "(+, -, *, /, //, %, **, parentheses)")
+
+
+def evaluate(expression: str) -> Number:
+    """Value of an arithmetic expression; raises CalculationError."""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculationError(
+            f"Expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        raise CalculationError("Not a valid expression") from None
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise CalculationError("Expression too long")
+    try:
+        result = _evaluate(tree.body)
+    except ZeroDivisionError:
+        raise CalculationError("Division by zero") from None
+    except OverflowError:
+        raise CalculationError("Result too large") from None
+    return result
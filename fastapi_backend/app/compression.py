@@ -0,0 +1,126 @@
+"""Response compression with Accept-Encoding negotiation and precompressed payloads."""
+
+import gzip
+from typing import Optional
+
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings() -> list[str]:
+    """Encodings this server can produce, in order of preference."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def parse_qvalues(header: str) -> dict[str, float]:
+    """Parse an Accept or Accept-Encoding header into a {token: q} mapping."""
+    accepted: dict[str, float] = {}
+    for part in header.split(","):
+        token, *params = part.split(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def negotiate_encoding(
+    accept_encoding: Optional[str], size: int, min_size: int
+) -> Optional[str]:
+    """
+    Pick the content coding for a body of `size` bytes.
+
+    Returns None (identity) for bodies below `min_size`, where the headers and
+    CPU cost outweigh the bytes saved, or when the client accepts nothing we produce.
+    """
+    if not accept_encoding or size < min_size:
+        return None
+
+    accepted = parse_qvalues(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+
+    best, best_q = None, 0.0
+    for coding in available_encodings():
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress `body` with the given content coding."""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class CompressedPayload:
+    """
+    A serialized response body plus its compressed variants.
+
+    Each variant is produced at most once, so a payload held in a cache is
+    never recompressed on the hot path.
+    """
+
+    __slots__ = ("body", "media_type", "headers", "_variants")
+
+    def __init__(
+        self,
+        body: bytes,
+        media_type: str = "application/json",
+        headers: Optional[dict[str, str]] = None,
+    ):
+        self.body = body
+        self.media_type = media_type
+        self.headers = headers or {}
+        self._variants: dict[str, bytes] = {}
+
+    def variant(self, encoding: Optional[str]) -> bytes:
+        """Return the body encoded with `encoding`, compressing on first use only."""
+        if encoding is None:
+            return self.body
+        data = self._variants.get(encoding)
+        if data is None:
+            data = compress(self.body, encoding)
+            self._variants[encoding] = data
+        return data
+
+    def precompress(self, min_size: int) -> "CompressedPayload":
+        """Eagerly build every variant worth serving, e.g. before caching."""
+        if len(self.body) >= min_size:
+            for encoding in available_encodings():
+                self.variant(encoding)
+        return self
+
+    def to_response(
+        self, accept_encoding: Optional[str], min_size: int, status_code: int = 200
+    ) -> Response:
+        """Build a Response with the best encoding the client accepts."""
+        encoding = negotiate_encoding(accept_encoding, len(self.body), min_size)
+        headers = {"Vary": "Accept-Encoding", **self.headers}
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(
+            content=self.variant(encoding),
+            status_code=status_code,
+            media_type=self.media_type,
+            headers=headers,
+        )
@@ -20,6 +20,64 @@ class Settings(BaseSettings):
     # Frontend
     FRONTEND_URL: str = "http://localhost:3000"
 
+    # Response compression - bodies smaller than this are sent uncompressed
+    COMPRESSION_MIN_SIZE: int = 1024
+
+    # Response cache - serialized (and precompressed) story responses
+    # Set RESPONSE_CACHE_TTL to 0 to disable caching
+    RESPONSE_CACHE_TTL: int = 60
+    RESPONSE_CACHE_SIZE: int = 256
+
+    # Background ingestion - runs incremental fetch/store cycles in-process.
+    # Only one worker per host ingests (guarded by INGEST_LOCK_FILE).
+    INGEST_ENABLED: bool = False
+    INGEST_INTERVAL_SECONDS: int = 3600
+    INGEST_JITTER_SECONDS: int = 300
+    INGEST_BATCH_LIMIT: int = 50
+    INGEST_LOCK_FILE: str = "/tmp/planet-story-ingest.lock"
+
+    # Warm-up - gallery pages and hot stories loaded into the response cache
+    # at startup (before /ready turns true) and after each ingestion cycle
+    WARMUP_PAGES: int = 3
+    WARMUP_PAGE_SIZE: int = 12
+    WARMUP_HOT_STORIES: int = 12
+
+    # Shared story snapshot - a memory-mapped copy of the story table that all
+    # workers on a host read from. Written by the ingesting worker; leave
+    # empty to always query Supabase.
+    SNAPSHOT_PATH: str = ""
+    SNAPSHOT_CHECK_INTERVAL: float = 1.0
+
+    # Near-duplicate filtering (?dedupe=true). Duplicates are recomputed for
+    # every new snapshot; without a snapshot the whole table is read from
+    # Supabase and reused for this many seconds
+    DEDUPE_MAX_AGE: int = 900
+
+    # Related stories (/api/v1/stories/{story_id}/related) - neighbours kept
+    # per story. They are stored in the snapshot; without one the index is
+    # built from Supabase and reused for RELATED_MAX_AGE seconds
+    RELATED_K: int = 8
+    RELATED_MAX_AGE: int = 900
+
+    # MCP story tools - results per call, ids per batch fetch, and how long
+    # the search index built from Supabase (no snapshot) is reused
+    MCP_MAX_RESULTS: int = 50
+    MCP_MAX_BATCH: int = 100
+    SEARCH_MAX_AGE: int = 900
+
+    # Chatbot catalogue answers - time allowed for ranking, and stories listed
+    CHAT_RETRIEVAL_BUDGET_MS: int = 250
+    CHAT_MAX_STORIES: int = 5
+
+    # Tool execution (chatbot and MCP) - worker threads, calls running or
+    # queued before new ones are turned away, and the default timeout
+    TOOL_WORKERS: int = 4
+    TOOL_MAX_PENDING: int = 32
+    TOOL_TIMEOUT_SECONDS: float = 10.0
+
+    # Extra chat intent phrases, JSON {"intent": {"phrase": score}} (see app/intents.py)
+    CHAT_INTENTS_FILE: str = ""
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,241 @@
+"""
+Near-duplicate story detection for `?dedupe=true` listings.
+
+Re-posts of a story (same title pattern, same place, close in time) are
+found with MinHash signatures and locality-sensitive hashing, so indexing
+scales with the number of candidate pairs rather than stories squared:
+
+- titles (and descriptions, when present) are normalized (case, punctuation,
+  digit runs -> "#") into word and word-pair shingles;
+- one-permutation MinHash hashes every shingle once into BANDS * ROWS bins,
+  and empty bins are filled from other bins (densification);
+- stories sharing any band of their signature become candidates, and only
+  candidates are compared on estimated text similarity, great-circle
+  distance and time apart;
+- matches are merged into clusters and the newest story of each is kept.
+
+story-analysis/viewer-server/dedupe.py keeps a copy of this algorithm (the
+viewer-server doesn't depend on the backend), so the backend and the offline
+analysis agree on what a duplicate is: change both together. The signature
+test pins the hashes both copies must produce. It depends on nothing in the
+app but units.py.
+"""
+
+import math
+import operator
+import random
+import re
+import zlib
+from typing import Any, Hashable, Iterable, Optional
+
+from app.units import EARTH_RADIUS_KM, haversine_km, to_seconds
+
+BANDS = 16
+ROWS = 4
+BINS = BANDS * ROWS
+# Estimated shingle Jaccard similarity for two stories to be duplicates
+TEXT_THRESHOLD = 0.7
+MAX_DISTANCE_KM = 25.0
+MAX_DAYS = 60
+# Words of a description that go into its signature
+MAX_WORDS = 100
+# A new story is compared with at most this many recent stories per bucket,
+# so a very common title ("Untitled") can't make indexing quadratic
+MAX_BUCKET_CHECKS = 16
+
+_BIN_SHIFT = 32 - (BINS.bit_length() - 1)
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_EMPTY = 1 << _BIN_SHIFT
+# Fixed pseudo-random order in which an empty bin borrows from the others
+_random = random.Random(1)
+_PROBES = [
+    _random.sample([j for j in range(BINS) if j != i], BINS - 1) for i in range(BINS)
+]
+
+_SPLIT = re.compile(r"[^\w#]+")
+_DIGITS = re.compile(r"\d+")
+
+Signature = tuple[int, ...]
+
+
+def words(text: Optional[str]) -> list[str]:
+    text = _DIGITS.sub("#", (text or "").lower())
+    return [w for w in _SPLIT.split(text) if w]
+
+
+def shingle_hashes(title: Optional[str], description: Optional[str] = None) -> set[int]:
+    """32-bit hashes of the word and word-pair shingles of a story's text."""
+    hashes: set[int] = set()
+    for tokens in (words(title), words(description)[:MAX_WORDS]):
+        # crc32 rather than hash(): signatures must agree across processes
+        word_hashes = [zlib.crc32(token.encode()) for token in tokens]
+        hashes.update(word_hashes)
+        for a, b in zip(word_hashes, word_hashes[1:]):
+            hashes.add(((a * 0x9E3779B1) ^ b) * 0x85EBCA6B & 0xFFFFFFFF)
+    return hashes
+
+
+def signature(
+    title: Optional[str], description: Optional[str] = None
+) -> Optional[Signature]:
+    """MinHash signature of a story's text, or None if it has no text."""
+    hashes = shingle_hashes(title, description)
+    if not hashes:
+        return None
+    bins = [_EMPTY] * BINS
+    for h in hashes:
+        b, value = h >> _BIN_SHIFT, h & _VALUE_MASK
+        if value < bins[b]:
+            bins[b] = value
+    filled = bins[:]
+    for i in range(BINS):
+        if filled[i] == _EMPTY:
+            for j in _PROBES[i]:
+                if filled[j] != _EMPTY:
+                    bins[i] = filled[j]
+                    break
+    return tuple(bins)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(map(operator.eq, a, b)) / BINS
+
+
+class DedupeIndex:
+    """
+    Incremental LSH index merging near-duplicate stories into clusters.
+
+    Stories should be added oldest first, so the per-bucket cap keeps the
+    stories closest in time.
+    """
+
+    def __init__(
+        self,
+        threshold: float = TEXT_THRESHOLD,
+        max_km: float = MAX_DISTANCE_KM,
+        max_days: float = MAX_DAYS,
+    ):
+        self.threshold = threshold
+        self.max_km = max_km
+        self.max_seconds = max_days * 86400
+        self._max_lat_deg = math.degrees(max_km / EARTH_RADIUS_KM)
+        self._stories: dict[Hashable, tuple] = {}
+        self._buckets: dict[tuple, list[Hashable]] = {}
+        self._parent: dict[Hashable, Hashable] = {}
+        # Cluster root -> (created, key) of the story it keeps
+        self._keep: dict[Hashable, tuple[float, Hashable]] = {}
+        # Candidate pairs compared so far
+        self.compared = 0
+
+    def __len__(self) -> int:
+        return len(self._stories)
+
+    def _find(self, key: Hashable) -> Hashable:
+        parent = self._parent
+        root = key
+        while parent[root] != root:
+            root = parent[root]
+        while parent[key] != root:
+            parent[key], key = root, parent[key]
+        return root
+
+    def _union(self, a: Hashable, b: Hashable) -> None:
+        a, b = self._find(a), self._find(b)
+        if a != b:
+            self._parent[b] = a
+            self._keep[a] = max(self._keep[a], self._keep.pop(b))
+
+    def _matches(self, a: tuple, b: tuple) -> bool:
+        sig_a, lon_a, lat_a, t_a = a
+        sig_b, lon_b, lat_b, t_b = b
+        if (lon_a is None) != (lon_b is None):
+            return False
+        if t_a is not None and t_b is not None and abs(t_a - t_b) > self.max_seconds:
+            return False
+        if lon_a is not None and (
+            abs(lat_a - lat_b) > self._max_lat_deg
+            or haversine_km(lon_a, lat_a, lon_b, lat_b) > self.max_km
+        ):
+            return False
+        return similarity(sig_a, sig_b) >= self.threshold
+
+    def add(
+        self,
+        key: Hashable,
+        sig: Optional[Signature],
+        lon: Optional[float] = None,
+        lat: Optional[float] = None,
+        created: Optional[float] = None,
+    ) -> None:
+        """
+        Index a story and merge it with the stories it duplicates; known keys
+        are ignored.
+        """
+        if key in self._stories:
+            return
+        if lon is None or lat is None or math.isnan(lon) or math.isnan(lat):
+            lon = lat = None
+        entry = (sig, lon, lat, created)
+        self._stories[key] = entry
+        self._parent[key] = key
+        self._keep[key] = (created if created is not None else float("-inf"), key)
+        if sig is None:
+            return
+
+        candidates: set[Hashable] = set()
+        for band in range(BANDS):
+            band_key = (band, sig[band * ROWS : (band + 1) * ROWS])
+            bucket = self._buckets.setdefault(band_key, [])
+            candidates.update(bucket[-MAX_BUCKET_CHECKS:])
+            bucket.append(key)
+
+        root = key
+        for other in candidates:
+            if self._find(other) == root:
+                continue
+            self.compared += 1
+            if self._matches(entry, self._stories[other]):
+                self._union(other, key)
+                root = self._find(key)
+
+    def representative(self, key: Hashable) -> Hashable:
+        """Key of the story kept for key's cluster (key itself if it is unique)."""
+        return self._keep[self._find(key)][1]
+
+    def duplicates(self) -> dict[Hashable, Hashable]:
+        """{key: key of the story kept instead} for every story that is a duplicate."""
+        result = {}
+        for key in self._stories:
+            keep = self._keep[self._find(key)][1]
+            if keep != key:
+                result[key] = keep
+        return result
+
+    def clusters(self) -> list[list[Hashable]]:
+        """Keys of every cluster with duplicates, the kept story first."""
+        groups: dict[Hashable, list[Hashable]] = {}
+        for key in self._stories:
+            groups.setdefault(self._find(key), []).append(key)
+        result = []
+        for root, keys in groups.items():
+            if len(keys) > 1:
+                keep = self._keep[root][1]
+                result.append([keep] + sorted(k for k in keys if k != keep))
+        return result
+
+
+def duplicate_rows(stories: Iterable[dict[str, Any]]) -> frozenset[int]:
+    """Positions of the duplicates among StoryRead-shaped dicts listed newest first."""
+    stories = list(stories)
+    index = DedupeIndex()
+    for row in reversed(range(len(stories))):
+        story = stories[row]
+        index.add(
+            row,
+            signature(story.get("title"), story.get("description")),
+            story.get("center_long"),
+            story.get("center_lat"),
+            to_seconds(story.get("created_at")),
+        )
+    return frozenset(index.duplicates())
@@ -3,6 +3,8 @@ import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+from app.units import to_seconds
+
 load_dotenv()
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
@@ -26,9 +28,96 @@ def fetch_stories(limit=10):
 
         return None
 
+def fetch_stories_since(watermark=None, limit=50, max_pages=20, before=None):
+    """
+    Fetch stories created after `watermark` (an ISO timestamp), newest first.
+
+    Pages backwards through the API with the `before` cursor, starting at
+    `before` if given, and stops at the first story that is not newer than the
+    watermark. With no watermark only the first page is fetched.
+
+    Returns (stories, cursor): cursor is None once the scan has reached the
+    watermark (or the end of the API), otherwise it is the `before` to resume
+    from because max_pages ran out first. Returns None if the API could not be
+    reached.
+    """
+    stories = []
+    cursor = before
+    # Compared as instants: Supabase returns "...+00:00" where the API has "...Z"
+    since = to_seconds(watermark)
+
+    for _ in range(max_pages):
+        params = {'limit': limit}
+        if cursor:
+            params['before'] = cursor
+        try:
+            response = requests.get(API_URL, params=params, timeout=30)
+            response.raise_for_status()
+            body = response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching data from API: {e}")
+            return None
+
+        page = body.get('data', [])
+        for story in page:
+            created = to_seconds(story.get('created'))
+            if since is not None and (created is None or created <= since):
+                return stories, None
+            stories.append(story)
+
+        if since is None or not body.get('more') or not page:
+            return stories, None
+        cursor = page[-1].get('id')
+
+    return stories, cursor
+
+
+def fetch_all_rows(page_size=1000):
+    """Read every row of the stories table from Supabase, newest first."""
+    rows = []
+    offset = 0
+    while True:
+        response = (
+            supabase.table(TABLE_NAME)
+            .select("*")
+            .order("created", desc=True)
+            .range(offset, offset + page_size - 1)
+            .execute()
+        )
+        batch = response.data or []
+        rows.extend(batch)
+        if len(batch) < page_size:
+            return rows
+        offset += page_size
+
+
+def fetch_rows_since(created, page_size=1000):
+    """
+    Read the rows of the stories table created at or after `created`, newest
+    first.
+    """
+    rows = []
+    offset = 0
+    while True:
+        response = (
+            supabase.table(TABLE_NAME)
+            .select("*")
+            .gte("created", created)
+            .order("created", desc=True)
+            .range(offset, offset + page_size - 1)
+            .execute()
+        )
+        batch = response.data or []
+        rows.extend(batch)
+        if len(batch) < page_size:
+            return rows
+        offset += page_size
+
+
 def store_stories(stories):
+    """Upsert stories into Supabase. Returns the number of stories stored."""
     if not stories:
-        return
+        return 0
     
     stories_insert = []
 
@@ -62,9 +151,11 @@ def store_stories(stories):
     try:
         data, count = supabase.table(TABLE_NAME).upsert(stories_insert).execute()
         print(f"Successfully stored {len(stories)} stories in the database.")
+        return len(stories_insert)
     
     except Exception as e: 
         print(f"Error storing data in database: {e}")
+        return 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+"""
+Compiled intent router for the chatbot.
+
+Intents are data: each has trigger phrases with scores (INTENTS, plus an
+optional JSON file, see load_intents). All phrases are compiled into one
+regex, a trie of their characters wrapped in word boundaries, so a message
+is scanned once and each position branches on its next character instead
+of trying every phrase. Routing cost therefore depends on the message, not
+on how many intents or phrases there are.
+
+Each match adds its phrase's score to its intent; the highest total wins,
+and ties go to the intent listed first. Arithmetic is recognized by shape
+(a number, an operator, a number) rather than by any "-" or "/" in the
+message. Dates are skipped, and year ranges or day/months count only when
+the message asks for a calculation, so "stories from 2020-2021" and
+"video of 9/11" are not calculations but "what is 1990-1985" is.
+"""
+
+import json
+import re
+from typing import Optional
+
+from app.config import settings
+from app.retrieval import CATEGORY_WORDS, INTENT_WORDS, PLACES
+
+# Intent of messages that match no phrase
+DEFAULT_INTENT = "default"
+
+# intent -> {phrase: score}. Earlier intents win ties.
+INTENTS: dict[str, dict[str, float]] = {
+    "search_stories": {
+        **{word: 2 for word in INTENT_WORDS},
+        **{word: 2 for word in CATEGORY_WORDS},
+        **{place: 3 for place in PLACES},
+        "show me": 1, "find": 1, "search": 1,
+    },
+    "calculate": {"calculate": 3, "compute": 3},
+    "get_current_time": {"time": 2, "clock": 2, "what time": 3},
+    "get_app_info": {
+        "app info": 3, "about": 1, "features": 2, "what is this": 3, "about the app": 3,
+    },
+    "search_help": {"help": 2, "how to": 2, "how do i": 2},
+    "greeting": {"hello": 1, "hi": 1, "hey": 1},
+    "thanks": {"thanks": 2, "thank you": 2},
+}
+
+# Arithmetic by shape: a number, an operator, then a number or "("
+ARITHMETIC_SCORE = 3.0
+_ARITHMETIC = r"(?:\d|\))\s*(?:\*\*|//|[-+*/%])\s*[-+]?\s*[\d.(]"
+# Full dates look like arithmetic but never are
+_DATE = r"\b\d{4}-\d{1,2}-\d{1,2}\b|\b\d{1,2}/\d{1,2}/\d{2,4}\b"
+# Year ranges, year-months and day/months ("2020-2021", "2019/2020", "9/11")
+# are only arithmetic when asked for, see IntentRouter.scores
+_AMBIGUOUS = r"\b\d{4}\s*[-/]\s*\d{1,4}\b|\b\d{1,2}/\d{1,2}\b"
+_EXPRESSION = re.compile(r"[\d\s.+\-*/%()=?]+")
+# Phrases asking for a calculation, besides the calculate intent's own
+CALCULATION_CUES = ("what is", "what's", "how much is")
+
+
+def _trie_pattern(phrases: list[str]) -> str:
+    """One regex alternation for many literal phrases, factored by common prefixes."""
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        ends = "" in node
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            # Prefer the longer phrase: regex alternation is ordered, so try
+            # the branches first
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+def _normalize(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+class IntentRouter:
+    def __init__(self, intents: dict[str, dict[str, float]]):
+        self.intents = list(intents)
+        # phrase -> [(intent, score)]; a phrase may count towards several intents
+        self._phrases: dict[str, list[tuple[str, float]]] = {}
+        for intent, phrases in intents.items():
+            for phrase, score in phrases.items():
+                self._phrases.setdefault(_normalize(phrase), []).append((intent, score))
+        cues = (*CALCULATION_CUES, *intents.get("calculate", ()))
+        self._cues = {_normalize(phrase) for phrase in cues}
+        for cue in self._cues:
+            self._phrases.setdefault(cue, [])
+        # Spaces in phrases match any run of whitespace
+        trie = _trie_pattern(sorted(self._phrases)).replace(r"\ ", r"\s+")
+        self._pattern = re.compile(
+            rf"(?P<date>{_DATE})|(?P<ambiguous>{_AMBIGUOUS})|(?P<arithmetic>{_ARITHMETIC})"
+            rf"|\b(?P<phrase>{trie})\b"
+        )
+
+    def scores(self, message: str) -> dict[str, float]:
+        """Total score per intent matched in the message."""
+        message = message.lower()
+        totals: dict[str, float] = {}
+        arithmetic = ambiguous = cue = False
+        for match in self._pattern.finditer(message):
+            kind = match.lastgroup
+            if kind == "arithmetic":
+                arithmetic = True
+            elif kind == "ambiguous":
+                ambiguous = True
+            elif kind == "phrase":
+                phrase = _normalize(match.group("phrase"))
+                cue = cue or phrase in self._cues
+                for intent, score in self._phrases[phrase]:
+                    totals[intent] = totals.get(intent, 0.0) + score
+        if ambiguous and not arithmetic:
+            # "what is 2020-2021" and a bare "12/4" are sums, "stories from
+            # 2020-2021" is not
+            arithmetic = cue or _EXPRESSION.fullmatch(message) is not None
+        if arithmetic:
+            # Counted once: "1+2+3" is one calculation
+            totals["calculate"] = totals.get("calculate", 0.0) + ARITHMETIC_SCORE
+        return totals
+
+    def route(self, message: str) -> tuple[str, dict[str, float]]:
+        """(winning intent or DEFAULT_INTENT, scores per intent)."""
+        totals = self.scores(message)
+        best: Optional[str] = None
+        for intent in self.intents:
+            if intent in totals and (best is None or totals[intent] > totals[best]):
+                best = intent
+        return best or DEFAULT_INTENT, totals
+
+
+def load_intents(path: str = "") -> dict[str, dict[str, float]]:
+    """
+    INTENTS, extended from a JSON file of {"intent": {"phrase": score}}.
+    Phrases of known intents are added (or rescored); new intents go last
+    and are answered like DEFAULT_INTENT until the chat route handles them.
+    """
+    intents = {intent: dict(phrases) for intent, phrases in INTENTS.items()}
+    if path:
+        with open(path) as f:
+            for intent, phrases in json.load(f).items():
+                intents.setdefault(intent, {}).update(phrases)
+    return intents
+
+
+intent_router = IntentRouter(load_intents(settings.CHAT_INTENTS_FILE))
@@ -1,14 +1,41 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.routes import stories as stories_router
 from app.routes import chatbot as chatbot_router
+from app.scheduler import create_scheduler
+from app.tool_executor import tool_executor
+from app.warmup import warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up caches and connections, and start the optional ingestion scheduler."""
+    app.state.ready = False
+    warmup_task = asyncio.create_task(warm_up(app))
+
+    scheduler = None
+    if settings.INGEST_ENABLED:
+        scheduler = create_scheduler()
+        scheduler.start()
+    app.state.scheduler = scheduler
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        if scheduler is not None:
+            await scheduler.stop()
+        tool_executor.shutdown()
 
 
 app = FastAPI(
     title="Planet Story Explorer API",
     description="API for exploring Planet satellite imagery stories with chatbot assistance",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -51,3 +78,17 @@ async def root():
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "planet-story-explorer"}
+
+
+@app.get("/ready", tags=["health"])
+async def readiness_check(response: Response):
+    """
+    Readiness endpoint for load balancers.
+
+    Unlike /health, this returns 503 until the startup warm-up (connections,
+    serializers, first gallery pages) has finished.
+    """
+    if not getattr(app.state, "ready", False):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "warming_up", "service": "planet-story-explorer"}
+    return {"status": "ready", "service": "planet-story-explorer"}
@@ -1,8 +1,18 @@
 """FastMCP server for chatbot functionality."""
 
+import base64
+import json
+import zlib
 from fastmcp import FastMCP
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
+
+from app.calculator import CalculationError, evaluate
+from app.config import settings
+from app.routes.stories import stories_by_id
+from app.search_index import SearchIndex, current_search_index
+from app.tool_executor import tool_executor
+from app.wire import COMPACT_FIELDS
 
 # Initialize FastMCP server
 mcp = FastMCP("Planet Story Explorer Chatbot")
@@ -60,15 +70,135 @@ def calculate_impl(expression: str) -> str:
         expression: A mathematical expression to evaluate (e.g., "2 + 2", "10 * 5")
     """
     try:
-        # Only allow basic math operations for safety
-        allowed_chars = set("0123456789+-*/(). ")
-        if not all(c in allowed_chars for c in expression):
-            return "Error: Only basic mathematical operations are allowed (+, -, *, /, parentheses)"
-
-        result = eval(expression, {"__builtins__": {}}, {})
+        # Parsed and evaluated with bounded cost (see calculator.py), never eval()
+        result = evaluate(expression)
         return f"Result: {result}"
-    except Exception as e:
-        return f"Error calculating expression: {str(e)}"
+    except CalculationError as e:
+        return f"Error: {e}"
+
+
+def _compact(story: dict[str, Any]) -> dict[str, Any]:
+    """A story with only the fields the backend fills in (see wire.COMPACT_FIELDS)."""
+    return {field: story.get(field) for field in COMPACT_FIELDS}
+
+
+def _clamp_limit(limit: int) -> int:
+    return max(1, min(limit, settings.MCP_MAX_RESULTS))
+
+
+def encode_page_token(offset: int, *query: Any) -> str:
+    """Opaque token for the next page, tied to the query that produced it."""
+    fingerprint = zlib.crc32(json.dumps(query).encode())
+    return base64.urlsafe_b64encode(f"{offset}:{fingerprint}".encode()).decode()
+
+
+def decode_page_token(token: Optional[str], *query: Any) -> int:
+    """
+    Offset stored in a page token; raises ValueError if it belongs to another
+    query.
+    """
+    if not token:
+        return 0
+    try:
+        decoded = base64.urlsafe_b64decode(token.encode()).decode()
+        offset, fingerprint = decoded.split(":")
+        offset, fingerprint = int(offset), int(fingerprint)
+    except ValueError:
+        raise ValueError("Invalid page_token") from None
+    if offset < 0 or fingerprint != zlib.crc32(json.dumps(query).encode()):
+        raise ValueError("page_token does not belong to this query")
+    return offset
+
+
+def _page(index: SearchIndex, ranked: list[tuple[int, float]], key: str, limit: int,
+          page_token: Optional[str], *query: Any) -> dict[str, Any]:
+    """
+    One page of (doc, value) results, with the next page's token if there are
+    more.
+    """
+    limit = _clamp_limit(limit)
+    offset = decode_page_token(page_token, *query)
+    page = [(index.ids[doc], value) for doc, value in ranked[offset:offset + limit]]
+    found = stories_by_id([story_id for story_id, _ in page])
+    results = []
+    for story_id, value in page:
+        if story_id in found:
+            story = _compact(found[story_id])
+            story[key] = round(value, 3)
+            results.append(story)
+    more = offset + limit < len(ranked)
+    return {
+        "total": len(ranked),
+        "results": results,
+        "next_page_token": encode_page_token(offset + limit, *query) if more else None,
+    }
+
+
+def search_stories_impl(query: str, category: Optional[str] = None, limit: int = 10,
+                        page_token: Optional[str] = None) -> dict[str, Any]:
+    """
+    Rank stories by relevance of their title, description and author to a
+    free-text query (BM25).
+
+    Args:
+        query: Words to search for, e.g. "glacier melt greenland"
+        category: Optional 'image' or 'video' filter
+        limit: Results per page (at most MCP_MAX_RESULTS)
+        page_token: next_page_token of the previous page
+    """
+    if not query.strip():
+        raise ValueError("query must not be empty")
+    index = current_search_index()
+    ranked, _ = index.search(query, lambda doc: index.matches(doc, category))
+    page = _page(index, ranked, "score", limit, page_token, "search", query, category)
+    return {"query": query, **page}
+
+
+def find_stories_near_impl(longitude: float, latitude: float, radius_km: float = 100.0,
+                           category: Optional[str] = None, limit: int = 10,
+                           page_token: Optional[str] = None) -> dict[str, Any]:
+    """
+    Find the stories centred within radius_km of a point, nearest first.
+
+    Args:
+        longitude: Longitude in degrees (-180 to 180)
+        latitude: Latitude in degrees (-90 to 90)
+        radius_km: Search radius in kilometres (at most 2000)
+        category: Optional 'image' or 'video' filter
+        limit: Results per page (at most MCP_MAX_RESULTS)
+        page_token: next_page_token of the previous page
+    """
+    if not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+        raise ValueError("longitude must be within [-180, 180] "
+                         "and latitude within [-90, 90]")
+    if not 0 < radius_km <= 2000:
+        raise ValueError("radius_km must be within (0, 2000]")
+    index = current_search_index()
+    ranked, _ = index.near(longitude, latitude, radius_km,
+                           lambda doc: index.matches(doc, category))
+    query = ("near", longitude, latitude, radius_km, category)
+    return {
+        "center": [longitude, latitude],
+        "radius_km": radius_km,
+        **_page(index, ranked, "distance_km", limit, page_token, *query),
+    }
+
+
+def get_stories_impl(ids: list[str]) -> dict[str, Any]:
+    """
+    Fetch several stories by id in one call.
+
+    Args:
+        ids: Story ids (at most MCP_MAX_BATCH)
+    """
+    if len(ids) > settings.MCP_MAX_BATCH:
+        raise ValueError(f"At most {settings.MCP_MAX_BATCH} ids per call")
+    ids = list(dict.fromkeys(ids))
+    found = stories_by_id(ids)
+    return {
+        "stories": [_compact(found[story_id]) for story_id in ids if story_id in found],
+        "missing": [story_id for story_id in ids if story_id not in found],
+    }
 
 
 # Now register them with MCP (for MCP protocol usage)
@@ -91,9 +221,46 @@ def search_help(topic: str) -> str:
 
 
 @mcp.tool()
-def calculate(expression: str) -> str:
+async def calculate(expression: str) -> str:
     """Safely calculate a mathematical expression."""
-    return calculate_impl(expression)
+    return await tool_executor.run("calculate", calculate_impl, expression)
+
+
+# Catalogue tools read the index and Supabase, so they run in the tool pool
+# Tool descriptions are what MCP clients see, so they quote the configured limits
+@mcp.tool(description=(
+    "Search stories by their title, description and author (BM25 ranked), "
+    f"best match first, up to {settings.MCP_MAX_RESULTS} per page. Pass "
+    "next_page_token back as page_token for more results. category: 'image' "
+    "or 'video'."
+))
+async def search_stories(query: str, category: Optional[str] = None, limit: int = 10,
+                         page_token: Optional[str] = None) -> dict[str, Any]:
+    return await tool_executor.run(
+        "search_stories", search_stories_impl, query, category, limit, page_token
+    )
+
+
+@mcp.tool()
+async def find_stories_near(longitude: float, latitude: float, radius_km: float = 100.0,
+                            category: Optional[str] = None, limit: int = 10,
+                            page_token: Optional[str] = None) -> dict[str, Any]:
+    """
+    Find stories within radius_km (max 2000) of a longitude/latitude, nearest
+    first. Pass next_page_token back as page_token for more results.
+    """
+    return await tool_executor.run(
+        "find_stories_near", find_stories_near_impl,
+        longitude, latitude, radius_km, category, limit, page_token
+    )
+
+
+@mcp.tool(description=(
+    f"Fetch up to {settings.MCP_MAX_BATCH} stories by id in one call; unknown "
+    'ids are listed under "missing".'
+))
+async def get_stories(ids: list[str]) -> dict[str, Any]:
+    return await tool_executor.run("get_stories", get_stories_impl, ids)
 
 
 @mcp.resource("app://info")
@@ -113,4 +280,8 @@ def get_app_resource() -> str:
 
 
 # Export the implementation functions for direct use
-__all__ = ['mcp', 'get_current_time_impl', 'get_app_info_impl', 'search_help_impl', 'calculate_impl']
+__all__ = [
+    'mcp', 'get_current_time_impl', 'get_app_info_impl', 'search_help_impl',
+    'calculate_impl', 'search_stories_impl', 'find_stories_near_impl',
+    'get_stories_impl',
+]
@@ -0,0 +1,103 @@
+"""
+In-process counters and latency histograms for the chatbot and its tools.
+
+Per label (an intent, a tool) a MetricFamily keeps counts by outcome and a
+fixed-bucket latency histogram, so recording is O(1) and memory does not
+grow with traffic. Percentiles are read from the buckets (the upper bound
+of the bucket they fall in). Numbers are per worker process; served at
+GET /api/v1/chatbot/metrics.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Any, Optional
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Routing a message takes microseconds
+ROUTING_BUCKETS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        # One count per bucket, plus one for values above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Upper bound of the bucket holding the q-quantile (None if empty or
+        above the last bound).
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> dict[str, Any]:
+        labels = [f"le_{bound:g}" for bound in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets_ms": dict(zip(labels, self.counts)),
+        }
+
+
+class MetricFamily:
+    """Outcome counts and a latency histogram per label."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self._outcomes: dict[str, dict[str, int]] = {}
+        self._latency: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, label: str, elapsed_ms: float, outcome: str = "ok") -> None:
+        with self._lock:
+            outcomes = self._outcomes.setdefault(label, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            histogram = self._latency.get(label)
+            if histogram is None:
+                histogram = self._latency[label] = Histogram(self.buckets)
+            histogram.observe(elapsed_ms)
+
+    def snapshot(self) -> dict[str, Any]:
+        """{label: {"count", "outcomes", "latency"}}, busiest label first."""
+        with self._lock:
+            labels = sorted(
+                self._latency, key=lambda label: -self._latency[label].count
+            )
+            return {
+                label: {
+                    "count": self._latency[label].count,
+                    "outcomes": dict(self._outcomes[label]),
+                    "latency": self._latency[label].snapshot(),
+                }
+                for label in labels
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._outcomes.clear()
+            self._latency.clear()
+
+
+# Chat messages by routed intent (whole answer), and tool calls by tool (chat and MCP)
+intent_metrics = MetricFamily()
+tool_metrics = MetricFamily()
+# Time spent choosing the intent of a message, by routed intent
+routing_metrics = MetricFamily(ROUTING_BUCKETS_MS)
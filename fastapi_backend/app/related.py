@@ -0,0 +1,181 @@
+"""
+Precomputed "related stories" neighbour lists.
+
+Every story keeps its top-k neighbours by a combined score of geographic
+proximity, time proximity and title-token similarity, so serving
+/api/v1/stories/{story_id}/related is a lookup rather than a scan.
+
+Candidates come from posting lists kept sorted by creation time: the story's
+grid cell and the cells around it, each of its title tokens, and the
+timeline. Only the WINDOW stories closest in time in each list are scored,
+so adding a story costs the same however big the catalogue is (a common
+token or a crowded cell can't make it quadratic).
+
+The index is incremental: a new story is scored against its candidates and
+also offered to each candidate's list, so indexing the table oldest first
+(or appending newly ingested stories) yields symmetric neighbour lists
+without a rebuild. The ingesting worker keeps one index alive and writes its
+lists into every snapshot (see snapshot.py).
+"""
+
+import math
+import re
+from bisect import bisect_left, insort
+from typing import Any, Iterable, Optional
+
+from app.cache import SourceCache
+from app.units import haversine_km, to_seconds
+
+GEO_SCALE_KM = 250.0
+TIME_SCALE_DAYS = 45.0
+GEO_WEIGHT = 0.45
+TIME_WEIGHT = 0.2
+TITLE_WEIGHT = 0.35
+# Pairs scoring lower are not worth suggesting
+MIN_SCORE = 0.05
+
+CELL_DEG = 2.0
+# Stories scored per posting list: the closest in time on each side
+WINDOW = 6
+
+_TOKEN = re.compile(r"[a-z]{3,}")
+STOPWORDS = frozenset(
+    "the and for from with over into near after before during this that story stories "
+    "image images view views".split()
+)
+
+
+def title_tokens(title: Optional[str]) -> frozenset[str]:
+    words = _TOKEN.findall((title or "").lower())
+    return frozenset(t for t in words if t not in STOPWORDS)
+
+
+class _Posting:
+    """Story ids sorted by creation time."""
+
+    __slots__ = ("times", "ids")
+
+    def __init__(self):
+        self.times: list[float] = []
+        self.ids: list[str] = []
+
+    def add(self, t: float, story_id: str) -> None:
+        i = bisect_left(self.times, t)
+        self.times.insert(i, t)
+        self.ids.insert(i, story_id)
+
+    def around(self, t: float, n: int) -> list[str]:
+        i = bisect_left(self.times, t)
+        return self.ids[max(0, i - n):i + n]
+
+
+class RelatedIndex:
+    """Top-k related stories per story, maintained as stories are added."""
+
+    def __init__(self, k: int = 8):
+        self.k = k
+        # id -> (lon, lat, created seconds, title tokens)
+        self._features: dict[str, tuple] = {}
+        # id -> [(-score, neighbour id)], best first, at most k
+        self._neighbours: dict[str, list[tuple[float, str]]] = {}
+        self._cells: dict[tuple[int, int], _Posting] = {}
+        self._tokens: dict[str, _Posting] = {}
+        self._timeline = _Posting()
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def __contains__(self, story_id: str) -> bool:
+        return story_id in self._features
+
+    @staticmethod
+    def _cell(lon: float, lat: float) -> tuple[int, int]:
+        return int(math.floor(lon / CELL_DEG)), int(math.floor(lat / CELL_DEG))
+
+    @staticmethod
+    def score(a: tuple, b: tuple) -> float:
+        lon_a, lat_a, t_a, tokens_a = a
+        lon_b, lat_b, t_b, tokens_b = b
+        score = 0.0
+        if lon_a is not None and lon_b is not None:
+            km = haversine_km(lon_a, lat_a, lon_b, lat_b)
+            score += GEO_WEIGHT * math.exp(-km / GEO_SCALE_KM)
+        if t_a is not None and t_b is not None:
+            score += TIME_WEIGHT * math.exp(-abs(t_a - t_b) / (TIME_SCALE_DAYS * 86400))
+        if tokens_a and tokens_b:
+            shared = len(tokens_a & tokens_b)
+            if shared:
+                union = len(tokens_a) + len(tokens_b) - shared
+                score += TITLE_WEIGHT * shared / union
+        return score
+
+    def _offer(self, story_id: str, score: float, other: str) -> None:
+        """Put `other` into story_id's neighbour list if it scores in the top k."""
+        neighbours = self._neighbours[story_id]
+        if len(neighbours) == self.k and -score >= neighbours[-1][0]:
+            return
+        insort(neighbours, (-score, other))
+        if len(neighbours) > self.k:
+            neighbours.pop()
+
+    def add(self, story: dict[str, Any]) -> None:
+        """Index a StoryRead-shaped story; ids already indexed are ignored."""
+        story_id = story["id"]
+        if story_id in self._features:
+            return
+        lon, lat = story.get("center_long"), story.get("center_lat")
+        if lon is None or lat is None or math.isnan(lon) or math.isnan(lat):
+            lon = lat = None
+        t = to_seconds(story.get("created_at"))
+        features = (lon, lat, t, title_tokens(story.get("title")))
+        order = t if t is not None else float("-inf")
+
+        postings = [self._timeline]
+        if lon is not None:
+            cx, cy = self._cell(lon, lat)
+            postings.extend(
+                self._cells.get((cx + dx, cy + dy))
+                for dx in (-1, 0, 1)
+                for dy in (-1, 0, 1)
+            )
+        postings.extend(
+            self._tokens.setdefault(token, _Posting()) for token in features[3]
+        )
+
+        candidates: set[str] = set()
+        for posting in postings:
+            if posting is not None:
+                candidates.update(posting.around(order, WINDOW))
+
+        self._features[story_id] = features
+        self._neighbours[story_id] = []
+        for other in candidates:
+            score = self.score(features, self._features[other])
+            if score >= MIN_SCORE:
+                self._offer(story_id, score, other)
+                self._offer(other, score, story_id)
+
+        self._timeline.add(order, story_id)
+        if lon is not None:
+            self._cells.setdefault((cx, cy), _Posting()).add(order, story_id)
+        for token in features[3]:
+            self._tokens[token].add(order, story_id)
+
+    def update(self, stories: Iterable[dict[str, Any]]) -> int:
+        """
+        Index the stories not indexed yet, oldest first. Returns how many were
+        added.
+        """
+        new = [s for s in stories if s["id"] not in self._features]
+        new.sort(key=lambda s: s.get("created_at") or "")
+        for story in new:
+            self.add(story)
+        return len(new)
+
+    def neighbours(self, story_id: str) -> list[tuple[str, float]]:
+        """[(id, score)] of a story's related stories, best first."""
+        return [(other, -score) for score, other in self._neighbours.get(story_id, ())]
+
+
+# Index built per request source when the snapshot has no related lists
+related_index_cache = SourceCache()
@@ -0,0 +1,317 @@
+"""
+Catalogue retrieval for the chatbot.
+
+A question like "show me wildfire stories near California from last month"
+is parsed into structured filters and free-text terms, then answered from
+the in-process search index (app/search_index.py), with no external service:
+
+- date phrases ("last month", "past 2 weeks", "in 2023", "since March 2024")
+  become a creation window;
+- place names from a small gazetteer become a point and a radius;
+- "videos" / "images" become a category filter;
+- what is left, minus filler words, is ranked with BM25.
+
+Text hits near the place get a proximity bonus; questions with only a place
+or only filters are ranked by distance or recency. Scoring runs against a
+deadline (CHAT_RETRIEVAL_BUDGET_MS), so a very broad question answers on time
+from its rarest terms instead of scanning everything.
+"""
+
+import calendar
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from app.config import settings
+from app.routes.stories import stories_by_id
+from app.search_index import current_search_index
+from app.wire import COMPACT_FIELDS
+
+# Share of the retrieval budget a place lookup may use when there are words to score too
+PLACE_BUDGET_SHARE = 0.5
+
+# Gazetteer: name -> (longitude, latitude, radius km covering the region)
+PLACES: dict[str, tuple[float, float, float]] = {
+    "africa": (20.0, 5.0, 4000),
+    "alaska": (-152.0, 64.0, 1000),
+    "amazon": (-62.0, -4.0, 1500),
+    "antarctica": (0.0, -82.0, 2500),
+    "arctic": (0.0, 80.0, 2000),
+    "asia": (95.0, 35.0, 4500),
+    "australia": (134.0, -25.0, 2200),
+    "brazil": (-52.0, -10.0, 2000),
+    "california": (-119.5, 37.2, 600),
+    "canada": (-100.0, 58.0, 2500),
+    "chile": (-71.0, -33.0, 1500),
+    "china": (104.0, 35.0, 2000),
+    "colorado": (-105.5, 39.0, 350),
+    "egypt": (30.0, 26.5, 600),
+    "europe": (15.0, 50.0, 2200),
+    "florida": (-82.0, 28.0, 450),
+    "france": (2.5, 46.5, 550),
+    "germany": (10.5, 51.0, 450),
+    "greenland": (-41.0, 72.0, 1300),
+    "hawaii": (-157.0, 20.5, 400),
+    "himalaya": (84.0, 29.0, 1200),
+    "iceland": (-19.0, 65.0, 300),
+    "india": (79.0, 22.0, 1600),
+    "indonesia": (118.0, -2.0, 2000),
+    "italy": (12.5, 42.5, 600),
+    "japan": (138.0, 36.5, 900),
+    "mexico": (-102.0, 23.5, 1100),
+    "middle east": (45.0, 28.0, 1800),
+    "new york": (-74.0, 40.7, 250),
+    "new zealand": (172.0, -41.5, 800),
+    "north america": (-100.0, 45.0, 4000),
+    "oregon": (-120.5, 44.0, 350),
+    "russia": (95.0, 62.0, 3500),
+    "sahara": (10.0, 23.0, 2000),
+    "siberia": (105.0, 63.0, 2200),
+    "south america": (-60.0, -15.0, 3800),
+    "spain": (-3.7, 40.2, 550),
+    "texas": (-99.0, 31.0, 650),
+    "turkey": (35.0, 39.0, 800),
+    "ukraine": (31.0, 49.0, 650),
+    "united kingdom": (-2.5, 54.0, 550),
+    "uk": (-2.5, 54.0, 550),
+    "united states": (-98.0, 39.0, 2500),
+    "usa": (-98.0, 39.0, 2500),
+    "washington": (-120.5, 47.4, 350),
+}
+
+CATEGORY_WORDS = {
+    "video": "video", "videos": "video", "animation": "video", "animations": "video",
+    "image": "image", "images": "image", "imagery": "image",
+    "picture": "image", "pictures": "image",
+}
+
+# Filler words of catalogue questions, dropped from the ranked terms
+STOPWORDS = frozenset(
+    "a about all an and any are around at by can do does find for from get give "
+    "have i in is look looking me near of on or over please recent show some "
+    "stories story that the there to what which with anything latest new newest"
+    .split()
+)
+
+# Words that make a message a catalogue question even without a place or date
+INTENT_WORDS = frozenset("stories story".split())
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+_PLACE_NAMES = "|".join(re.escape(p) for p in sorted(PLACES, key=len, reverse=True))
+_PLACE = re.compile(r"\b(" + _PLACE_NAMES + r")\b")
+# "this/last month" are calendar periods, "past month" and "last 3 months" count
+# back from now
+_RELATIVE = re.compile(r"\b(?:this|last|previous)\s+(week|month|year)\b")
+_ROLLING = re.compile(
+    r"\b(?:(?:last|past|previous)\s+(\d{1,3})|past)\s+(day|week|month|year)s?\b"
+)
+_DAY = re.compile(r"\b(today|yesterday)\b")
+_MONTH_YEAR = re.compile(
+    r"\b(?:(in|during|from|since|before)\s+)?(" + _MONTH + r")\.?(?:\s+(\d{4}))?\b"
+)
+_YEAR = re.compile(r"\b(?:(in|during|from|since|before)\s+)?((?:19|20)\d{2})\b")
+
+
+def _utc(year: int, month: int = 1, day: int = 1) -> datetime:
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    index = moment.year * 12 + moment.month - 1 + months
+    return _utc(index // 12, index % 12 + 1)
+
+
+def _window(
+    keyword: Optional[str], start: datetime, end: datetime
+) -> tuple[Optional[datetime], Optional[datetime]]:
+    if keyword == "since":
+        return start, None
+    if keyword == "before":
+        return None, start
+    return start, end
+
+
+def parse_dates(
+    text: str, now: datetime
+) -> tuple[Optional[datetime], Optional[datetime], Optional[str]]:
+    """
+    (since, until, matched phrase) of the first date phrase in lowercased
+    text; until is exclusive.
+    """
+    today = _utc(now.year, now.month, now.day)
+
+    match = _DAY.search(text)
+    if match:
+        start = today if match.group(1) == "today" else today - timedelta(days=1)
+        return start, start + timedelta(days=1), match.group(0)
+
+    match = _ROLLING.search(text)
+    if match:
+        n, unit = int(match.group(1) or 1), match.group(2)
+        days = {"day": 1, "week": 7, "month": 30, "year": 365}[unit] * n
+        return now - timedelta(days=days), None, match.group(0)
+
+    match = _RELATIVE.search(text)
+    if match:
+        unit, current = match.group(1), match.group(0).startswith("this")
+        if unit == "week":
+            start = today - timedelta(days=today.weekday())
+            previous = start - timedelta(days=7)
+        elif unit == "month":
+            start = _utc(now.year, now.month)
+            previous = _add_months(start, -1)
+        else:
+            start = _utc(now.year)
+            previous = _utc(now.year - 1)
+        since, until = (start, None) if current else (previous, start)
+        return since, until, match.group(0)
+
+    for match in _MONTH_YEAR.finditer(text):
+        keyword, month, year = match.group(1), MONTHS[match.group(2)], match.group(3)
+        # A bare month name ("may") only counts after in/during/from/since/before
+        if keyword is None and year is None:
+            continue
+        if year is None:
+            # The latest such month that has started
+            year = now.year if month <= now.month else now.year - 1
+        start = _utc(int(year), month)
+        since, until = _window(keyword, start, _add_months(start, 1))
+        return since, until, match.group(0)
+
+    match = _YEAR.search(text)
+    if match:
+        start = _utc(int(match.group(2)))
+        since, until = _window(match.group(1), start, _utc(start.year + 1))
+        return since, until, match.group(0)
+
+    return None, None, None
+
+
+class StoryQuestion:
+    """A chat message parsed into catalogue filters and ranked terms."""
+
+    def __init__(self, message: str, now: Optional[datetime] = None):
+        text = message.lower()
+        now = now or datetime.now(timezone.utc)
+
+        self.since, self.until, date_phrase = parse_dates(text, now)
+        if date_phrase:
+            text = text.replace(date_phrase, " ", 1)
+
+        match = _PLACE.search(text)
+        self.place = match.group(1) if match else None
+        if match:
+            text = text[:match.start()] + " " + text[match.end():]
+
+        words = re.findall(r"[a-z0-9]+", text)
+        categories = {CATEGORY_WORDS[w] for w in words if w in CATEGORY_WORDS}
+        self.category = next(iter(categories)) if len(categories) == 1 else None
+        self.intent = bool(categories or INTENT_WORDS.intersection(words))
+        self.terms = " ".join(
+            w for w in words if w not in STOPWORDS and w not in CATEGORY_WORDS
+        )
+
+    @property
+    def is_catalogue_question(self) -> bool:
+        """Whether there is anything to retrieve by."""
+        return bool(
+            self.terms or self.place or self.since or self.until or self.intent
+        )
+
+    def filters(self) -> dict[str, Any]:
+        return {
+            "terms": self.terms or None,
+            "place": self.place,
+            "category": self.category,
+            "since": self.since.isoformat() if self.since else None,
+            "until": self.until.isoformat() if self.until else None,
+        }
+
+
+def retrieve(
+    question: StoryQuestion, limit: int = 5, budget_ms: Optional[float] = None
+) -> dict[str, Any]:
+    """
+    Ranked stories for a parsed question: {"stories", "total", "complete",
+    "elapsed_ms", "filters"}. Lookups stop after budget_ms (default
+    CHAT_RETRIEVAL_BUDGET_MS); "complete" is False if they had to.
+
+    A place with words splits the budget: the place lookup gets at most
+    PLACE_BUDGET_SHARE of it, and if the words then can't be scored in
+    time, the stories found near the place are listed nearest first.
+    """
+    started = time.monotonic()
+    budget_ms = settings.CHAT_RETRIEVAL_BUDGET_MS if budget_ms is None else budget_ms
+    index = current_search_index()
+    deadline = started + budget_ms / 1000
+
+    since = question.since.timestamp() if question.since else None
+    until = question.until.timestamp() if question.until else None
+
+    def allowed(doc: int) -> bool:
+        return index.matches(doc, question.category, since, until)
+
+    if question.place:
+        lon, lat, radius = PLACES[question.place]
+        place_deadline = deadline
+        if question.terms:
+            place_deadline = started + PLACE_BUDGET_SHARE * budget_ms / 1000
+        nearby, complete = index.near(lon, lat, radius, allowed, place_deadline)
+        distances = dict(nearby)
+        hits: list[tuple[int, float]] = []
+        if question.terms:
+            hits, scored = index.search(
+                question.terms, distances.__contains__, deadline
+            )
+            complete = complete and scored
+        if hits:
+            # Text relevance first; closer stories win among similar matches
+            ranked = sorted(
+                ((doc, score + 1 - distances[doc] / radius) for doc, score in hits),
+                key=lambda item: -item[1],
+            )
+        elif question.terms and complete:
+            ranked = []
+        else:
+            # No words, or no time left to score them: nearest first
+            ranked = nearby
+    elif question.terms:
+        ranked, complete = index.search(question.terms, allowed, deadline)
+    else:
+        docs, complete = index.newest_first(allowed, deadline=deadline)
+        ranked = [(doc, 0.0) for doc in docs]
+
+    ids = [index.ids[doc] for doc, _ in ranked[:limit]]
+    found = stories_by_id(ids)
+    return {
+        "stories": [
+            {field: found[i].get(field) for field in COMPACT_FIELDS}
+            for i in ids
+            if i in found
+        ],
+        "total": len(ranked),
+        "complete": complete,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "filters": question.filters(),
+    }
+
+
+def describe(question: StoryQuestion) -> str:
+    """The filters in words, e.g. 'about wildfire near California since 2026-09-01'."""
+    parts = []
+    if question.terms:
+        parts.append(f"about {question.terms}")
+    if question.place:
+        parts.append(f"near {question.place.title()}")
+    if question.since and question.until:
+        last_day = question.until - timedelta(days=1)
+        parts.append(f"from {question.since:%Y-%m-%d} to {last_day:%Y-%m-%d}")
+    elif question.since:
+        parts.append(f"since {question.since:%Y-%m-%d}")
+    elif question.until:
+        parts.append(f"before {question.until:%Y-%m-%d}")
+    return " ".join(parts)
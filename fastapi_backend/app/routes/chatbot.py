@@ -1,6 +1,16 @@
 """Chatbot API routes using FastMCP."""
 
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Optional
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.intents import CALCULATION_CUES, intent_router
+from app.metrics import intent_metrics, routing_metrics, tool_metrics
+from app.retrieval import StoryQuestion, describe, retrieve
 from app.schemas import ChatRequest, ChatResponse
 from app.mcp_server import (
     get_current_time_impl,
@@ -8,9 +18,185 @@ from app.mcp_server import (
     search_help_impl,
     calculate_impl
 )
+from app.tool_executor import ToolBusy, ToolTimeout, tool_executor
 
 router = APIRouter()
 
+# Called with a tool's name just before it runs (the streaming endpoint reports it)
+OnTool = Optional[Callable[[str], Awaitable[None]]]
+
+
+def stories_response(
+    question: StoryQuestion, result: dict[str, Any]
+) -> Optional[ChatResponse]:
+    """Answer listing the retrieved stories, or None if there were none."""
+    stories = result["stories"]
+    if not stories:
+        return None
+    total = result["total"]
+    noun = question.category or "story"
+    noun = noun if total == 1 else ("stories" if noun == "story" else f"{noun}s")
+    lines = [f"I found {total} {noun} {describe(question)}".rstrip() + ":"]
+    for i, story in enumerate(stories, 1):
+        created = (story.get("created_at") or "")[:10]
+        lines.append(f"{i}. {story['title']}" + (f" ({created})" if created else ""))
+    if total > len(stories):
+        lines.append(f"...and {total - len(stories)} more in the gallery.")
+    return ChatResponse(
+        response="\n".join(lines),
+        tool_used="search_stories",
+        metadata=result
+    )
+
+
+def no_stories_response(question: StoryQuestion) -> ChatResponse:
+    return ChatResponse(
+        response=f"I couldn't find any {question.category or 'storie'}s "
+                 f"{describe(question)}".rstrip()
+                 + ". Try fewer words, a wider place or a longer time range.",
+        tool_used="search_stories"
+    )
+
+
+async def call_tool(
+    tool: str, fn: Callable[..., Any], *args: Any, on_tool: OnTool = None
+) -> Any:
+    """Run a tool in the bounded tool pool, off the event loop."""
+    if on_tool is not None:
+        await on_tool(tool)
+    return await tool_executor.run(tool, fn, *args)
+
+
+async def answer_from_catalogue(
+    question: StoryQuestion, on_tool: OnTool = None
+) -> Optional[ChatResponse]:
+    result = await call_tool(
+        "search_stories", retrieve, question, settings.CHAT_MAX_STORIES,
+        on_tool=on_tool,
+    )
+    return stories_response(question, result)
+
+
+async def answer(intent: str, message: str, on_tool: OnTool = None) -> ChatResponse:
+    """Answer a message routed to an intent; tools run in the tool pool."""
+    user_message = message.lower().strip()
+    question = StoryQuestion(message)
+
+    # Questions about the catalogue ("fire stories near California last month")
+    if intent == "search_stories":
+        response = await answer_from_catalogue(question, on_tool)
+        if response is not None:
+            return response
+        return no_stories_response(question)
+
+    elif intent == "get_current_time":
+        result = await call_tool(
+            "get_current_time", get_current_time_impl, on_tool=on_tool
+        )
+        return ChatResponse(
+            response=f"The current time is: {result}",
+            tool_used="get_current_time"
+        )
+
+    elif intent == "get_app_info":
+        result = await call_tool("get_app_info", get_app_info_impl, on_tool=on_tool)
+        features = "\n".join([f"- {feature}" for feature in result["features"]])
+        response_text = f"{result['description']}\n\nFeatures:\n{features}"
+        return ChatResponse(
+            response=response_text,
+            tool_used="get_app_info",
+            metadata=result
+        )
+
+    elif intent == "search_help":
+        # Extract topic from message
+        topic = user_message
+        for prefix in ["help with", "help on", "how to", "how do i"]:
+            if prefix in topic:
+                topic = topic.split(prefix)[-1].strip()
+                break
+
+        result = await call_tool(
+            "search_help", search_help_impl, topic, on_tool=on_tool
+        )
+        return ChatResponse(
+            response=result,
+            tool_used="search_help"
+        )
+
+    elif intent == "calculate":
+        # Extract the mathematical expression
+        expression = user_message
+        for prefix in ["calculate", "compute", *CALCULATION_CUES]:
+            if prefix in expression:
+                expression = expression.replace(prefix, "").strip()
+        expression = expression.replace("=", "").replace("?", "").strip()
+
+        result = await call_tool(
+            "calculate", calculate_impl, expression, on_tool=on_tool
+        )
+        return ChatResponse(
+            response=result,
+            tool_used="calculate"
+        )
+
+    elif intent == "greeting":
+        return ChatResponse(
+            response="Hello! I'm the Planet Story Explorer assistant. I can help "
+                     "you with information about the app, navigation, and answer "
+                     "your questions. What would you like to know?"
+        )
+
+    elif intent == "thanks":
+        return ChatResponse(
+            response="You're welcome! Feel free to ask if you need anything else."
+        )
+
+    else:
+        # A date, a place or plain topic words may still match stories
+        if question.is_catalogue_question:
+            response = await answer_from_catalogue(question, on_tool)
+            if response is not None:
+                return response
+
+        # Default response with suggestions
+        return ChatResponse(
+            response="I'm here to help! You can ask me about:\n"
+                    "- App features and information\n"
+                    "- How to use different sections (login, gallery, dashboard)\n"
+                    "- Stories by topic, place or date "
+                    "(e.g. \"fire stories near California last month\")\n"
+                    "- The current time\n"
+                    "- Simple calculations\n\n"
+                    "What would you like to know?"
+        )
+
+
+async def respond(message: str, on_tool: OnTool = None) -> ChatResponse:
+    """Route a chat message to an intent and answer it, recording intent_metrics."""
+    started = time.perf_counter()
+    intent, _ = intent_router.route(message)
+    routing_metrics.record(intent, (time.perf_counter() - started) * 1000)
+
+    outcome = "error"
+    try:
+        response = await answer(intent, message, on_tool)
+        outcome = "ok"
+        return response
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        intent_metrics.record(intent, (time.perf_counter() - started) * 1000, outcome)
+
+
+def error_status(error: Exception) -> int:
+    if isinstance(error, ToolBusy):
+        return 503
+    if isinstance(error, ToolTimeout):
+        return 504
+    return 500
+
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest) -> ChatResponse:
@@ -18,91 +204,91 @@ async def chat(request: ChatRequest) -> ChatResponse:
     Process a chat message and return a response.
 
     This endpoint processes user messages and uses FastMCP tools to provide
-    intelligent responses.
+    intelligent responses. A tool that runs out of time answers 504, and
+    503 means the tool pool is saturated.
     """
-    user_message = request.message.lower().strip()
-
-    # Simple intent detection and tool routing
     try:
-        # Check for time-related queries
-        if any(keyword in user_message for keyword in ["time", "clock", "what time"]):
-            result = get_current_time_impl()
-            return ChatResponse(
-                response=f"The current time is: {result}",
-                tool_used="get_current_time"
-            )
-
-        # Check for app info queries
-        elif any(keyword in user_message for keyword in ["app info", "about", "features", "what is this"]):
-            result = get_app_info_impl()
-            features = "\n".join([f"- {feature}" for feature in result["features"]])
-            response_text = f"{result['description']}\n\nFeatures:\n{features}"
-            return ChatResponse(
-                response=response_text,
-                tool_used="get_app_info",
-                metadata=result
-            )
-
-        # Check for help queries
-        elif any(keyword in user_message for keyword in ["help", "how to", "how do i"]):
-            # Extract topic from message
-            topic = user_message
-            for prefix in ["help with", "help on", "how to", "how do i"]:
-                if prefix in topic:
-                    topic = topic.split(prefix)[-1].strip()
-                    break
-
-            result = search_help_impl(topic)
-            return ChatResponse(
-                response=result,
-                tool_used="search_help"
-            )
-
-        # Check for calculation queries
-        elif any(keyword in user_message for keyword in ["calculate", "compute", "="]) or \
-                any(op in user_message for op in ["+", "-", "*", "/"]):
-            # Extract the mathematical expression
-            expression = user_message
-            for prefix in ["calculate", "compute", "what is"]:
-                if prefix in expression:
-                    expression = expression.replace(prefix, "").strip()
-            expression = expression.replace("=", "").replace("?", "").strip()
-
-            result = calculate_impl(expression)
-            return ChatResponse(
-                response=result,
-                tool_used="calculate"
-            )
-
-        # Default greeting and general responses
-        elif any(keyword in user_message for keyword in ["hello", "hi", "hey"]):
-            return ChatResponse(
-                response="Hello! I'm the Planet Story Explorer assistant. I can help you with information about the app, navigation, and answer your questions. What would you like to know?"
-            )
-
-        elif any(keyword in user_message for keyword in ["thanks", "thank you"]):
-            return ChatResponse(
-                response="You're welcome! Feel free to ask if you need anything else."
-            )
-
-        else:
-            # Default response with suggestions
-            return ChatResponse(
-                response="I'm here to help! You can ask me about:\n"
-                        "- App features and information\n"
-                        "- How to use different sections (login, gallery, dashboard)\n"
-                        "- The current time\n"
-                        "- Simple calculations\n\n"
-                        "What would you like to know?"
-            )
-
+        return await respond(request.message)
     except Exception as e:
         raise HTTPException(
-            status_code=500,
+            status_code=error_status(e),
             detail=f"Error processing chat message: {str(e)}"
         )
 
 
+def sse_event(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
+    """
+    Process a chat message and stream the answer as server-sent events.
+
+    Only the `tool` event arrives while the answer is being built: the
+    answer is complete before its first `delta`, and the deltas then follow
+    at once, one per line.
+
+    Events, in order:
+    - `tool`: `{"tool": name}` when a tool starts running
+    - `delta`: `{"text": ...}` for each line of the answer
+    - `done`: the complete ChatResponse
+    - `error`: `{"status": ..., "detail": ...}` instead of `done` if the message failed
+    """
+    queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+
+    async def on_tool(tool: str) -> None:
+        await queue.put(sse_event("tool", {"tool": tool}))
+
+    async def produce() -> None:
+        try:
+            response = await respond(request.message, on_tool)
+            for line in response.response.splitlines(keepends=True):
+                await queue.put(sse_event("delta", {"text": line}))
+            await queue.put(sse_event("done", response.model_dump()))
+        except Exception as e:
+            await queue.put(sse_event("error", {
+                "status": error_status(e),
+                "detail": f"Error processing chat message: {str(e)}",
+            }))
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(produce())
+
+    async def events():
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            # Client went away: stop waiting on the tool (its thread finishes
+            # on its own)
+            task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/metrics")
+async def chat_metrics() -> dict[str, Any]:
+    """
+    Per-process chat counters and latency histograms: routing time and
+    answers by intent, and calls by tool (chat and MCP), busiest first.
+    """
+    return {
+        "routing": routing_metrics.snapshot(),
+        "intents": intent_metrics.snapshot(),
+        "tools": tool_metrics.snapshot(),
+        "tool_pool": {
+            "timed_out": tool_executor.timed_out,
+            "rejected": tool_executor.rejected,
+        },
+    }
+
+
 @router.get("/health")
 async def health_check() -> dict[str, str]:
     """Health check endpoint for the chatbot service."""
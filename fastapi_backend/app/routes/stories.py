@@ -1,9 +1,17 @@
+import asyncio
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 
 from app import schemas
-from app.fetch_stories import supabase, TABLE_NAME
+from app.cache import duplicate_rows_cache, response_cache
+from app.compression import CompressedPayload
+from app.config import settings
+from app.dedupe import duplicate_rows
+from app.fetch_stories import supabase, TABLE_NAME, fetch_all_rows
+from app.related import RelatedIndex, related_index_cache
+from app.snapshot import CATEGORY_FORMATS, snapshot_reader
+from app.wire import JSON, encode_columnar, negotiate_format
 
 router = APIRouter()
 
@@ -56,12 +64,235 @@ def transform_story(row: dict) -> dict:
     }
 
 
+def query_story_page(
+    page: int, limit: int, category: Optional[str], search: Optional[str]
+) -> dict:
+    """Fetch one page of stories from Supabase in PaginatedStoriesResponse shape."""
+    # Start building the query
+    query = supabase.table(TABLE_NAME).select("*", count="exact")
+
+    # Apply category filter by mapping to format field
+    if category == "video":
+        query = query.eq("format", "mp4")
+    elif category == "image":
+        query = query.eq("format", "raw")
+
+    # Apply search filter
+    if search:
+        query = query.ilike("title", f"%{search}%")
+
+    # Calculate offset for pagination
+    offset = (page - 1) * limit
+
+    # Apply pagination
+    query = query.order("created", desc=True).range(offset, offset + limit - 1)
+
+    # Execute query
+    response = query.execute()
+
+    # Get total count
+    total_count = response.count if getattr(response, 'count', None) is not None else 0
+
+    # Transform stories
+    stories = [transform_story(row) for row in (response.data or [])]
+
+    # Calculate has_more
+    has_more = (page * limit) < total_count
+
+    return {
+        "data": stories,
+        "total": total_count,
+        "page": page,
+        "limit": limit,
+        "has_more": has_more
+    }
+
+
+def load_deduped_table() -> tuple[list[dict], frozenset[int]]:
+    """Every story from Supabase and the positions of its near-duplicates."""
+    stories = [transform_story(row) for row in fetch_all_rows()]
+    return stories, duplicate_rows(stories)
+
+
+def deduped_page(
+    table: tuple[list[dict], frozenset[int]],
+    page: int,
+    limit: int,
+    category: Optional[str],
+    search: Optional[str],
+) -> dict:
+    """One page of stories without near-duplicates, when there is no snapshot."""
+    stories, duplicates = table
+    fmt = CATEGORY_FORMATS.get(category)
+    needle = search.lower() if search else None
+    matching = [
+        story for row, story in enumerate(stories)
+        if row not in duplicates
+        and (fmt is None or story["format"] == fmt)
+        and (needle is None or needle in (story["title"] or "").lower())
+    ]
+    offset = (page - 1) * limit
+    return {
+        "data": matching[offset:offset + limit],
+        "total": len(matching),
+        "page": page,
+        "limit": limit,
+        "has_more": page * limit < len(matching),
+    }
+
+
+def query_story(story_id: str) -> Optional[dict]:
+    """Fetch a single story from Supabase in StoryRead shape, or None if missing."""
+    response = supabase.table(TABLE_NAME).select("*").eq("id", story_id).execute()
+    if not response.data:
+        return None
+    return transform_story(response.data[0])
+
+
+def stories_by_id(story_ids: list[str]) -> dict[str, dict]:
+    """{id: story in StoryRead shape} for the ids that exist, in one lookup."""
+    snapshot = snapshot_reader.get()
+    if snapshot is not None:
+        rows = {story_id: snapshot.find(story_id) for story_id in story_ids}
+        return {
+            story_id: snapshot.row(row)
+            for story_id, row in rows.items()
+            if row is not None
+        }
+    if not story_ids:
+        return {}
+    response = supabase.table(TABLE_NAME).select("*").in_("id", story_ids).execute()
+    return {row["id"]: transform_story(row) for row in response.data or []}
+
+
+def story_page_payload(
+    page: int,
+    limit: int,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    fmt: str = JSON,
+    dedupe: bool = False,
+) -> CompressedPayload:
+    """
+    Return the serialized, precompressed story page, served from cache when possible.
+
+    Duplicates can only be found over the whole table, so they are found in
+    a background thread (reading every row from Supabase when there is no
+    snapshot). Until that is done, dedupe=True lists every story and the
+    page is not cached.
+    """
+    key = ("list", page, limit, category, search or None, fmt, dedupe)
+    payload = response_cache.get(key)
+    if payload is None:
+        snapshot = snapshot_reader.get()
+        exclude = table = None
+        if dedupe and snapshot is not None:
+            exclude = duplicate_rows_cache.peek(
+                snapshot, lambda: duplicate_rows(snapshot.iter_rows())
+            )
+        elif dedupe:
+            table = duplicate_rows_cache.peek(
+                TABLE_NAME, load_deduped_table, settings.DEDUPE_MAX_AGE
+            )
+        if snapshot is not None and fmt == JSON:
+            # Rows in the snapshot are already serialized StoryRead JSON
+            body = snapshot.page_json(page, limit, category, search, exclude)
+        else:
+            if snapshot is not None:
+                result = snapshot.page(page, limit, category, search, exclude)
+            elif table is not None:
+                result = deduped_page(table, page, limit, category, search)
+            else:
+                result = query_story_page(page, limit, category, search)
+            if fmt == JSON:
+                response = schemas.PaginatedStoriesResponse.model_validate(result)
+                body = response.model_dump_json().encode()
+            else:
+                body = encode_columnar(result, fmt=fmt)
+        payload = CompressedPayload(
+            body, media_type=fmt, headers={"Vary": "Accept, Accept-Encoding"}
+        )
+        payload.precompress(settings.COMPRESSION_MIN_SIZE)
+        if not dedupe or exclude is not None or table is not None:
+            response_cache.put(key, payload)
+    return payload
+
+
+def story_payload(story_id: str) -> Optional[CompressedPayload]:
+    """Return the serialized, precompressed story, or None if it does not exist."""
+    key = ("story", story_id)
+    payload = response_cache.get(key)
+    if payload is None:
+        snapshot = snapshot_reader.get()
+        if snapshot is not None:
+            body = snapshot.get_body(story_id)
+        else:
+            story = query_story(story_id)
+            body = None
+            if story is not None:
+                validated = schemas.StoryRead.model_validate(story)
+                body = validated.model_dump_json().encode()
+        if body is None:
+            return None
+        payload = CompressedPayload(body)
+        response_cache.put(key, payload.precompress(settings.COMPRESSION_MIN_SIZE))
+    return payload
+
+
+def build_related_index(stories: list[dict]) -> tuple[dict[str, dict], RelatedIndex]:
+    index = RelatedIndex(settings.RELATED_K)
+    index.update(stories)
+    return {story["id"]: story for story in stories}, index
+
+
+def related_payload(story_id: str, limit: int) -> Optional[CompressedPayload]:
+    """
+    Return the serialized related stories of a story, or None if the story
+    does not exist.
+    """
+    key = ("related", story_id, limit)
+    payload = response_cache.get(key)
+    if payload is None:
+        snapshot = snapshot_reader.get()
+        if snapshot is not None and snapshot.related_k:
+            # Neighbour lists are precomputed in the snapshot
+            body = snapshot.related_json(story_id, limit)
+        else:
+            # An older snapshot without related lists, or none: index the table here
+            if snapshot is not None:
+                stories, index = related_index_cache.get(
+                    snapshot, lambda: build_related_index(list(snapshot.iter_rows())))
+            else:
+                stories, index = related_index_cache.get(
+                    TABLE_NAME,
+                    lambda: build_related_index(
+                        [transform_story(row) for row in fetch_all_rows()]
+                    ),
+                    settings.RELATED_MAX_AGE,
+                )
+            if story_id not in stories:
+                return None
+            neighbours = index.neighbours(story_id)[:limit]
+            result = {"story_id": story_id, "data": [stories[i] for i, _ in neighbours]}
+            response = schemas.RelatedStoriesResponse.model_validate(result)
+            body = response.model_dump_json().encode()
+        if body is None:
+            return None
+        payload = CompressedPayload(body)
+        response_cache.put(key, payload.precompress(settings.COMPRESSION_MIN_SIZE))
+    return payload
+
+
 @router.get("/", response_model=schemas.PaginatedStoriesResponse, summary="List stories")
 async def list_stories(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number (1-indexed)"),
     limit: int = Query(12, ge=1, le=48, description="Number of stories per page"),
     category: Optional[str] = Query(None, description="Filter by category: 'image' or 'video'"),
-    search: Optional[str] = Query(None, description="Search by title")
+    search: Optional[str] = Query(None, description="Search by title"),
+    dedupe: bool = Query(
+        False, description="Hide near-duplicate re-posts of the same story"
+    ),
 ):
     """
     List stories with pagination and optional filtering.
@@ -70,75 +301,96 @@ async def list_stories(
     - **limit**: Number of stories per page (max 48)
     - **category**: Filter by 'image' (format=raw) or 'video' (format=mp4)
     - **search**: Search stories by title (case-insensitive)
+    - **dedupe**: Hide near-duplicates (same title pattern, place and time),
+      keeping the newest story of each group
+
+    Responses are gzip/brotli compressed when the client accepts it and the
+    body is larger than `COMPRESSION_MIN_SIZE`.
+
+    Machine clients can request a compact columnar body (one array per field,
+    client-only null fields dropped) with the `Accept` header:
+    `application/vnd.planet.columnar+json` or `application/msgpack`.
     """
+    fmt = negotiate_format(request.headers.get("accept"))
     try:
-        # Start building the query
-        query = supabase.table(TABLE_NAME).select("*", count="exact")
-        
-        # Apply category filter by mapping to format field
-        if category == "video":
-            query = query.eq("format", "mp4")
-        elif category == "image":
-            query = query.eq("format", "raw")
-        
-        # Apply search filter
-        if search:
-            query = query.ilike("title", f"%{search}%")
-        
-        # Calculate offset for pagination
-        offset = (page - 1) * limit
-        
-        # Apply pagination
-        query = query.order("created", desc=True).range(offset, offset + limit - 1)
-        
-        # Execute query
-        response = query.execute()
-        
-        # Get total count
-        total_count = response.count if hasattr(response, 'count') and response.count is not None else 0
-        
-        # Transform stories
-        stories = [transform_story(row) for row in (response.data or [])]
-        
-        # Calculate has_more
-        has_more = (page * limit) < total_count
-        
-        return {
-            "data": stories,
-            "total": total_count,
-            "page": page,
-            "limit": limit,
-            "has_more": has_more
-        }
+        payload = story_page_payload(page, limit, category, search, fmt, dedupe)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching stories: {str(e)}"
         )
+    return payload.to_response(
+        request.headers.get("accept-encoding"), settings.COMPRESSION_MIN_SIZE
+    )
 
 
 @router.get("/{story_id}", response_model=schemas.StoryRead, summary="Get a story by ID")
-async def get_story(story_id: str):
+async def get_story(story_id: str, request: Request):
     """
     Get a single story by its ID.
     
     - **story_id**: The unique identifier of the story (string)
     """
     try:
-        response = supabase.table(TABLE_NAME).select("*").eq("id", story_id).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Story not found"
-            )
-        
-        story = transform_story(response.data[0])
-        return story
-    except HTTPException:
-        raise
+        payload = story_payload(story_id)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching story: {str(e)}"
         )
+
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Story not found"
+        )
+    return payload.to_response(
+        request.headers.get("accept-encoding"), settings.COMPRESSION_MIN_SIZE
+    )
+
+
+@router.get(
+    "/{story_id}/related",
+    response_model=schemas.RelatedStoriesResponse,
+    summary="Get related stories",
+)
+async def get_related_stories(
+    story_id: str,
+    request: Request,
+    limit: int = Query(
+        8, ge=1, le=48, description="Number of related stories (at most RELATED_K)"
+    ),
+):
+    """
+    Get the stories most related to a story: close by, from around the same
+    time, with similar titles. Best match first.
+
+    - **story_id**: The unique identifier of the story (string)
+    - **limit**: Number of related stories (capped at the `RELATED_K` kept per story)
+
+    Neighbour lists are precomputed when the snapshot is written, so a
+    request is a lookup. Without them the story table is indexed in a
+    worker thread on first use.
+    """
+    try:
+        snapshot = snapshot_reader.get()
+        if snapshot is not None and snapshot.related_k:
+            payload = related_payload(story_id, limit)
+        else:
+            # Without precomputed lists the whole table is indexed first: keep
+            # that off the event loop
+            payload = await asyncio.to_thread(related_payload, story_id, limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching related stories: {str(e)}"
+        ) from e
+
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Story not found"
+        )
+    return payload.to_response(
+        request.headers.get("accept-encoding"), settings.COMPRESSION_MIN_SIZE
+    )
@@ -0,0 +1,236 @@
+"""In-process background ingestion scheduler."""
+
+import asyncio
+import os
+import random
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX platforms: every process acts as the leader
+    fcntl = None
+
+from app.cache import duplicate_rows_cache
+from app.config import settings
+from app.fetch_stories import (
+    supabase, TABLE_NAME, fetch_all_rows, fetch_stories_since, store_stories
+)
+from app.related import RelatedIndex
+from app.routes.stories import transform_story
+from app.search_index import refresh_search_index, search_index
+from app.snapshot import snapshot_reader, write_snapshot
+from app.units import to_seconds
+from app.warmup import warm_read_caches
+
+
+class IngestionLock:
+    """
+    Host-wide advisory lock electing the single ingesting worker.
+
+    The lock is held for the lifetime of the process that wins it, and the
+    OS releases it if that process dies, so another worker takes over on its
+    next tick. A stamp file next to the lock records each completed cycle so
+    the other workers know when to refresh their own caches.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stamp_path = f"{path}.stamp"
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def touch_stamp(self) -> None:
+        with open(self.stamp_path, "a"):
+            os.utime(self.stamp_path)
+
+    def stamp_mtime(self) -> float:
+        try:
+            return os.stat(self.stamp_path).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+
+def latest_created() -> Optional[str]:
+    """Return the newest `created` timestamp stored in Supabase."""
+    response = (
+        supabase.table(TABLE_NAME)
+        .select("created")
+        .order("created", desc=True)
+        .limit(1)
+        .execute()
+    )
+    if not response.data:
+        return None
+    return response.data[0]["created"]
+
+
+# Neighbour lists of the stories seen so far; each rebuild only indexes the new ones
+related_index = RelatedIndex(settings.RELATED_K)
+
+
+def rebuild_snapshot() -> int:
+    """
+    Write the whole story table to the shared snapshot file, if one is configured.
+
+    Stories not yet in related_index are added to it first, so the snapshot
+    carries up-to-date related-story lists.
+    """
+    if not settings.SNAPSHOT_PATH:
+        return 0
+    stories = [transform_story(row) for row in fetch_all_rows()]
+    related_index.update(stories)
+    count = write_snapshot(stories, settings.SNAPSHOT_PATH, related_index)
+    snapshot_reader.invalidate()
+    return count
+
+
+class IngestionScheduler:
+    """Runs incremental fetch_stories/store_stories cycles on a jittered interval."""
+
+    def __init__(
+        self, interval: float, jitter: float, lock_path: str, batch_limit: int
+    ):
+        self.interval = interval
+        self.jitter = jitter
+        self.batch_limit = batch_limit
+        self.lock = IngestionLock(lock_path)
+        self.watermark: Optional[str] = None
+        # A scan cut short by the page cap resumes from this cursor on the next
+        # cycle; the watermark only moves to the newest story it stored once
+        # the scan has reached the old watermark
+        self.resume_cursor: Optional[str] = None
+        self._scan_newest: Optional[str] = None
+        self.last_stored = 0
+        self._seen_stamp = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.lock.release()
+
+    async def _run(self) -> None:
+        # Jitter the first tick too, so workers started together don't collide
+        await asyncio.sleep(random.uniform(0, self.jitter))
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"Ingestion cycle failed: {e}")
+            await asyncio.sleep(self.interval + random.uniform(0, self.jitter))
+
+    async def tick(self) -> None:
+        """Ingest if this worker is the leader, otherwise follow the leader's stamp."""
+        if self.lock.try_acquire():
+            await self.run_once()
+            return
+
+        stamp = self.lock.stamp_mtime()
+        if stamp > self._seen_stamp:
+            self._seen_stamp = stamp
+            # The leader has already swapped in a new snapshot; just remap it
+            snapshot_reader.invalidate()
+            await asyncio.to_thread(warm_read_caches)
+            await self.refresh_search()
+
+    async def refresh_search(self) -> None:
+        """
+        Index the new stories now rather than on the next search, once warm-up
+        has built the index.
+        """
+        if len(search_index):
+            await asyncio.to_thread(refresh_search_index, True)
+
+    async def run_once(self) -> int:
+        """
+        Run one incremental ingestion cycle and warm the caches.
+        Returns the number of stories stored.
+        """
+        if self.watermark is None:
+            self.watermark = await asyncio.to_thread(latest_created)
+
+        fetched = await asyncio.to_thread(
+            fetch_stories_since,
+            self.watermark,
+            self.batch_limit,
+            before=self.resume_cursor,
+        )
+        stories, cursor = fetched if fetched is not None else ([], self.resume_cursor)
+        stored = await asyncio.to_thread(store_stories, stories) if stories else 0
+        # Stories that failed to store are fetched again from the same place
+        if stored or not stories:
+            self._advance(stories, cursor)
+
+        # A fresh leader also builds the snapshot if none exists yet
+        snapshot_missing = (
+            bool(settings.SNAPSHOT_PATH) and snapshot_reader.get() is None
+        )
+        if stored or snapshot_missing:
+            if stored:
+                self.last_stored = stored
+                # New snapshots are picked up on their own; the Supabase fallback is not
+                duplicate_rows_cache.invalidate()
+            await asyncio.to_thread(rebuild_snapshot)
+            await asyncio.to_thread(warm_read_caches)
+            await self.refresh_search()
+            self.lock.touch_stamp()
+            self._seen_stamp = self.lock.stamp_mtime()
+            print(f"Ingested {stored} new stories (watermark {self.watermark})")
+        if self.resume_cursor is not None:
+            print(f"Ingestion scan continues before {self.resume_cursor} next cycle")
+        return stored
+
+    def _advance(self, stories: list, cursor: Optional[str]) -> None:
+        """Record a stored page range; move the watermark once the scan is done."""
+        for story in stories:
+            created = to_seconds(story.get("created"))
+            if created is not None and (
+                self._scan_newest is None or created > to_seconds(self._scan_newest)
+            ):
+                self._scan_newest = story.get("created")
+        self.resume_cursor = cursor
+        if cursor is None:
+            self.watermark = self._scan_newest or self.watermark
+            self._scan_newest = None
+
+
+def create_scheduler() -> IngestionScheduler:
+    return IngestionScheduler(
+        interval=settings.INGEST_INTERVAL_SECONDS,
+        jitter=settings.INGEST_JITTER_SECONDS,
+        lock_path=settings.INGEST_LOCK_FILE,
+        batch_limit=settings.INGEST_BATCH_LIMIT,
+    )
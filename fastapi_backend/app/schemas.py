@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Any
 
 
@@ -35,9 +35,16 @@ class PaginatedStoriesResponse(BaseModel):
     has_more: bool
 
 
+class RelatedStoriesResponse(BaseModel):
+    """Related stories of one story, best match first."""
+    story_id: str
+    data: list[StoryRead]
+
+
 class ChatRequest(BaseModel):
     """Request model for chat messages."""
-    message: str
+    # Bounded so parsing a message stays cheap
+    message: str = Field(max_length=2000)
     context: dict[str, Any] | None = None
 
 
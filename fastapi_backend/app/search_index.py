@@ -0,0 +1,341 @@
+"""
+In-memory catalogue index for ranked and geographic story lookups.
+
+Used by the MCP story tools and the chatbot, over the same rows the stories
+router serves (the shared snapshot, or the Supabase table without one):
+
+- ranked search: BM25 over title, description and author tokens, from
+  per-token posting lists, so a query only touches the stories that
+  contain its terms. Rare terms are scored first, so a query cut short by
+  its deadline has already counted the most telling ones;
+- geo lookup: stories bucketed into CELL_DEG grid cells, so a radius query
+  only measures the stories in the cells its bounding box covers;
+- creation times, for date filters.
+
+The index is append-only and keyed by story id: refresh_search_index()
+adds the stories of a new snapshot (or the Supabase rows newer than the
+newest one indexed) without re-tokenizing the rest. Stories are fetched
+back by id through the stories router's lookup. An ingested story whose
+text changes keeps its old tokens until the process restarts.
+"""
+
+import math
+import re
+import threading
+import time
+from array import array
+from typing import Any, Callable, Iterable, Optional
+
+from app.config import settings
+from app.fetch_stories import fetch_all_rows, fetch_rows_since
+from app.routes.stories import transform_story
+from app.snapshot import CATEGORY_FORMATS, snapshot_reader
+from app.units import EARTH_RADIUS_KM, haversine_km, to_seconds
+
+# BM25 term-frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+CELL_DEG = 1.0
+# Postings (or stories) scanned between deadline checks
+DEADLINE_STRIDE = 4096
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _past(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.monotonic() > deadline
+
+
+def _fold(token: str) -> str:
+    """
+    Crude plural folding, so "fires", "cities" and "volcanoes" match their
+    singular.
+    """
+    if len(token) <= 3 or not token.endswith("s") or token.endswith(("ss", "us", "is")):
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("oes"):
+        return token[:-2]
+    return token[:-1]
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    return [_fold(token) for token in _TOKEN.findall((text or "").lower())]
+
+
+class SearchIndex:
+    """BM25, grid and creation-time index over StoryRead-shaped stories."""
+
+    def __init__(self):
+        self.ids: list[str] = []
+        self._doc_of: dict[str, int] = {}
+        # token -> (docs, term frequencies)
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._lengths = array("I")
+        self._total_length = 0
+        self._formats: list[Optional[str]] = []
+        self._coords: list[Optional[tuple[float, float]]] = []
+        self._created = array("d")
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        # Newest created_at indexed, the watermark for incremental Supabase reads
+        self.newest: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, story_id: str) -> bool:
+        return story_id in self._doc_of
+
+    @staticmethod
+    def _cell(lon: float, lat: float) -> tuple[int, int]:
+        return int(math.floor(lon / CELL_DEG)), int(math.floor(lat / CELL_DEG))
+
+    def add(self, story: dict[str, Any]) -> None:
+        """Index a story; ids already indexed are ignored."""
+        story_id = story["id"]
+        if story_id in self._doc_of:
+            return
+        doc = len(self.ids)
+
+        tokens = (tokenize(story.get("title")) + tokenize(story.get("description"))
+                  + tokenize(story.get("author")))
+        counts: dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        # Per-doc arrays first: concurrent readers only reach a doc through its postings
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        self._formats.append(story.get("format"))
+        created = story.get("created_at")
+        seconds = to_seconds(created)
+        self._created.append(math.nan if seconds is None else seconds)
+        if created and (self.newest is None or created > self.newest):
+            self.newest = created
+
+        lon, lat = story.get("center_long"), story.get("center_lat")
+        if lon is None or lat is None or math.isnan(lon) or math.isnan(lat):
+            self._coords.append(None)
+        else:
+            self._coords.append((lon, lat))
+            self._cells.setdefault(self._cell(lon, lat), []).append(doc)
+
+        for token, tf in counts.items():
+            docs, tfs = self._postings.setdefault(token, (array("I"), array("I")))
+            tfs.append(tf)
+            docs.append(doc)
+        self.ids.append(story_id)
+        self._doc_of[story_id] = doc
+
+    def update(self, stories: Iterable[dict[str, Any]]) -> int:
+        """Index the stories not indexed yet. Returns how many were added."""
+        before = len(self.ids)
+        for story in stories:
+            self.add(story)
+        return len(self.ids) - before
+
+    def _age(self, doc: int) -> float:
+        """Sort key putting newer docs first and undated docs last."""
+        seconds = self._created[doc]
+        return math.inf if math.isnan(seconds) else -seconds
+
+    def created(self, doc: int) -> Optional[float]:
+        seconds = self._created[doc]
+        return None if math.isnan(seconds) else seconds
+
+    def matches(
+        self,
+        doc: int,
+        category: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> bool:
+        """
+        Whether a doc passes a category filter and a [since, until) creation
+        window.
+        """
+        fmt = CATEGORY_FORMATS.get(category)
+        if fmt is not None and self._formats[doc] != fmt:
+            return False
+        if since is not None or until is not None:
+            seconds = self._created[doc]
+            if math.isnan(seconds):
+                return False
+            if since is not None and seconds < since:
+                return False
+            if until is not None and seconds >= until:
+                return False
+        return True
+
+    def search(
+        self,
+        query: str,
+        allowed: Optional[Callable[[int], bool]] = None,
+        deadline: Optional[float] = None,
+    ) -> tuple[list[tuple[int, float]], bool]:
+        """
+        ([(doc, score)] best first, complete) for the docs matching any query
+        term and `allowed`. Ties go to the newer story. Scoring stops at
+        `deadline` (time.monotonic()), and `complete` is False if it did.
+        """
+        docs_count = len(self.ids)
+        avg = (self._total_length / docs_count) if docs_count else 1.0
+        lengths = self._lengths
+        terms = set(tokenize(query))
+        postings = [self._postings[t] for t in terms if t in self._postings]
+        postings.sort(key=lambda posting: len(posting[0]))
+
+        scores: dict[int, float] = {}
+        rejected: set[int] = set()
+        complete = True
+        for docs, tfs in postings:
+            n = len(docs)
+            idf = math.log(1 + (docs_count - n + 0.5) / (n + 0.5))
+            for i in range(n):
+                if i % DEADLINE_STRIDE == 0 and _past(deadline):
+                    complete = False
+                    break
+                doc = docs[i]
+                if doc in rejected:
+                    continue
+                if doc not in scores and allowed is not None and not allowed(doc):
+                    rejected.add(doc)
+                    continue
+                tf = tfs[i]
+                norm = K1 * (1 - B + B * lengths[doc] / (avg or 1.0))
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+            if not complete:
+                break
+        ranked = list(scores.items())
+        ranked.sort(key=lambda item: (-item[1], self._age(item[0])))
+        return ranked, complete
+
+    def near(
+        self,
+        lon: float,
+        lat: float,
+        radius_km: float,
+        allowed: Optional[Callable[[int], bool]] = None,
+        deadline: Optional[float] = None,
+    ) -> tuple[list[tuple[int, float]], bool]:
+        """
+        ([(doc, distance km)] nearest first, complete) for the stories within
+        radius_km of a point. Scanning stops at `deadline` (time.monotonic()),
+        and `complete` is False if it did.
+        """
+        lat_span = math.degrees(radius_km / EARTH_RADIUS_KM)
+        cos_lat = math.cos(math.radians(min(89.0, abs(lat) + lat_span)))
+        lon_span = 180.0 if cos_lat <= 0 else min(180.0, lat_span / cos_lat)
+        x0, y0 = self._cell(lon - lon_span, max(-90.0, lat - lat_span))
+        x1, y1 = self._cell(lon + lon_span, min(90.0, lat + lat_span))
+        # Longitude cells wrap around the antimeridian
+        n_lon = int(360 / CELL_DEG)
+        half = n_lon // 2
+        last = min(x1, x0 + n_lon - 1)
+        xs = {((x + half) % n_lon) - half for x in range(x0, last + 1)}
+
+        found = []
+        complete = True
+        scanned = next_check = 0
+        for x in xs:
+            for y in range(y0, y1 + 1):
+                if scanned >= next_check:
+                    if _past(deadline):
+                        complete = False
+                        break
+                    next_check = scanned + DEADLINE_STRIDE
+                cell = self._cells.get((x, y), ())
+                scanned += len(cell)
+                for doc in cell:
+                    if allowed is not None and not allowed(doc):
+                        continue
+                    s_lon, s_lat = self._coords[doc]
+                    distance = haversine_km(lon, lat, s_lon, s_lat)
+                    if distance <= radius_km:
+                        found.append((doc, distance))
+            if not complete:
+                break
+        found.sort(key=lambda item: (item[1], item[0]))
+        return found, complete
+
+    def newest_first(
+        self,
+        allowed: Optional[Callable[[int], bool]] = None,
+        limit: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> tuple[list[int], bool]:
+        """
+        (docs passing `allowed` newest first (undated last), complete).
+        Filtering stops at `deadline`, and `complete` is False if it did.
+        """
+        docs = []
+        complete = True
+        for doc in range(len(self.ids)):
+            if doc and doc % DEADLINE_STRIDE == 0 and _past(deadline):
+                complete = False
+                break
+            if allowed is None or allowed(doc):
+                docs.append(doc)
+        docs.sort(key=self._age)
+        return (docs[:limit] if limit is not None else docs), complete
+
+
+search_index = SearchIndex()
+_refresh_lock = threading.Lock()
+# The snapshot (or Supabase table) the index last caught up with, and when
+_refreshed_from: Any = None
+_refreshed_at = 0.0
+
+
+def refresh_search_index(force: bool = False, wait: bool = True) -> int:
+    """
+    Add the stories search_index hasn't seen: those of a newly mapped
+    snapshot, or without one, the Supabase rows newer than the newest indexed
+    (at most every SEARCH_MAX_AGE seconds unless `force`, e.g. right after
+    ingestion). Returns how many were added. With wait=False, returns 0 at
+    once if another thread is already refreshing.
+    """
+    global _refreshed_from, _refreshed_at
+    if not _refresh_lock.acquire(blocking=wait):
+        return 0
+    try:
+        snapshot = snapshot_reader.get()
+        if snapshot is not None:
+            if snapshot is _refreshed_from:
+                return 0
+            rows = [
+                row
+                for story_id, row in snapshot.iter_ids()
+                if story_id not in search_index
+            ]
+            # Oldest first, like ingestion
+            rows.sort(reverse=True)
+            added = search_index.update(snapshot.row(row) for row in rows)
+            _refreshed_from = snapshot
+        else:
+            fresh = time.monotonic() - _refreshed_at < settings.SEARCH_MAX_AGE
+            if _refreshed_from == "supabase" and fresh and not force:
+                return 0
+            if search_index.newest is None:
+                rows = fetch_all_rows()
+            else:
+                rows = fetch_rows_since(search_index.newest)
+            added = search_index.update(transform_story(row) for row in reversed(rows))
+            _refreshed_from = "supabase"
+        _refreshed_at = time.monotonic()
+        if added:
+            print(f"Search index: +{added} stories ({len(search_index)} total)")
+        return added
+    finally:
+        _refresh_lock.release()
+
+
+def current_search_index() -> SearchIndex:
+    """
+    search_index, caught up with the rows the stories router currently serves.
+
+    The index is built at startup (see warmup.py), so this only adds new
+    stories; callers don't queue behind a refresh that is already running.
+    """
+    refresh_search_index(wait=False)
+    return search_index
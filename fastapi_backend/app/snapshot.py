@@ -0,0 +1,370 @@
+"""
+Memory-mapped story table snapshot shared by every worker on a host.
+
+The ingesting worker writes the whole story table to one file, already
+serialized as StoryRead JSON and sorted newest first, then atomically swaps
+it into place with os.replace. Every worker maps the file read-only, so the
+bytes live once in the OS page cache however many workers are running, and
+a page is assembled by joining pre-serialized rows without touching Supabase.
+
+File layout (little-endian):
+
+    header   magic, version, row count, section count, (offset, length) per section
+    formats  one byte per row (FORMAT_CODES)
+    titles   lowercased titles, with a uint64 offsets section (row count + 1)
+    bodies   StoryRead JSON per row, with a uint64 offsets section
+    ids      story ids sorted for binary search, with offsets and row numbers
+    related  optional: k neighbour row numbers per row (RelatedIndex), NO_ROW padded
+
+Sections are only ever appended, and a reader maps the ones the file has, so
+an older snapshot without related lists still loads.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+from app import schemas
+from app.config import settings
+
+if TYPE_CHECKING:
+    from app.related import RelatedIndex
+
+MAGIC = b"PSS1"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")
+SECTION = struct.Struct("<QQ")
+
+FORMAT_CODES = {"raw": 1, "mp4": 2}
+CATEGORY_FORMATS = {"image": "raw", "video": "mp4"}
+
+SECTIONS = [
+    "formats",
+    "title_offsets",
+    "titles",
+    "body_offsets",
+    "bodies",
+    "id_offsets",
+    "ids",
+    "id_rows",
+    "related_rows",
+]
+
+NO_ROW = 0xFFFFFFFF
+
+
+def _offsets(chunks: list[bytes]) -> array:
+    offsets = array("Q", [0])
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        offsets.append(total)
+    return offsets
+
+
+def _related_rows(stories: list[dict[str, Any]], related: "RelatedIndex") -> bytes:
+    row_of = {s["id"]: row for row, s in enumerate(stories)}
+    rows = array("I")
+    for story in stories:
+        neighbours = [
+            row_of[i] for i, _ in related.neighbours(story["id"]) if i in row_of
+        ]
+        rows.extend(neighbours[:related.k])
+        rows.extend([NO_ROW] * (related.k - min(len(neighbours), related.k)))
+    return rows.tobytes()
+
+
+def write_snapshot(stories: list[dict[str, Any]], path: str,
+                   related: Optional["RelatedIndex"] = None) -> int:
+    """
+    Serialize StoryRead-shaped dicts into a snapshot and atomically replace `path`.
+
+    With `related`, each row's neighbour lists are stored too. Readers holding
+    the previous file keep a valid mapping until they notice the swap.
+    Returns the number of rows written.
+    """
+    stories = sorted(stories, key=lambda s: s.get("created_at") or "", reverse=True)
+
+    bodies = [
+        schemas.StoryRead.model_validate(s).model_dump_json().encode() for s in stories
+    ]
+    titles = [(s.get("title") or "").lower().encode() for s in stories]
+    formats = bytes(FORMAT_CODES.get(s.get("format"), 0) for s in stories)
+
+    id_order = sorted(range(len(stories)), key=lambda i: stories[i]["id"])
+    ids = [stories[i]["id"].encode() for i in id_order]
+
+    sections = {
+        "formats": formats,
+        "title_offsets": _offsets(titles).tobytes(),
+        "titles": b"".join(titles),
+        "body_offsets": _offsets(bodies).tobytes(),
+        "bodies": b"".join(bodies),
+        "id_offsets": _offsets(ids).tobytes(),
+        "ids": b"".join(ids),
+        "id_rows": array("Q", id_order).tobytes(),
+        "related_rows": _related_rows(stories, related) if related is not None else b"",
+    }
+
+    position = HEADER.size + SECTION.size * len(SECTIONS)
+    table, blobs = [], []
+    for name in SECTIONS:
+        data = sections[name]
+        padding = -position % 8
+        blobs.append(b"\0" * padding + data)
+        position += padding
+        table.append(SECTION.pack(position, len(data)))
+        position += len(data)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(stories), len(SECTIONS)))
+        f.writelines(table)
+        f.writelines(blobs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(stories)
+
+
+class StorySnapshot:
+    """Read-only view over a mapped snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mm)
+        magic, version, self.count, n_sections = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a story snapshot: {path}")
+
+        self._sections = {}
+        self._section_offsets = {}
+        for i, name in enumerate(SECTIONS[:n_sections]):
+            offset, length = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+            self._sections[name] = view[offset:offset + length]
+            self._section_offsets[name] = offset
+
+        self._formats = self._sections["formats"]
+        self._title_offsets = self._sections["title_offsets"].cast("Q")
+        self._titles_base = self._section_offsets["titles"]
+        self._body_offsets = self._sections["body_offsets"].cast("Q")
+        self._bodies = self._sections["bodies"]
+        self._id_offsets = self._sections["id_offsets"].cast("Q")
+        self._ids = self._sections["ids"]
+        self._id_rows = self._sections["id_rows"].cast("Q")
+        related = self._sections.get("related_rows")
+        self._related = related.cast("I") if related else None
+        self.related_k = (
+            len(self._related) // self.count if self._related and self.count else 0
+        )
+
+    def body(self, row: int) -> bytes:
+        return bytes(self._bodies[self._body_offsets[row]:self._body_offsets[row + 1]])
+
+    def row(self, row: int) -> dict[str, Any]:
+        return json.loads(self.body(row))
+
+    def iter_rows(self) -> Iterator[dict[str, Any]]:
+        for row in range(self.count):
+            yield self.row(row)
+
+    def iter_ids(self) -> Iterator[tuple[str, int]]:
+        """(story id, row number) for every row, in id order, without parsing bodies."""
+        offsets, ids = self._id_offsets, self._ids
+        for i in range(self.count):
+            yield bytes(ids[offsets[i]:offsets[i + 1]]).decode(), self._id_rows[i]
+
+    def find(self, story_id: str) -> Optional[int]:
+        """Binary-search the sorted id section; returns the row number or None."""
+        target = story_id.encode()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._id(lo) == target:
+            return self._id_rows[lo]
+        return None
+
+    def _id(self, i: int) -> bytes:
+        """The i-th id of the sorted id section."""
+        return bytes(self._ids[self._id_offsets[i]:self._id_offsets[i + 1]])
+
+    def get_body(self, story_id: str) -> Optional[bytes]:
+        row = self.find(story_id)
+        return None if row is None else self.body(row)
+
+    def related_rows(self, row: int, limit: int) -> list[int]:
+        """
+        Precomputed neighbours of a row, best first (empty if the snapshot has
+        none).
+        """
+        k = self.related_k
+        if not k:
+            return []
+        limit = min(limit, k)
+        return [r for r in self._related[row * k : row * k + limit] if r != NO_ROW]
+
+    def related_json(self, story_id: str, limit: int) -> Optional[bytes]:
+        """
+        Assemble a RelatedStoriesResponse body, or None if the story isn't in
+        the snapshot.
+        """
+        row = self.find(story_id)
+        if row is None:
+            return None
+        rows = self.related_rows(row, limit)
+        return (b'{"story_id":' + json.dumps(story_id).encode()
+                + b',"data":[' + b",".join(self.body(r) for r in rows) + b"]}")
+
+    def matching_rows(
+        self,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        exclude: Optional[frozenset[int]] = None,
+    ) -> list[int]:
+        """
+        Row numbers (newest first) matching the router's category/search
+        filters, minus `exclude`.
+        """
+        fmt = CATEGORY_FORMATS.get(category)
+        code = FORMAT_CODES[fmt] if fmt else None
+
+        if search:
+            rows = self._search_titles(search.lower().encode())
+        else:
+            rows = range(self.count)
+
+        if code is not None:
+            formats = self._formats
+            rows = [row for row in rows if formats[row] == code]
+        if exclude:
+            return [row for row in rows if row not in exclude]
+        return list(rows)
+
+    def _search_titles(self, needle: bytes) -> list[int]:
+        """Substring search over the whole titles section straight from the mapping."""
+        base = self._titles_base
+        end = base + self._title_offsets[self.count]
+        offsets = self._title_offsets
+        rows = []
+        pos = self._mm.find(needle, base, end)
+        while pos != -1:
+            rel = pos - base
+            row = bisect_right(offsets, rel) - 1
+            # A match must not straddle two titles
+            if rel + len(needle) <= offsets[row + 1]:
+                rows.append(row)
+                pos = self._mm.find(needle, base + offsets[row + 1], end)
+            else:
+                pos = self._mm.find(needle, pos + 1, end)
+        return rows
+
+    def page_rows(
+        self,
+        page: int,
+        limit: int,
+        category: Optional[str],
+        search: Optional[str],
+        exclude: Optional[frozenset[int]] = None,
+    ) -> tuple[list[int], int]:
+        rows = self.matching_rows(category, search, exclude)
+        offset = (page - 1) * limit
+        return rows[offset:offset + limit], len(rows)
+
+    def page_json(
+        self,
+        page: int,
+        limit: int,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        exclude: Optional[frozenset[int]] = None,
+    ) -> bytes:
+        """Assemble a PaginatedStoriesResponse body from pre-serialized rows."""
+        rows, total = self.page_rows(page, limit, category, search, exclude)
+        envelope = json.dumps(
+            {"total": total, "page": page, "limit": limit,
+             "has_more": page * limit < total},
+            separators=(",", ":"),
+        ).encode()
+        data = b",".join(self.body(r) for r in rows)
+        return b'{"data":[' + data + b"]," + envelope[1:]
+
+    def page(
+        self,
+        page: int,
+        limit: int,
+        category: Optional[str] = None,
+        search: Optional[str] = None,
+        exclude: Optional[frozenset[int]] = None,
+    ) -> dict[str, Any]:
+        """Return a page in PaginatedStoriesResponse shape, as plain dicts."""
+        rows, total = self.page_rows(page, limit, category, search, exclude)
+        return {
+            "data": [self.row(r) for r in rows],
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "has_more": page * limit < total,
+        }
+
+
+class SnapshotReader:
+    """
+    Holds the current StorySnapshot and remaps it after an atomic swap.
+
+    The file is stat'ed at most once per `check_interval` seconds, so the hot
+    path is a timestamp comparison.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot: Optional[StorySnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[StorySnapshot]:
+        if not self.path:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._snapshot = None
+                return None
+
+            current = self._snapshot
+            changed = current is None or (st.st_ino, st.st_mtime_ns) != (
+                current.stat.st_ino, current.stat.st_mtime_ns)
+            if changed:
+                try:
+                    self._snapshot = StorySnapshot(self.path)
+                except (OSError, ValueError) as e:
+                    print(f"Error loading story snapshot: {e}")
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """Force a stat on the next access, e.g. right after writing a new snapshot."""
+        self._checked_at = 0.0
+
+
+snapshot_reader = SnapshotReader(
+    settings.SNAPSHOT_PATH, settings.SNAPSHOT_CHECK_INTERVAL
+)
@@ -0,0 +1,95 @@
+"""
+Bounded, non-blocking execution of chatbot and MCP tools.
+
+Tools run in a small thread pool, never on the event loop, each with a
+timeout (TOOL_TIMEOUTS, else TOOL_TIMEOUT_SECONDS). A call that times out
+is abandoned by its caller, but its thread can't be killed, so it keeps its
+slot until it really finishes: at most TOOL_MAX_PENDING calls are running
+or queued at once, and further calls fail fast with ToolBusy instead of
+piling up behind stuck ones. Tools are expected to bound their own CPU cost
+(see calculator.py); the pool only keeps one slow call from holding up
+every other user.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.config import settings
+from app.metrics import tool_metrics
+
+# Per-tool timeouts in seconds; other tools get TOOL_TIMEOUT_SECONDS
+TOOL_TIMEOUTS = {
+    "get_current_time": 1.0,
+    "get_app_info": 1.0,
+    "search_help": 1.0,
+    "calculate": 1.0,
+}
+
+
+class ToolTimeout(Exception):
+    """A tool did not finish within its timeout."""
+
+
+class ToolBusy(Exception):
+    """Too many tool calls are running or queued."""
+
+
+class ToolExecutor:
+    def __init__(self, max_workers: int, max_pending: int, default_timeout: float,
+                 timeouts: Optional[dict[str, float]] = None):
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix="tool")
+        self._slots = threading.BoundedSemaphore(max(max_pending, max_workers))
+        self.timed_out = 0
+        self.rejected = 0
+
+    def timeout_for(self, tool: str) -> float:
+        return self.timeouts.get(tool, self.default_timeout)
+
+    async def run(self, tool: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run fn(*args) in the pool; raises ToolBusy or ToolTimeout. Recorded in
+        tool_metrics.
+        """
+        started = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            tool_metrics.record(tool, 0.0, "busy")
+            raise ToolBusy(
+                f"Too many tool calls in progress, try again shortly ({tool})")
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is freed when the call ends, not when its caller gives up
+        future.add_done_callback(lambda _: self._slots.release())
+
+        timeout = self.timeout_for(tool)
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            outcome = "timeout"
+            raise ToolTimeout(f"{tool} did not finish within {timeout:g}s") from None
+        finally:
+            tool_metrics.record(tool, (time.perf_counter() - started) * 1000, outcome)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+tool_executor = ToolExecutor(
+    max_workers=settings.TOOL_WORKERS,
+    max_pending=settings.TOOL_MAX_PENDING,
+    default_timeout=settings.TOOL_TIMEOUT_SECONDS,
+    timeouts=TOOL_TIMEOUTS,
+)
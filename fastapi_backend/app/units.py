@@ -0,0 +1,35 @@
+"""
+Distances and times as the story indexes compare them: great-circle
+kilometres and seconds since the epoch. Shared by dedupe.py, related.py,
+search_index.py and the ingestion watermark; imports nothing from the app.
+"""
+
+import math
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(dlon / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def to_seconds(value: Any) -> Optional[float]:
+    """Datetime, ISO string or number to seconds since epoch (None if unknown)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
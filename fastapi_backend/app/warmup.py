@@ -0,0 +1,61 @@
+"""Startup warm-up so fresh instances don't serve their first requests cold."""
+
+import asyncio
+
+from fastapi import FastAPI
+
+from app import schemas
+from app.cache import response_cache
+from app.config import settings
+from app.fetch_stories import supabase, TABLE_NAME
+from app.routes.stories import story_page_payload, story_payload
+from app.search_index import refresh_search_index
+from app.snapshot import snapshot_reader
+
+
+def open_connections() -> None:
+    """Open the Supabase HTTP connection pool and map the shared snapshot."""
+    supabase.table(TABLE_NAME).select("id").limit(1).execute()
+    snapshot_reader.get()
+
+
+def build_serializers() -> None:
+    """Run the response models once so their validators and serializers are built."""
+    story = schemas.StoryRead(
+        story_id="warmup", id="warmup", title="", format="raw",
+        created_at="", updated_at="",
+    )
+    schemas.PaginatedStoriesResponse(
+        data=[story], total=1, page=1, limit=1, has_more=False
+    ).model_dump_json()
+
+
+def warm_read_caches() -> None:
+    """Drop cached story responses; rebuild the first gallery pages and hot stories."""
+    response_cache.clear()
+    hot_ids: list[str] = []
+    for page in range(1, settings.WARMUP_PAGES + 1):
+        payload = story_page_payload(page, settings.WARMUP_PAGE_SIZE)
+        if len(hot_ids) < settings.WARMUP_HOT_STORIES:
+            listing = schemas.PaginatedStoriesResponse.model_validate_json(payload.body)
+            hot_ids.extend(story.id for story in listing.data)
+
+    for story_id in hot_ids[:settings.WARMUP_HOT_STORIES]:
+        story_payload(story_id)
+
+
+async def warm_up(app: FastAPI) -> None:
+    """Run every warm-up step off the event loop, then mark the app ready."""
+    try:
+        await asyncio.to_thread(build_serializers)
+        await asyncio.to_thread(app.openapi)
+        await asyncio.to_thread(open_connections)
+        await asyncio.to_thread(warm_read_caches)
+        # Chat and MCP lookups then only add new stories, never build the index cold
+        await asyncio.to_thread(refresh_search_index)
+        print("✓ Warm-up complete")
+    except Exception as e:
+        # A cold cache is still better than an instance that never becomes ready
+        print(f"Warm-up failed, serving cold: {e}")
+    finally:
+        app.state.ready = True
@@ -0,0 +1,88 @@
+"""Content-negotiated wire formats for bulk story listings."""
+
+import json
+from typing import Any, Optional
+
+from app.compression import parse_qvalues
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; columnar JSON is always available
+    msgpack = None
+
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.planet.columnar+json"
+MSGPACK = "application/msgpack"
+
+# Accept values mapped to the format they select
+MEDIA_TYPES = {
+    JSON: JSON,
+    COLUMNAR_JSON: COLUMNAR_JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+}
+
+# Fields sent in compact formats. Client-only fields (always null from the
+# backend), the duplicated story_id and the derived story_metadata are dropped.
+COMPACT_FIELDS = [
+    "id",
+    "title",
+    "format",
+    "author",
+    "created_at",
+    "updated_at",
+    "center_long",
+    "center_lat",
+    "view_link",
+]
+
+
+def supported_formats() -> list[str]:
+    formats = [JSON, COLUMNAR_JSON]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    return formats
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Pick the response format from an Accept header.
+
+    Falls back to plain JSON, so browsers and existing clients are unaffected.
+    """
+    if not accept:
+        return JSON
+
+    supported = supported_formats()
+    best, best_q = JSON, 0.0
+    for token, q in parse_qvalues(accept).items():
+        fmt = MEDIA_TYPES.get(token)
+        if fmt is not None and fmt in supported and q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def to_columns(
+    rows: list[dict[str, Any]], fields: list[str] = COMPACT_FIELDS
+) -> dict[str, list[Any]]:
+    """Pivot a list of row dicts into one array per field."""
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def encode_columnar(
+    page: dict[str, Any], rows_key: str = "data", fmt: str = COLUMNAR_JSON
+) -> bytes:
+    """
+    Encode a paginated response with its rows pivoted into columns.
+
+    The envelope fields (total, page, limit, ...) are kept as-is, and the row
+    list is replaced by `{"columns": [...], "data": {field: [...]}}`.
+    """
+    body = {key: value for key, value in page.items() if key != rows_key}
+    body["columns"] = COMPACT_FIELDS
+    body[rows_key] = to_columns(page[rows_key])
+
+    if fmt == MSGPACK:
+        return msgpack.packb(body, use_bin_type=True)
+    return json.dumps(body, separators=(",", ":"), default=str).encode()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark response compression for typical story list page sizes.
+
+Compares CPU cost and bytes saved for gzip and brotli (if installed), and
+shows the cost of serving a precompressed cached payload.
+
+Usage:
+    python scripts/benchmark_compression.py [--repeat 200]
+"""
+
+import sys
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.compression import CompressedPayload, available_encodings, compress
+
+PAGE_SIZES = [12, 24, 48, 500]
+
+
+def synthetic_story(i: int) -> dict:
+    """Build a story shaped like a StoryRead response row."""
+    story_id = f"story-{i:06d}-{random.getrandbits(40):010x}"
+    lon = round(random.uniform(-180, 180), 7)
+    lat = round(random.uniform(-90, 90), 7)
+    month, day = random.randint(1, 12), random.randint(1, 28)
+    created = f"2025-{month:02d}-{day:02d}T12:00:00.000Z"
+    author = random.choice(
+        ["EDITH PALAFOX", "GeoYons Teledeteccion", "Planet Labs", None]
+    )
+    return {
+        "story_id": story_id,
+        "id": story_id,
+        "title": f"Story {i} over region {random.randint(1, 500)}",
+        "format": random.choice(["raw", "mp4"]),
+        "author": author,
+        "created_at": created,
+        "updated_at": created,
+        "center_long": lon,
+        "center_lat": lat,
+        "view_link": f"https://www.planet.com/stories/{story_id}",
+        "category": None,
+        "thumbnail_url": None,
+        "image_url": None,
+        "location": None,
+        "description": None,
+        "user_id": None,
+        "story_metadata": {
+            "author": author,
+            "format": "raw",
+            "center": [lon, lat],
+            "view_link": f"https://www.planet.com/stories/{story_id}",
+        },
+    }
+
+
+def synthetic_page(size: int) -> bytes:
+    stories = [synthetic_story(i) for i in range(size)]
+    body = {"data": stories, "total": 10000, "page": 1, "limit": size, "has_more": True}
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+def time_per_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark story response compression")
+    parser.add_argument(
+        "--repeat", type=int, default=200,
+        help="Iterations per measurement (default: 200)",
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(
+        f"{'stories':>8} {'raw bytes':>10} {'coding':>7} {'bytes':>9} "
+        f"{'saved':>7} {'compress':>10} {'cached':>9}"
+    )
+
+    for size in PAGE_SIZES:
+        body = synthetic_page(size)
+        for encoding in available_encodings():
+            compressed = compress(body, encoding)
+            cold = time_per_call(
+                lambda body=body, encoding=encoding: compress(body, encoding),
+                args.repeat,
+            )
+
+            payload = CompressedPayload(body).precompress(0)
+            warm = time_per_call(
+                lambda payload=payload, encoding=encoding: payload.variant(encoding),
+                args.repeat,
+            )
+
+            saved = 1 - len(compressed) / len(body)
+            print(
+                f"{size:>8} {len(body):>10} {encoding:>7} {len(compressed):>9} "
+                f"{saved:>6.1%} {cold * 1e6:>8.1f}us {warm * 1e6:>7.2f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Script to build the related-stories neighbour lists from the story table
+and write them into the shared snapshot (SNAPSHOT_PATH).
+
+The ingesting worker keeps the lists up to date after this, adding only new
+stories each cycle; run this for the initial build or after bulk imports.
+
+Usage:
+    python scripts/build_related.py [--story STORY_ID]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.fetch_stories import fetch_all_rows
+from app.related import RelatedIndex
+from app.routes.stories import transform_story
+from app.snapshot import write_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build related-story lists and write them into the story snapshot"
+    )
+    parser.add_argument(
+        "--story",
+        help="Print the related stories of this story id after building"
+    )
+    args = parser.parse_args()
+
+    if not settings.SNAPSHOT_PATH:
+        print("❌ SNAPSHOT_PATH is not set")
+        sys.exit(1)
+
+    print("🔄 Reading the story table from Supabase...")
+    stories = [transform_story(row) for row in fetch_all_rows()]
+    print(f"📦 Retrieved {len(stories)} stories")
+
+    started = time.perf_counter()
+    related_index = RelatedIndex(settings.RELATED_K)
+    related_index.update(stories)
+    seconds = time.perf_counter() - started
+    print(f"🔗 Indexed {len(related_index)} stories in {seconds:.1f}s "
+          f"(top {related_index.k} each)")
+
+    count = write_snapshot(stories, settings.SNAPSHOT_PATH, related_index)
+    print(f"🗂️  Wrote {count} stories to {settings.SNAPSHOT_PATH}")
+
+    if args.story:
+        titles = {story["id"]: story["title"] for story in stories}
+        for story_id, score in related_index.neighbours(args.story):
+            print(f"   {score:.3f}  {story_id}  {titles.get(story_id)}")
+
+
+if __name__ == "__main__":
+    main()
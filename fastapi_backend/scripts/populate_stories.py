@@ -3,7 +3,7 @@
 Script to fetch stories from Planet.com API and populate Supabase database.
 
 Usage:
-    python scripts/populate_stories.py [--limit 20]
+    python scripts/populate_stories.py [--limit 20] [--snapshot]
 """
 
 import sys
@@ -26,6 +26,11 @@ def main():
         default=20,
         help="Number of stories to fetch (default: 20)"
     )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Rebuild the shared story snapshot (SNAPSHOT_PATH) after storing"
+    )
     args = parser.parse_args()
 
     print(f"🔄 Fetching {args.limit} stories from Planet.com API...")
@@ -36,6 +41,11 @@ def main():
         print(f"📦 Retrieved {len(stories)} stories")
         store_stories(stories)
         print("✅ Stories successfully stored in Supabase!")
+
+        if args.snapshot:
+            from app.scheduler import rebuild_snapshot
+            count = rebuild_snapshot()
+            print(f"🗂️  Wrote {count} stories to the shared snapshot")
     else:
         print("❌ Failed to fetch stories")
         sys.exit(1)
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from app.calculator import MAX_EXPRESSION_LENGTH, CalculationError, evaluate
+from app.mcp_server import calculate_impl
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2 + 2", 4),
+    ("(3 + 4) * 2", 14),
+    ("7 / 2", 3.5),
+    ("7 // 2", 3),
+    ("7 % 4", 3),
+    ("-2 ** 2", -4),
+    ("2 ** 10", 1024),
+    ("2 ** -1", 0.5),
+])
+def test_evaluates_arithmetic(expression, expected):
+    assert evaluate(expression) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "9**9**9",
+    "10 ** 5000",
+    "(2 ** 4000) * (2 ** 4000)",
+    "99999999999 ** 999",
+])
+def test_rejects_huge_results_before_computing(expression):
+    started = time.perf_counter()
+    with pytest.raises(CalculationError, match="too large"):
+        evaluate(expression)
+    assert time.perf_counter() - started < 0.1
+
+
+def test_float_overflow_is_an_error():
+    with pytest.raises(CalculationError, match="too large"):
+        evaluate("10.0 ** 400")
+
+
+def test_complex_result_is_an_error():
+    with pytest.raises(CalculationError, match="not a real number"):
+        evaluate("(-8) ** 0.5")
+
+
+@pytest.mark.parametrize("expression", ["1 / 0", "1 // 0", "5 % 0"])
+def test_division_by_zero(expression):
+    with pytest.raises(CalculationError, match="Division by zero"):
+        evaluate(expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('true')",
+    "abs(-1)",
+    "x + 1",
+    "[1, 2]",
+    "1 if 1 else 2",
+    "(1).real",
+    "'a' * 3",
+    "True + 1",
+    "1 < 2",
+    "lambda: 1",
+])
+def test_rejects_non_arithmetic(expression):
+    with pytest.raises(CalculationError):
+        evaluate(expression)
+
+
+def test_rejects_syntax_errors():
+    with pytest.raises(CalculationError, match="Not a valid expression"):
+        evaluate("2 +")
+
+
+def test_rejects_long_expressions():
+    with pytest.raises(CalculationError, match="longer than"):
+        evaluate("1+" * MAX_EXPRESSION_LENGTH + "1")
+    with pytest.raises(CalculationError, match="too long"):
+        evaluate("+".join(["1"] * 40))
+
+
+def test_calculate_tool_reports_errors_as_text():
+    assert calculate_impl("6 * 7") == "Result: 42"
+    assert calculate_impl("9**9**9").startswith("Error:")
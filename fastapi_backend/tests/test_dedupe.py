@@ -0,0 +1,116 @@
+import threading
+import time
+import zlib
+
+from app.cache import SourceCache
+from app.dedupe import BINS, DedupeIndex, duplicate_rows, signature, similarity
+from app.units import haversine_km, to_seconds
+
+DAY = 86400
+
+
+def story(story_id, title, created="2025-03-01T10:00:00Z", lon=10.0, lat=45.0,
+          description=None):
+    return {"id": story_id, "title": title, "description": description,
+            "center_long": lon, "center_lat": lat, "created_at": created}
+
+
+def test_signature_ignores_case_punctuation_and_numbers():
+    assert signature("Wildfire near Lyon, 2023") == signature("WILDFIRE near lyon 2024")
+    assert len(signature("Wildfire")) == BINS
+    assert signature(None) is None
+    assert signature("  ...  ") is None
+
+
+def test_signature_matches_the_viewer_server_copy():
+    # story-analysis/viewer-server/tests/test_dedupe.py pins the same value
+    sig = signature("Wildfire near Lyon, 2023", "Smoke over the Rhone valley")
+    assert sig[:4] == (36221080, 35064922, 17688677, 16556889)
+    assert zlib.crc32(repr(sig).encode()) == 2304290133
+
+
+def test_similarity_estimates_overlap():
+    a = signature("Glacier retreat in the Swiss Alps")
+    assert similarity(a, a) == 1.0
+    assert similarity(a, signature("Volcanic eruption over Iceland")) < 0.3
+
+
+def test_haversine_km():
+    assert haversine_km(0, 0, 0, 0) == 0
+    assert abs(haversine_km(2.3522, 48.8566, -0.1276, 51.5072) - 343.5) < 1
+    assert abs(haversine_km(179.5, 0, -179.5, 0) - 111.2) < 0.1
+
+
+def test_to_seconds():
+    assert to_seconds("1970-01-02T00:00:00Z") == DAY
+    assert to_seconds("1970-01-02T00:00:00+00:00") == DAY
+    assert to_seconds(5) == 5.0
+    assert to_seconds("not a date") is None
+    assert to_seconds(None) is None
+
+
+def test_merges_reposts_and_keeps_the_newest():
+    index = DedupeIndex()
+    title = "Flooding along the Po river delta"
+    index.add("old", signature(title), 12.0, 45.0, 0)
+    index.add("new", signature(title + " 2024"), 12.05, 45.02, 10 * DAY)
+    other = signature("Sea ice breaking up near Svalbard")
+    index.add("other", other, 12.0, 45.0, 5 * DAY)
+    assert index.duplicates() == {"old": "new"}
+    assert index.representative("old") == "new"
+    assert index.clusters() == [["new", "old"]]
+
+
+def test_same_title_far_apart_or_long_after_is_not_a_duplicate():
+    index = DedupeIndex()
+    sig = signature("Harbor expansion seen from orbit")
+    index.add("a", sig, 0.0, 0.0, 0)
+    index.add("far", sig, 5.0, 0.0, 0)
+    index.add("later", sig, 0.0, 0.0, 365 * DAY)
+    index.add("nowhere", sig, None, None, 0)
+    assert index.duplicates() == {}
+
+
+def test_adding_a_known_key_is_ignored():
+    index = DedupeIndex()
+    index.add("a", signature("Dam construction"), 0.0, 0.0, 0)
+    index.add("a", signature("Something else"), 0.0, 0.0, 0)
+    assert len(index) == 1
+
+
+def test_duplicate_rows_of_a_newest_first_listing():
+    stories = [
+        story("s3", "Wildfire burns near Marseille 2024", "2025-03-20T10:00:00Z"),
+        story("s2", "Desert bloom in the Atacama", "2025-03-10T10:00:00Z", -70, -24),
+        story("s1", "Wildfire burns near Marseille 2023", "2025-03-01T10:00:00Z"),
+    ]
+    assert duplicate_rows(stories) == frozenset({2})
+
+
+def test_common_titles_stay_subquadratic():
+    index = DedupeIndex()
+    sig = signature("Untitled")
+    for i in range(2000):
+        index.add(i, sig, float(i % 180), 0.0, i)
+    assert index.compared <= 2000 * 16
+
+
+def test_peek_builds_in_the_background():
+    cache = SourceCache()
+    release = threading.Event()
+
+    def load():
+        release.wait()
+        return "index"
+
+    started = time.perf_counter()
+    assert cache.peek("snapshot", load) is None
+    assert cache.peek("snapshot", load) is None
+    assert time.perf_counter() - started < 0.5
+    release.set()
+    deadline = time.monotonic() + 2
+    while cache.peek("snapshot", load) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.peek("snapshot", load) == "index"
+    # Another source is not served the old value
+    assert cache.peek("new snapshot", lambda: "new index") is None
@@ -0,0 +1,125 @@
+import asyncio
+
+from app import fetch_stories, scheduler
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def serve(monkeypatch, *pages):
+    pages = list(pages)
+    monkeypatch.setattr(
+        fetch_stories.requests,
+        "get",
+        lambda *args, **kwargs: FakeResponse(pages.pop(0)),
+    )
+
+
+def test_watermark_compares_instants_not_strings(monkeypatch):
+    # Supabase's "+00:00" sorts after the API's "Z" as text, but it is the same instant
+    serve(monkeypatch, {"data": [
+        {"id": "new", "created": "2025-01-01T00:00:01Z"},
+        {"id": "stored", "created": "2025-01-01T00:00:00Z"},
+        {"id": "old", "created": "2024-12-31T23:00:00Z"},
+    ], "more": True})
+    stories, cursor = fetch_stories.fetch_stories_since("2025-01-01T00:00:00+00:00")
+    assert [s["id"] for s in stories] == ["new"]
+    assert cursor is None
+
+
+def test_watermark_pages_until_an_older_story(monkeypatch):
+    serve(monkeypatch,
+          {"data": [{"id": "a", "created": "2025-02-02T00:00:00Z"}], "more": True},
+          {"data": [{"id": "b", "created": "2025-02-01T00:00:00Z"},
+                    {"id": "c", "created": "2025-01-01T00:00:00.000Z"}], "more": True})
+    stories, cursor = fetch_stories.fetch_stories_since("2025-01-01T00:00:00+00:00")
+    assert [s["id"] for s in stories] == ["a", "b"]
+    assert cursor is None
+
+
+def test_page_cap_returns_a_cursor_to_resume_from(monkeypatch):
+    serve(monkeypatch,
+          {"data": [{"id": "a", "created": "2025-02-03T00:00:00Z"}], "more": True},
+          {"data": [{"id": "b", "created": "2025-02-02T00:00:00Z"}], "more": True})
+    stories, cursor = fetch_stories.fetch_stories_since(
+        "2025-01-01T00:00:00Z", max_pages=2
+    )
+    assert [s["id"] for s in stories] == ["a", "b"]
+    assert cursor == "b"
+
+
+def test_scheduler_advances_to_the_newest_instant(monkeypatch, tmp_path):
+    stories = [
+        {"id": "a", "created": "2025-03-01T10:00:00+00:00"},
+        {"id": "b", "created": "2025-03-01T09:00:00Z"},
+        {"id": "c", "created": "2025-03-01T11:00:00+02:00"},
+    ]
+    monkeypatch.setattr(
+        scheduler,
+        "fetch_stories_since",
+        lambda watermark, limit, before=None: (stories, None),
+    )
+    monkeypatch.setattr(scheduler, "store_stories", len)
+    monkeypatch.setattr(scheduler, "rebuild_snapshot", lambda: 0)
+    monkeypatch.setattr(scheduler, "warm_read_caches", lambda: None)
+    ingest = scheduler.IngestionScheduler(
+        interval=60, jitter=0, lock_path=str(tmp_path / "lock"), batch_limit=10
+    )
+    ingest.watermark = "2025-02-01T00:00:00Z"
+    assert asyncio.run(ingest.run_once()) == 3
+    assert ingest.watermark == "2025-03-01T10:00:00+00:00"
+
+
+def test_scheduler_keeps_the_watermark_until_a_capped_scan_finishes(
+    monkeypatch, tmp_path
+):
+    # Newest first, two pages per cycle: "d" and "c" fit in the first cycle
+    feed = [
+        {"id": "d", "created": "2025-03-04T00:00:00Z"},
+        {"id": "c", "created": "2025-03-03T00:00:00Z"},
+        {"id": "b", "created": "2025-03-02T00:00:00Z"},
+        {"id": "a", "created": "2025-03-01T00:00:00Z"},
+    ]
+    pages = {None: feed[0:1], "d": feed[1:2], "c": feed[2:3], "b": feed[3:4]}
+
+    def get(url, params, timeout):
+        page = pages[params.get("before")]
+        return FakeResponse({"data": page, "more": page[-1]["id"] != "a"})
+
+    monkeypatch.setattr(fetch_stories.requests, "get", get)
+    stored = []
+    monkeypatch.setattr(
+        scheduler,
+        "fetch_stories_since",
+        lambda watermark, limit, before=None: fetch_stories.fetch_stories_since(
+            watermark, limit, max_pages=2, before=before
+        ),
+    )
+    monkeypatch.setattr(
+        scheduler,
+        "store_stories",
+        lambda page: stored.extend(s["id"] for s in page) or len(page),
+    )
+    monkeypatch.setattr(scheduler, "rebuild_snapshot", lambda: 0)
+    monkeypatch.setattr(scheduler, "warm_read_caches", lambda: None)
+    ingest = scheduler.IngestionScheduler(
+        interval=60, jitter=0, lock_path=str(tmp_path / "lock"), batch_limit=1
+    )
+    ingest.watermark = "2025-02-01T00:00:00Z"
+
+    assert asyncio.run(ingest.run_once()) == 2
+    assert ingest.watermark == "2025-02-01T00:00:00Z"
+    assert ingest.resume_cursor == "c"
+
+    assert asyncio.run(ingest.run_once()) == 2
+    assert stored == ["d", "c", "b", "a"]
+    assert ingest.resume_cursor is None
+    assert ingest.watermark == "2025-03-04T00:00:00Z"
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.intents import DEFAULT_INTENT, IntentRouter, intent_router, load_intents
+from app.main import app
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("what is 2+2", "calculate"),
+    ("What's 6 * 7?", "calculate"),
+    ("calculate 3 * (4-1)", "calculate"),
+    ("12 - 4", "calculate"),
+    ("12/4", "calculate"),
+    ("what is 1990-1985", "calculate"),
+    ("what is 2020-2021", "calculate"),
+    ("calculate 2020 - 2021", "calculate"),
+    ("what is 9/11", "calculate"),
+    ("2020-2021", "calculate"),
+    ("stories from 2020-2021", "search_stories"),
+    ("images from 2019/2020", "search_stories"),
+    ("video of 9/11", "search_stories"),
+    ("show me wildfire stories near California", "search_stories"),
+    ("fires on 2024-05-01", DEFAULT_INTENT),
+    ("floods 05/01/2024", DEFAULT_INTENT),
+    ("what time is it", "get_current_time"),
+    ("what is this app about", "get_app_info"),
+    ("help with login", "search_help"),
+    ("hello there", "greeting"),
+    ("thanks!", "thanks"),
+    ("history of hiking", DEFAULT_INTENT),
+    ("what is new", DEFAULT_INTENT),
+])
+def test_routes_examples(message, intent):
+    assert intent_router.route(message)[0] == intent
+
+
+def test_phrases_match_whole_words_across_whitespace():
+    router = IntentRouter({"a": {"what time": 1}, "b": {"hi": 1}})
+    assert router.scores("WHAT   time\tis it") == {"a": 1}
+    assert router.scores("this shift") == {}
+
+
+def test_longer_phrase_wins_and_scores_add_up():
+    router = IntentRouter({"a": {"about": 1, "about the app": 3}, "b": {"app": 2}})
+    assert router.scores("about the app") == {"a": 3}
+    assert router.scores("about the app, about") == {"a": 4}
+
+
+def test_ties_go_to_the_earlier_intent():
+    router = IntentRouter({"first": {"x": 1}, "second": {"y": 1}})
+    assert router.route("y x")[0] == "first"
+    assert router.route("nothing here") == (DEFAULT_INTENT, {})
+
+
+def test_intents_extend_from_json(tmp_path):
+    path = tmp_path / "intents.json"
+    extra = {"get_current_time": {"o'clock": 3}, "weather": {"rain": 2}}
+    path.write_text(json.dumps(extra))
+    intents = load_intents(str(path))
+    assert intents["get_current_time"]["o'clock"] == 3
+    assert list(intents)[-1] == "weather"
+    router = IntentRouter(intents)
+    assert router.route("is it five o'clock")[0] == "get_current_time"
+    assert router.route("will it rain")[0] == "weather"
+
+
+def test_metrics_count_routed_intents_and_tools():
+    client = TestClient(app)
+    response = client.post("/api/v1/chatbot/chat",
+                           json={"message": "what is 1990-1985"})
+    assert response.json()["response"] == "Result: 5"
+    metrics = client.get("/api/v1/chatbot/metrics").json()
+    assert set(metrics) == {"routing", "intents", "tools", "tool_pool"}
+    assert metrics["intents"]["calculate"]["outcomes"]["ok"] >= 1
+    assert metrics["tools"]["calculate"]["latency"]["count"] >= 1
@@ -0,0 +1,69 @@
+import pytest
+
+from app import retrieval
+from app.search_index import SearchIndex
+
+STORIES = [
+    {"id": "sf", "title": "Wildfire smoke",
+     "center_long": -122.4, "center_lat": 37.8,
+     "created_at": "2025-01-01T00:00:00Z", "format": "mp4"},
+    {"id": "la", "title": "Coastal fog",
+     "center_long": -118.2, "center_lat": 34.1,
+     "created_at": "2025-02-01T00:00:00Z", "format": "mp4"},
+    {"id": "paris", "title": "Wildfire season",
+     "center_long": 2.35, "center_lat": 48.86,
+     "created_at": "2025-03-01T00:00:00Z", "format": "mp4"},
+]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = SearchIndex()
+    index.update(STORIES)
+    by_id = {story["id"]: story for story in STORIES}
+    monkeypatch.setattr(retrieval, "current_search_index", lambda: index)
+    monkeypatch.setattr(retrieval, "stories_by_id",
+                        lambda ids: {i: by_id[i] for i in ids})
+    return index
+
+
+def retrieve(question):
+    return retrieval.retrieve(retrieval.StoryQuestion(question), budget_ms=1000)
+
+
+def ids(result):
+    return [story["id"] for story in result["stories"]]
+
+
+def test_place_and_words_rank_text_matches_near_the_place(index):
+    result = retrieve("wildfire near california")
+    assert ids(result) == ["sf"]
+    assert result["complete"]
+
+
+def test_place_and_words_without_a_match_find_nothing(index):
+    result = retrieve("volcano near california")
+    assert ids(result) == []
+    assert result["complete"]
+
+
+def test_no_time_to_score_words_falls_back_to_nearest(index, monkeypatch):
+    monkeypatch.setattr(index, "search", lambda terms, allowed, deadline: ([], False))
+    result = retrieve("volcano near california")
+    assert ids(result) == ["sf", "la"]
+    assert not result["complete"]
+
+
+def test_lookups_stop_at_the_deadline(index):
+    found, complete = index.near(-119.5, 37.2, 600, deadline=0.0)
+    assert (found, complete) == ([], False)
+    docs, complete = index.newest_first(deadline=None)
+    assert [index.ids[doc] for doc in docs] == ["paris", "la", "sf"]
+    assert complete
+
+
+def test_catalogue_questions_have_something_to_retrieve_by():
+    assert retrieval.StoryQuestion("glacier").is_catalogue_question
+    assert retrieval.StoryQuestion("near california").is_catalogue_question
+    assert retrieval.StoryQuestion("what is the latest in 2024").is_catalogue_question
+    assert not retrieval.StoryQuestion("is there anything").is_catalogue_question
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import chatbot
+from app.tool_executor import ToolBusy, ToolExecutor, ToolTimeout
+
+
+def slow(seconds: float) -> str:
+    time.sleep(seconds)
+    return "done"
+
+
+def ask_time(path: str):
+    return TestClient(app).post(path, json={"message": "what time is it"})
+
+
+def test_runs_tools_in_the_pool():
+    executor = ToolExecutor(max_workers=2, max_pending=2, default_timeout=1.0)
+    try:
+        assert asyncio.run(executor.run("calculate", lambda a, b: a + b, 2, 3)) == 5
+    finally:
+        executor.shutdown()
+
+
+def test_timeout():
+    executor = ToolExecutor(max_workers=1, max_pending=2, default_timeout=5.0,
+                            timeouts={"slow": 0.05})
+    try:
+        with pytest.raises(ToolTimeout):
+            asyncio.run(executor.run("slow", slow, 0.5))
+        assert executor.timed_out == 1
+    finally:
+        executor.shutdown()
+
+
+def test_saturated_pool_fails_fast():
+    executor = ToolExecutor(max_workers=1, max_pending=1, default_timeout=5.0)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.create_task(executor.run("slow", release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ToolBusy):
+            await executor.run("calculate", lambda: 1)
+        release.set()
+        assert await blocked is True
+        # The slot is free again once the blocking call has finished
+        assert await executor.run("calculate", lambda: 1) == 1
+
+    try:
+        asyncio.run(scenario())
+        assert executor.rejected == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_abandoned_call_keeps_its_slot_until_it_finishes():
+    executor = ToolExecutor(max_workers=1, max_pending=1, default_timeout=0.05)
+    release = threading.Event()
+    try:
+        with pytest.raises(ToolTimeout):
+            asyncio.run(executor.run("slow", release.wait))
+        with pytest.raises(ToolBusy):
+            asyncio.run(executor.run("calculate", lambda: 1))
+        release.set()
+        time.sleep(0.05)
+        assert asyncio.run(executor.run("calculate", lambda: 1)) == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.fixture
+def small_executor(monkeypatch):
+    executor = ToolExecutor(max_workers=1, max_pending=1, default_timeout=0.1)
+    monkeypatch.setattr(chatbot, "tool_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+def test_chat_timeout_is_504(small_executor, monkeypatch):
+    monkeypatch.setattr(chatbot, "get_current_time_impl", lambda: slow(0.5))
+    response = ask_time("/api/v1/chatbot/chat")
+    assert response.status_code == 504
+
+
+def test_chat_saturated_pool_is_503(small_executor):
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    small_executor.default_timeout = 5.0
+    holder = threading.Thread(
+        target=lambda: asyncio.run(small_executor.run("slow", block)))
+    holder.start()
+    try:
+        assert started.wait(1)
+        response = ask_time("/api/v1/chatbot/chat")
+        assert response.status_code == 503
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_stream_reports_timeout_as_error_event(small_executor, monkeypatch):
+    monkeypatch.setattr(chatbot, "get_current_time_impl", lambda: slow(0.5))
+    response = ask_time("/api/v1/chatbot/chat/stream")
+    assert response.status_code == 200
+    assert "event: tool" in response.text
+    assert "event: error" in response.text
+    assert '"status": 504' in response.text
@@ -0,0 +1,315 @@
+'''
+one pass over the scraped stories: title language split, description dump
+and statistics, and the reports/Stats.md metrics.
+- replaces titles.py and descriptions.py, which each loaded the whole dump
+  and walked it several times.
+- the NDJSON file is split into byte ranges (cut at line boundaries) that
+  worker processes read and analyze themselves, so only results cross
+  process boundaries. ranges come back in file order, so the text outputs
+  keep the order of the input.
+- each range yields counters that are merged in the main process; medians
+  and coarser time buckets are derived from the merged counters at the end.
+- buckets and thresholds are the viewer-server rollups' (rollups.py), so
+  summary.json agrees with /api/analytics.
+- --dedupe also finds near-duplicate stories with the MinHash index the
+  viewer-server uses (its dedupe.py, a copy of the backend's): workers
+  compute the signatures, the main process indexes them.
+
+outputs (in --out-dir):
+    all.txt, eng.txt, num.txt   titles: all, "english", the rest
+    all_desc.txt                story url + description, non-empty only
+    summary.json                counts, timeline, description lengths, authors, geo
+    duplicates.json             with --dedupe: clusters of near-duplicate ids,
+                                kept story first
+
+Usage: python analyze.py [IN_FILE] [--out-dir out] [--workers N] [--dedupe]
+'''
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "..", "viewer-server"))
+
+import dedupe
+from rollups import DESCRIPTION_BUCKET, GEO_CELL_DEG, INTERESTING_LENGTH, INTERVALS
+
+INPUT_FILE = "planet_stories.ndjson"  # one story per line, from scrape.py
+OUT_DIR = "out"
+RANGE_BYTES = 4 << 20
+STORY_URL = "https://www.planet.com/stories/"
+
+TEXT_OUTPUTS = {"all": "all.txt", "eng": "eng.txt", "num": "num.txt",
+                "desc": "all_desc.txt"}
+SUMMARY_FILE = "summary.json"
+DUPLICATES_FILE = "duplicates.json"
+
+
+def naive_lang_detect(st):
+    '''"english detection", based on length and letter ratio'''
+    if len(st) < 5:
+        return False
+
+    char_ratio = sum(c.isalpha() for c in st) / len(st)
+    if (char_ratio < 0.44):
+        return False
+
+    return True
+
+
+def byte_ranges(path, size=RANGE_BYTES):
+    length = os.path.getsize(path)
+    return [(start, min(start + size, length)) for start in range(0, length, size)]
+
+
+def read_range(path, start, end):
+    '''lines that start within [start, end)'''
+    with open(path, "rb") as f:
+        if start:
+            # the line straddling start belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                return
+            yield line
+
+
+def analyze_range(path, start, end, signatures=False):
+    '''
+    worker: text outputs and counters for the stories of one byte range, and
+    their dedupe entries (id, signature, lon, lat, created) if signatures
+    '''
+    text = {name: [] for name in TEXT_OUTPUTS}
+    counts = Counter()
+    days, lengths, authors, cells = Counter(), Counter(), Counter(), Counter()
+    entries = []
+
+    for line in read_range(path, start, end):
+        if not line.strip():
+            continue
+        story = json.loads(line)
+        counts["stories"] += 1
+        counts["bytes"] += len(line)
+
+        title = story.get("title") or ""
+        text["all"].append(title)
+        if naive_lang_detect(title):
+            text["eng"].append(title)
+        else:
+            text["num"].append(title)
+
+        description = story.get("description") or ""
+        lengths[len(description)] += 1
+        counts["interesting"] += len(description) > INTERESTING_LENGTH
+        if description.strip():
+            counts["with_description"] += 1
+            url = (STORY_URL + story.get("id", "")).rjust(100)
+            text["desc"].append(f'{url}: {description!r}')
+
+        created = story.get("created")
+        if isinstance(created, str) and len(created) >= 10:
+            days[created[:10]] += 1
+
+        if story.get("author") is not None:
+            authors[story["author"]] += 1
+
+        center = story.get("center")
+        if isinstance(center, list) and len(center) >= 2 and None not in center[:2]:
+            lon, lat = center[0], center[1]
+            cells[(math.floor(lon / GEO_CELL_DEG) * GEO_CELL_DEG,
+                   math.floor(lat / GEO_CELL_DEG) * GEO_CELL_DEG)] += 1
+        else:
+            lon = lat = None
+            counts["without_location"] += 1
+
+        if signatures:
+            entries.append((story.get("id"), dedupe.signature(title, description),
+                            lon, lat, dedupe.to_seconds(created)))
+
+    return text, counts, days, lengths, authors, cells, entries
+
+
+def analyzed_ranges(path, workers, signatures=False):
+    '''
+    analyze_range results in file order, with at most 2 ranges per worker
+    in flight
+    '''
+    ranges = byte_ranges(path)
+    if workers <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            yield analyze_range(path, start, end, signatures)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for start, end in ranges:
+            pending.append(pool.submit(analyze_range, path, start, end, signatures))
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def median(counter):
+    '''median of the values counted by counter ({value: occurrences})'''
+    total = sum(counter.values())
+    if not total:
+        return None
+    # 0-based positions of the middle value(s) in sorted order
+    lower, upper = (total - 1) // 2, total // 2
+    found = []
+    seen = 0
+    for value in sorted(counter):
+        seen += counter[value]
+        while len(found) < 2 and seen > (lower, upper)[len(found)]:
+            found.append(value)
+        if len(found) == 2:
+            return (found[0] + found[1]) / 2
+
+
+def bucket(day, interval):
+    '''start of the interval containing day, like date_trunc'''
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    if interval == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def timeline(days):
+    result = {}
+    for interval in INTERVALS:
+        buckets = Counter()
+        for day, stories in days.items():
+            try:
+                key = bucket(date.fromisoformat(day), interval).isoformat()
+                buckets[key] += stories
+            except ValueError:
+                continue
+        result[interval] = {
+            "median_stories": median(Counter(buckets.values())),
+            "buckets": [{"bucket": b, "stories": buckets[b]} for b in sorted(buckets)],
+        }
+    return result
+
+
+def most_first(counter):
+    '''counter items by descending count, ties by key'''
+    return sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+
+
+def summarize(path, counts, days, lengths, authors, cells, seconds):
+    stories = counts["stories"]
+    histogram = Counter()
+    for length, n in lengths.items():
+        histogram[length // DESCRIPTION_BUCKET * DESCRIPTION_BUCKET] += n
+    return {
+        "input": os.path.abspath(path),
+        "seconds": round(seconds, 2),
+        "stories": stories,
+        "bytes": counts["bytes"],
+        "mean_story_bytes": round(counts["bytes"] / stories, 1) if stories else None,
+        "titles": {"english": counts["eng"], "other": counts["num"]},
+        "descriptions": {
+            "with_description": counts["with_description"],
+            "interesting": counts["interesting"],
+            "interesting_length": INTERESTING_LENGTH,
+            "median_length": median(lengths),
+            "bucket": DESCRIPTION_BUCKET,
+            "histogram": [{"min_length": b, "stories": histogram[b]}
+                          for b in sorted(histogram)],
+        },
+        "created": {
+            "min": min(days) if days else None,
+            "max": max(days) if days else None,
+            "undated": stories - sum(days.values()),
+        },
+        "timeline": timeline(days),
+        "authors": {
+            "unique": len(authors),
+            "stories": [{"author": a, "stories": n}
+                        for a, n in most_first(authors)],
+        },
+        "geo": {
+            "cell_deg": GEO_CELL_DEG,
+            "without_location": counts["without_location"],
+            "cells": [{"lon": lon, "lat": lat, "stories": n}
+                      for (lon, lat), n in most_first(cells)],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="analyze scraped stories in one pass")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE)
+    parser.add_argument("--out-dir", default=OUT_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dedupe", action="store_true",
+                        help="also find near-duplicate stories")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    os.makedirs(args.out_dir, exist_ok=True)
+    files = {name: open(os.path.join(args.out_dir, file), "w")
+             for name, file in TEXT_OUTPUTS.items()}
+    first = dict.fromkeys(TEXT_OUTPUTS, True)
+
+    counts = Counter()
+    days, lengths, authors, cells = Counter(), Counter(), Counter(), Counter()
+    index = dedupe.DedupeIndex() if args.dedupe else None
+    try:
+        ranges = analyzed_ranges(args.input, args.workers, args.dedupe)
+        for text, c, d, lens, a, g, entries in ranges:
+            for name, lines in text.items():
+                if lines:
+                    # newline-separated, without a trailing newline, as before
+                    files[name].write(("" if first[name] else "\n") + "\n".join(lines))
+                    first[name] = False
+                counts[name] += len(lines)
+            counts.update(c)
+            days.update(d)
+            lengths.update(lens)
+            authors.update(a)
+            cells.update(g)
+            for entry in entries:
+                index.add(*entry)
+    finally:
+        for f in files.values():
+            f.close()
+
+    summary = summarize(args.input, counts, days, lengths, authors, cells,
+                        time.perf_counter() - started)
+    if index is not None:
+        clusters = index.clusters()
+        summary["duplicates"] = {"clusters": len(clusters),
+                                 "stories": sum(len(c) - 1 for c in clusters)}
+        with open(os.path.join(args.out_dir, DUPLICATES_FILE), "w") as f:
+            json.dump(sorted(clusters, key=len, reverse=True), f)
+    with open(os.path.join(args.out_dir, SUMMARY_FILE), "w") as f:
+        # compact: indenting falls back to the pure-python encoder, slow on
+        # big cell lists
+        json.dump(summary, f, separators=(",", ":"))
+
+    print(f"{summary['stories']} stories in {summary['seconds']}s")
+    print(f"titles: {counts['eng']} english, {counts['num']} other")
+    print(f"descriptions: {counts['desc']} non-empty, "
+          f"{counts['interesting']} interesting, "
+          f"median length {summary['descriptions']['median_length']}")
+    if index is not None:
+        print(f"duplicates: {summary['duplicates']['stories']} stories in "
+              f"{summary['duplicates']['clusters']} clusters")
+    print(f"{len(authors)} authors, {len(cells)} geo cells -> {args.out_dir}/")
+
+
+if __name__ == "__main__":
+    main()
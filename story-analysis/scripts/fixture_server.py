@@ -0,0 +1,115 @@
+'''
+local stand-in for the planet animations api, for testing scrape.py.
+- replays pages recorded with `scrape.py --record DIR`, looked up by the
+  `before` cursor of the request.
+- --generate N writes N synthetic stories as recorded pages first, for when
+  there is no recording at hand.
+- --fail-rate and --throttle-rate inject 503s and 429s (with Retry-After) to
+  exercise retries and the adaptive rate limit.
+
+Usage:
+    python fixture_server.py fixtures/ [--generate 2000] [--fail-rate 0.1]
+    python scrape.py --api-url http://localhost:8765/animations
+'''
+
+import argparse
+import glob
+import json
+import os
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PORT = 8765
+
+
+def load_recording(record_dir):
+    """{before cursor (None for the first page): response body}"""
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(record_dir, "page-*.json"))):
+        with open(path) as f:
+            page = json.load(f)
+        pages[page["before"]] = json.dumps(page["response"]).encode()
+    return pages
+
+
+def generate_recording(record_dir, count, limit=250):
+    """write count synthetic stories as recorded pages of limit stories"""
+    os.makedirs(record_dir, exist_ok=True)
+    cursor = None
+    for number, start in enumerate(range(0, count, limit), 1):
+        stories = [{
+            "id": f"fixture-{i:07d}",
+            "title": f"Fixture story {i}",
+            "author": f"author {i % 37}",
+            "description": "synthetic " * (i % 60),
+            "created": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00.000Z",
+            "updated": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00.000Z",
+            "center": [(i * 7.3) % 360 - 180, (i * 3.1) % 170 - 85],
+            "format": "mp4" if i % 3 else "raw",
+            "public": True,
+            "frames": [{"date": "2025-01-01"}] * (i % 12),
+        } for i in range(start, min(start + limit, count))]
+        page = {"data": stories, "more": start + limit < count}
+        with open(os.path.join(record_dir, f"page-{number:05d}.json"), "w") as f:
+            json.dump({"before": cursor, "response": page}, f)
+        cursor = stories[-1]["id"]
+
+
+def make_handler(pages, fail_rate=0.0, throttle_rate=0.0, retry_after=1):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real api
+
+        def send_body(self, status, body, headers=()):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            before = parse_qs(url.query).get("before", [None])[0]
+            roll = random.random()
+            if roll < throttle_rate:
+                self.send_body(429, b'{"error":"slow down"}',
+                               [("Retry-After", str(retry_after))])
+            elif roll < throttle_rate + fail_rate:
+                self.send_body(503, b'{"error":"unavailable"}')
+            elif before not in pages:
+                self.send_body(404, b'{"error":"unknown cursor"}')
+            else:
+                self.send_body(200, pages[before])
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="replay recorded planet api pages")
+    parser.add_argument("record_dir")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--generate", type=int, metavar="N",
+                        help="write N synthetic stories first")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_recording(args.record_dir, args.generate)
+    pages = load_recording(args.record_dir)
+    handler = make_handler(pages, args.fail_rate, args.throttle_rate)
+    server = ThreadingHTTPServer(("localhost", args.port), handler)
+    print(f"Replaying {len(pages)} pages at http://localhost:{args.port}/animations")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,235 @@
 '''
 script used to preprocess stories for the viewer-server.
 - strips out frame data, leaving only frame count (my_framecount)
+- streams: the input is never loaded whole, so memory stays bounded by
+  CHUNK_STORIES stories per worker however big the dump is.
+- input is the NDJSON written by scrape.py, split into chunks of lines that
+  worker processes parse and rewrite in parallel. a legacy JSON array dump is
+  also accepted; it can't be split without parsing it, so it is decoded
+  incrementally (one story at a time) in the main process instead.
+- output is NDJSON and/or Parquet (by file extension, .parquet needs
+  pyarrow); data_insert.py bulk-loads either directly. files are written
+  under a temp name and renamed, so a running viewer-server never picks up
+  a half-written file.
+- the frames themselves go to a frame store (viewer-server/frame_store.py)
+  that the viewer-server maps to serve /api/story/{id}/frames.
+
+Usage: python preprocess.py [IN_FILE] [-o OUT_FILE ...] [--frames FILE] [--workers N]
 '''
 
+import argparse
 import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "viewer-server"))
+
+import frame_store
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
 
-IN_FILE = 'planet_stories.json'
+IN_FILE = 'planet_stories.ndjson'  # one story per line, from scrape.py
+# NDJSON despite the extension; the viewer-server's reader detects it
 OUT_FILE = 'planet_stories_preprocessed.json'
+# goes next to OUT_FILE in viewer-server/data
+FRAMES_FILE = 'planet_stories_frames.bin'
+CHUNK_STORIES = 500
+READ_SIZE = 1 << 20  # bytes per read of a JSON array dump
+
+# columns the viewer-server loads (data_insert.JSON_COLUMNS); Parquet output
+# keeps only these, NDJSON keeps every field but frames
+if pyarrow is not None:
+    PARQUET_SCHEMA = pyarrow.schema([
+        ('id', pyarrow.string()), ('title', pyarrow.string()),
+        ('author', pyarrow.string()),
+        ('created', pyarrow.string()), ('updated', pyarrow.string()),
+        ('center', pyarrow.list_(pyarrow.float64())),
+        ('format', pyarrow.string()), ('public', pyarrow.bool_()),
+        ('height', pyarrow.int32()), ('width', pyarrow.int32()),
+        ('description', pyarrow.string()), ('rate', pyarrow.float64()),
+        ('zoom', pyarrow.float64()), ('my_framecount', pyarrow.int32()),
+    ])
+
+
+def preprocess_story(story):
+    story["my_framecount"] = len(story.get("frames") or [])
+    story.pop("frames", None)
+    return story
+
+
+def encode(stories, parquet, frames):
+    '''
+    (ndjson text, parquet record batch or None, encoded frames or None) for
+    raw stories, which are preprocessed in place
+    '''
+    encoded_frames = frame_store.encode_frames(stories) if frames else None
+    for story in stories:
+        preprocess_story(story)
+    text = "".join(json.dumps(s, separators=(',', ':')) + "\n" for s in stories)
+    batch = None
+    if parquet:
+        batch = pyarrow.RecordBatch.from_pylist(
+            [{name: s.get(name) for name in PARQUET_SCHEMA.names} for s in stories],
+            schema=PARQUET_SCHEMA)
+    return text, batch, encoded_frames
+
+
+def process_lines(lines, parquet=False, frames=False):
+    '''worker: raw NDJSON lines in, encoded processed stories out'''
+    return encode([json.loads(line) for line in lines if line.strip()], parquet, frames)
+
+
+def ndjson_chunks(path, size=CHUNK_STORIES):
+    chunk = []
+    with open(path, 'r') as file:
+        for line in file:
+            chunk.append(line)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_json_array(path, read_size=READ_SIZE):
+    '''stories of a JSON array file, decoded one at a time from a sliding buffer'''
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as file:
+        buf = file.read(read_size).lstrip()
+        if not buf.startswith('['):
+            raise ValueError(f"{path} is neither NDJSON nor a JSON array")
+        pos = 1
+        eof = False
+        while True:
+            # skip separators, refilling the buffer as needed
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = file.read(read_size), 0
+                eof = not buf
+            if pos >= len(buf) or buf[pos] == ']':
+                return
+            try:
+                story, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # story continues past the buffer
+                more = file.read(read_size)
+                if not more:
+                    raise
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield story
+            pos = end
+
+
+def is_json_array(path):
+    with open(path, 'r') as file:
+        head = file.read(4096).lstrip()
+    return head.startswith('[')
+
+
+def array_chunks(path, parquet, frames, size=CHUNK_STORIES):
+    chunk = []
+    for story in iter_json_array(path):
+        chunk.append(story)
+        if len(chunk) == size:
+            yield encode(chunk, parquet, frames)
+            chunk = []
+    if chunk:
+        yield encode(chunk, parquet, frames)
+
+
+def parallel_chunks(path, parquet, frames, workers):
+    '''processed chunks in input order, with at most 2 chunks per worker in flight'''
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for lines in ndjson_chunks(path):
+            pending.append(pool.submit(process_lines, lines, parquet, frames))
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+class Outputs:
+    '''
+    NDJSON and Parquet writers for the output files and the frame store,
+    renamed into place on close
+    '''
+
+    def __init__(self, paths, frames_path=None):
+        self.paths = paths
+        self.ndjson = []
+        self.parquet = []
+        self.frames = frame_store.FrameStoreWriter(frames_path) if frames_path else None
+        for path in paths:
+            if path.endswith('.parquet'):
+                if pyarrow is None:
+                    raise SystemExit(
+                        "Parquet output needs pyarrow (pip install pyarrow)")
+                self.parquet.append(
+                    pyarrow.parquet.ParquetWriter(path + '.tmp', PARQUET_SCHEMA))
+            else:
+                self.ndjson.append(open(path + '.tmp', 'w'))
+
+    def write(self, text, batch, encoded_frames):
+        for file in self.ndjson:
+            file.write(text)
+        for writer in self.parquet:
+            writer.write_batch(batch)
+        if self.frames is not None:
+            self.frames.add(encoded_frames)
+
+    def close(self):
+        for file in self.ndjson:
+            file.close()
+        for writer in self.parquet:
+            writer.close()
+        for path in self.paths:
+            os.replace(path + '.tmp', path)
+        if self.frames is not None:
+            stories, frames = self.frames.close()
+            print(f"{frames} frames of {stories} stories -> {self.frames.path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="preprocess scraped stories for the viewer-server")
+    parser.add_argument("input", nargs="?", default=IN_FILE)
+    parser.add_argument("-o", "--output", action="append",
+                        help="output file, .parquet or NDJSON "
+                             f"(repeatable, default {OUT_FILE})")
+    parser.add_argument("--frames", default=FRAMES_FILE,
+                        help="frame store to build "
+                             f"(default {FRAMES_FILE}, '' to skip)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    paths = args.output or [OUT_FILE]
+    parquet = any(path.endswith('.parquet') for path in paths)
+    frames = bool(args.frames)
+    outputs = Outputs(paths, args.frames)
+
+    if is_json_array(args.input):
+        chunks = array_chunks(args.input, parquet, frames)
+    else:
+        chunks = parallel_chunks(args.input, parquet, frames, args.workers)
 
-with open(IN_FILE, 'r') as file:
-    data = json.load(file)
+    count = 0
+    for text, batch, encoded_frames in chunks:
+        outputs.write(text, batch, encoded_frames)
+        count += text.count("\n")
+    outputs.close()
+    print(f"{count} stories -> {', '.join(paths)}")
 
-for story in data:
-    story["my_framecount"] = len(story["frames"])
-    del story["frames"]
 
-with open(OUT_FILE, "w") as json_file:
-    json.dump(data, json_file, separators=(',', ':'))
+if __name__ == "__main__":
+    main()
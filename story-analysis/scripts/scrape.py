@@ -1,85 +1,273 @@
 '''
-scrapes the planet stories public api for stories, and writes results to a json file.
+scrapes the planet stories public api for stories, and writes results to a
+newline-delimited json file (one story per line).
+- each page is appended to the output as soon as it arrives, then the `before`
+  cursor is checkpointed, so an interrupted scrape resumes where it stopped
+  (--fresh starts over). memory stays flat however large the catalogue is.
+- pages have to be fetched in order (each cursor comes from the previous
+  page), so the only overlap is writing: a writer thread serializes and saves
+  page n while page n+1 is being fetched.
+- one requests.Session keeps the connection open between pages.
+- the delay between requests adapts: it grows when the api answers 429/5xx
+  (honouring Retry-After) and shrinks back while requests succeed. failed
+  requests are retried with backoff.
+- --record DIR saves raw pages, which fixture_server.py replays locally for
+  testing (--api-url http://localhost:8765/animations).
 '''
 
-import requests
+import argparse
 import json
+import os
+import queue
+import random
+import threading
 import time
 
+import requests
+from requests.adapters import HTTPAdapter
+
 # Configuration
 API_URL = "https://api.planet.com/explorer/t2/animations"
-OUTPUT_FILE = "planet_stories.json"
+OUTPUT_FILE = "planet_stories.ndjson"
 LIMIT = 250
-REQUEST_DELAY = 0.1  # seconds between requests
+REQUEST_DELAY = 0.1  # seconds between requests, starting point
+MAX_DELAY = 60.0
+MAX_RETRIES = 6
+TIMEOUT = 60  # seconds per request
 OWN_FILTER = False  # set to True to get only your own stories
 
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class AdaptiveRateLimiter:
+    """
+    Delay between requests: doubled on a throttled or failed request, and
+    lowered by 10% per success down to min_delay.
+    """
+
+    def __init__(self, min_delay=REQUEST_DELAY, max_delay=MAX_DELAY):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = min_delay
+        self._last = 0.0
+
+    def wait(self):
+        remaining = self._last + self.delay - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        self._last = time.monotonic()
+
+    def success(self):
+        self.delay = max(self.min_delay, self.delay * 0.9)
+
+    def backoff(self, retry_after=None):
+        self.delay = min(self.max_delay, max(self.delay * 2, self.min_delay * 2))
+        if retry_after is not None:
+            self.delay = min(self.max_delay, max(self.delay, retry_after))
+
+
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def make_session():
+    session = requests.Session()
+    session.headers["accept"] = "application/json"
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+    return session
+
 
-def fetch_page(cursor=None):
-    """Fetch a single page of stories from the API."""
+def fetch_page(session, limiter, cursor=None, api_url=API_URL):
+    """Fetch a single page of stories from the API, retrying transient failures."""
     params = {"own": str(OWN_FILTER).lower(), "limit": LIMIT}
     if cursor:
         params["before"] = cursor
 
-    headers = {
-        "accept": "application/json",
-    }
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.wait()
+        try:
+            response = session.get(api_url, params=params, timeout=TIMEOUT)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"  {type(e).__name__}, retrying ({attempt + 1}/{MAX_RETRIES})")
+            limiter.backoff()
+            continue
 
-    response = requests.get(API_URL, params=params, headers=headers)
-    response.raise_for_status()
-    return response.json()
+        if response.status_code in RETRY_STATUS and attempt < MAX_RETRIES:
+            limiter.backoff(retry_after_seconds(response))
+            print(f"  HTTP {response.status_code}, retrying in {limiter.delay:.1f}s "
+                  f"({attempt + 1}/{MAX_RETRIES})")
+            # jitter so restarted scrapers don't retry in lockstep
+            time.sleep(random.uniform(0, limiter.delay / 4))
+            continue
 
+        response.raise_for_status()
+        limiter.success()
+        return response.json()
 
-def scrape_all_stories():
-    """Scrape all stories from the API, handling pagination."""
-    all_stories = []
-    cursor = None
-    page_count = 0
 
-    print("Starting to scrape Planet Stories...")
+class Checkpoint:
+    """
+    Progress of a scrape, saved next to the output file: the cursor for the
+    next page, and the output size at the time, so lines written after the
+    last checkpoint are dropped on resume instead of duplicated.
+    """
 
-    while True:
-        page_count += 1
-        print(
-            f"Fetching page {page_count}{'with cursor: ' + cursor if cursor else ''}...")
+    def __init__(self, path):
+        self.path = path
+        self.cursor = None
+        self.pages = 0
+        self.stories = 0
+        self.offset = 0
+        self.done = False
 
-        try:
-            data = fetch_page(cursor)
-            stories = data.get("data", [])
-            more = data.get("more", False)
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        self.cursor = state.get("cursor")
+        self.pages = state.get("pages", 0)
+        self.stories = state.get("stories", 0)
+        self.offset = state.get("offset", 0)
+        self.done = state.get("done", False)
+        return True
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"cursor": self.cursor, "pages": self.pages,
+                       "stories": self.stories, "offset": self.offset,
+                       "done": self.done}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def next_cursor(stories):
+    # the api pages backwards from the id of the last story seen
+    if not stories:
+        return None
+    return stories[-1].get("id") or stories[-1].get("name")
+
+
+def writer(pages, out, checkpoint, errors):
+    """Writer thread: append pages to the output, then checkpoint them."""
+    try:
+        while True:
+            item = pages.get()
+            if item is None:
+                return
+            stories, cursor, done = item
+            out.write("".join(json.dumps(s, separators=(",", ":")) + "\n"
+                              for s in stories))
+            out.flush()
+            os.fsync(out.fileno())
 
-            all_stories.extend(stories)
-            print(
-                f"  Retrieved {len(stories)} stories (total: {len(all_stories)})")
+            checkpoint.pages += 1
+            checkpoint.stories += len(stories)
+            checkpoint.offset = out.tell()
+            checkpoint.cursor = cursor
+            checkpoint.done = done
+            checkpoint.save()
+    except Exception as e:
+        errors.append(e)
+        # keep draining so the fetcher never blocks on a full queue
+        while pages.get() is not None:
+            pass
 
-            if not more or not stories:
-                print("No more pages to fetch.")
-                break
 
-            # Get cursor from last story (assuming it has an ID field)
-            # Adjust this based on actual response structure
-            if stories:
-                cursor = stories[-1].get("id") or stories[-1].get("name")
+def record_page(record_dir, number, cursor, data):
+    os.makedirs(record_dir, exist_ok=True)
+    with open(os.path.join(record_dir, f"page-{number:05d}.json"), "w") as f:
+        json.dump({"before": cursor, "response": data}, f)
 
-            if not cursor:
-                print("Warning: Could not find cursor for next page")
-                break
 
-            time.sleep(REQUEST_DELAY)
+def scrape_all_stories(output_file=OUTPUT_FILE, api_url=API_URL, fresh=False,
+                       record_dir=None):
+    """Scrape all stories from the API into output_file, resuming if possible."""
+    checkpoint = Checkpoint(output_file + ".checkpoint")
+    if fresh or not checkpoint.load() or not os.path.exists(output_file):
+        checkpoint = Checkpoint(checkpoint.path)
+    if checkpoint.done:
+        print(f"{output_file} is complete ({checkpoint.stories} stories); "
+              "use --fresh to scrape again.")
+        return checkpoint
 
+    if checkpoint.pages:
+        print(f"Resuming after page {checkpoint.pages} ({checkpoint.stories} stories) "
+              f"at cursor {checkpoint.cursor}")
+    else:
+        print("Starting to scrape Planet Stories...")
+
+    with open(output_file, "r+" if checkpoint.pages else "w") as out:
+        # drop anything written after the last checkpoint
+        out.seek(checkpoint.offset)
+        out.truncate()
+
+        pages = queue.Queue(maxsize=4)
+        errors = []
+        thread = threading.Thread(target=writer, args=(pages, out, checkpoint, errors),
+                                  daemon=True)
+        thread.start()
+
+        session = make_session()
+        limiter = AdaptiveRateLimiter()
+        cursor = checkpoint.cursor
+        page_count = checkpoint.pages
+        try:
+            while not errors:
+                page_count += 1
+                suffix = f" with cursor: {cursor}" if cursor else ""
+                print(f"Fetching page {page_count}{suffix}...")
+                data = fetch_page(session, limiter, cursor, api_url)
+                if record_dir:
+                    record_page(record_dir, page_count, cursor, data)
+
+                stories = data.get("data", [])
+                cursor = next_cursor(stories)
+                done = not data.get("more", False) or not stories
+                if not done and not cursor:
+                    print("Warning: Could not find cursor for next page")
+                    done = True
+
+                pages.put((stories, cursor, done))
+                print(f"  Retrieved {len(stories)} stories "
+                      f"(delay {limiter.delay:.2f}s)")
+                if done:
+                    print("No more pages to fetch.")
+                    break
         except requests.exceptions.RequestException as e:
             print(f"Error fetching page: {e}")
-            break
+            print("Progress is checkpointed; run again to resume.")
+        finally:
+            pages.put(None)
+            thread.join()
+            session.close()
 
-    return all_stories
+    if errors:
+        raise errors[0]
+    print(f"{checkpoint.stories} stories in {output_file}")
+    return checkpoint
 
 
 def main():
-    stories = scrape_all_stories()
-
-    print(f"\nSaving {len(stories)} stories to {OUTPUT_FILE}...")
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(stories, f, indent=2)
+    parser = argparse.ArgumentParser(description="scrape planet stories to ndjson")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--fresh", action="store_true",
+                        help="ignore any checkpoint and start over")
+    parser.add_argument("--record", metavar="DIR",
+                        help="also save raw pages for fixture_server.py")
+    args = parser.parse_args()
 
+    scrape_all_stories(args.output, args.api_url, args.fresh, args.record)
     print("Done!")
 
 
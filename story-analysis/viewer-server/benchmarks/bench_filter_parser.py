@@ -0,0 +1,62 @@
+'''
+microbenchmark for the /api/all filter language (filter_lang.py):
+- cold: tokenize + parse + compile, all caches cleared
+- warm shape: new values for an already compiled shape (parse miss, SQL hit)
+- warm: a repeated filter string (parse and SQL both cached)
+
+Usage (from viewer-server/): python benchmarks/bench_filter_parser.py [--repeat 20000]
+'''
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import filter_lang
+
+FILTERS = [
+    'climate',
+    'after:2025-10-01 author:"John" type:mp4 climate change',
+    '(author:"NASA" OR author:"ESA") after:2025-01-01 NOT type:mp4 wildfire',
+    'desc_length:>500 -type:compare before:2025-06-01 (flood OR "storm surge")',
+]
+
+
+def time_us(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the filter parser")
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    def cold(f):
+        def run(i):
+            filter_lang.parse.cache_clear()
+            filter_lang.compiled_cache = filter_lang.CompiledCache()
+            filter_lang.compile_filter(f, True)
+        return run
+
+    def warm_shape(f):
+        # a different year each time: same shape, new string
+        def run(i):
+            filter_lang.compile_filter(f.replace("2025", str(1000 + i % 8000)), True)
+        return run
+
+    def warm(f):
+        return lambda i: filter_lang.compile_filter(f, True)
+
+    print(f"{'cold':>10} {'warm shape':>11} {'warm':>9}  filter")
+    for f in FILTERS:
+        results = [time_us(make(f), args.repeat) for make in (cold, warm_shape, warm)]
+        print(" ".join(f"{us:>9.1f}us" for us in results) + f"  {f}")
+
+
+if __name__ == "__main__":
+    main()
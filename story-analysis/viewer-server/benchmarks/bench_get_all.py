@@ -0,0 +1,102 @@
+'''
+benchmarks /api/all query strategies on a scaled-up synthetic catalogue:
+- three scans: page + COUNT(*) + COUNT(DISTINCT author) (the old behaviour)
+- single pass: page and totals from one materialized scan
+- cached totals: page query only, as for later pages of the same filter
+
+Usage (from viewer-server/): python benchmarks/bench_get_all.py [--rows 1000000]
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import data_insert
+import queries
+
+FILTERS = {
+    "no filter": ("1=1", []),
+    "after date": ("created > ?", ["2024-06-01"]),
+    "author": ("author ILIKE ?", ["%author 1%"]),
+    "free text": ("(title ILIKE ? OR author ILIKE ? OR description ILIKE ?)",
+                  ["%fire%", "%fire%", "%fire%"]),
+}
+
+SYNTHETIC_ROWS = '''
+    INSERT INTO stories
+    SELECT
+        'story-' || i,
+        CASE WHEN i % 7 = 0 THEN 'Wildfire ' ELSE 'Flood ' END || i,
+        'author ' || (i % 5000),
+        TIMESTAMP '2023-01-01' + to_seconds(i * 60),
+        TIMESTAMP '2023-01-01' + to_seconds(i * 60),
+        (random() * 360) - 180,
+        (random() * 180) - 90,
+        CASE WHEN i % 3 = 0 THEN 'mp4' ELSE 'raw' END,
+        true, 540, 960,
+        repeat('description text ', (i % 40)::INTEGER),
+        1, 12.5, (i % 30)::INTEGER
+    FROM range(?) t(i)
+    ORDER BY 4 DESC
+'''
+
+
+def build_catalogue(rows):
+    conn = duckdb.connect(":memory:")
+    data_insert.create_table(conn)
+    conn.execute(SYNTHETIC_ROWS, [rows])
+    return conn
+
+
+def three_scans(conn, where_sql, params, limit, offset):
+    conn.execute(queries.page_sql(where_sql), params + [limit, offset]).fetchdf()
+    conn.execute(f"SELECT COUNT(*) FROM stories WHERE {where_sql}", params).fetchone()
+    conn.execute(f"SELECT COUNT(DISTINCT author) FROM stories "
+                 f"WHERE {where_sql} AND author IS NOT NULL", params).fetchone()
+
+
+def single_pass(conn, where_sql, params, limit, offset):
+    df = conn.execute(queries.page_with_totals_sql(where_sql),
+                      params + [limit, offset]).fetchdf()
+    queries.split_totals(df)
+
+
+def cached_totals(conn, where_sql, params, limit, offset):
+    conn.execute(queries.page_sql(where_sql), params + [limit, offset]).fetchdf()
+
+
+def time_ms(fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark /api/all query strategies")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=48)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"building synthetic catalogue of {args.rows} stories...")
+    conn = build_catalogue(args.rows)
+
+    print(f"{'filter':<12} {'three scans':>12} {'single pass':>12} {'cached':>10}")
+    for name, (where_sql, params) in FILTERS.items():
+        results = [
+            time_ms(lambda strategy=strategy, where_sql=where_sql, params=params:
+                    strategy(conn, where_sql, params, args.limit, 0), args.repeat)
+            for strategy in (three_scans, single_pass, cached_totals)
+        ]
+        print(f"{name:<12} " + " ".join(f"{ms:>10.1f}ms" for ms in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+'''
+benchmarks encoding an /api/all page on a synthetic catalogue:
+- dataframe: fetchdf -> to_dict(orient='records') -> JSON (the old path)
+- direct json: rows rendered to JSON in DuckDB, joined (results.py)
+- arrow via pandas: fetchdf -> Table.from_pandas -> IPC (wire_format.py)
+- direct arrow: DuckDB record batches -> IPC (results.py)
+reports time per page and peak python memory (tracemalloc).
+
+Usage (from viewer-server/): python benchmarks/bench_results.py [--limit 1000]
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import db_pool
+import queries
+import results
+import wire_format
+from bench_get_all import build_catalogue
+
+
+def envelope(limit):
+    return {"total": 0, "unique_authors": 0, "limit": limit, "offset": 0, "filter": ""}
+
+
+async def dataframe(pool, limit):
+    df = await pool.fetchdf(queries.page_sql("1=1"), [limit, 0])
+    body = dict(envelope(limit), stories=df.to_dict(orient="records"))
+    return json.dumps(jsonable_encoder(body)).encode()
+
+
+async def direct_json(pool, limit):
+    response, _, _ = await results.page_response(
+        pool, queries.page_sql("1=1", as_json=True), [limit, 0],
+        envelope(limit), wire_format.JSON, limit)
+    return await body_of(response)
+
+
+async def arrow_via_pandas(pool, limit):
+    df = await pool.fetchdf(queries.page_sql("1=1"), [limit, 0])
+    return wire_format.columnar_response(
+        df, envelope(limit), wire_format.ARROW_STREAM).body
+
+
+async def direct_arrow(pool, limit):
+    response, _, _ = await results.page_response(
+        pool, queries.page_sql("1=1"), [limit, 0],
+        envelope(limit), wire_format.ARROW_STREAM, limit)
+    return await body_of(response)
+
+
+async def body_of(response):
+    if hasattr(response, "body_iterator"):
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return response.body
+
+
+async def measure(fn, pool, limit, repeat):
+    await fn(pool, limit)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn(pool, limit)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    await fn(pool, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+async def run(args):
+    print(f"building synthetic catalogue of {args.rows} stories...")
+    conn = build_catalogue(args.rows)
+    pool = db_pool.QueryPool(conn)
+
+    print(f"{'path':<18} {'time':>10} {'peak mem':>10}")
+    for fn in (dataframe, direct_json, arrow_via_pandas, direct_arrow):
+        ms, mb = await measure(fn, pool, args.limit, args.repeat)
+        print(f"{fn.__name__:<18} {ms:>8.1f}ms {mb:>8.1f}MB")
+    pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark /api/all response encoding")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,24 @@
+'''
+loads the preprocessed story file into DuckDB.
+- the database is persisted to disk and reused while it is newer than the
+  source file (tracked in the source_info table), so restarts skip the load.
+- rebuilds use DuckDB's native JSON/Parquet readers in one INSERT ... SELECT,
+  instead of parsing the file in python and inserting row by row.
+- the full-text index, the statistics rollups and the near-duplicate table
+  are built together with the database (see fts.py, rollups.py, dedupe.py).
+- a running server picks up a changed file through a staging table that is
+  swapped or merged into stories (see reload.py).
+'''
+
+import os
 import duckdb
-import json
+
+import dedupe
+import fts
+import rollups
 
 TABLE_CREATE_STATEMENT = '''
-    CREATE TABLE stories (
+    CREATE TABLE {table} (
         id TEXT PRIMARY KEY,
         title TEXT,
         author TEXT,
@@ -11,6 +27,7 @@ TABLE_CREATE_STATEMENT = '''
         center_lon DOUBLE,
         center_lat DOUBLE,
         format TEXT,
+        public BOOLEAN,
         height INTEGER,
         width INTEGER,
         description TEXT,
@@ -20,44 +37,169 @@ TABLE_CREATE_STATEMENT = '''
     );
 '''
 
-TABLE_INSERT_STATEMENT = '''
-    INSERT OR REPLACE INTO stories (
-        id, title, author, created, updated,
-        center_lon, center_lat, format, height, width,
-        description, rate, zoom, my_framecount
+SOURCE_INFO_CREATE_STATEMENT = '''
+    CREATE TABLE source_info (
+        path TEXT,
+        size BIGINT,
+        mtime_ns BIGINT
+    );
+'''
+
+# columns read from the source file; anything else in it is ignored
+JSON_COLUMNS = '''{
+    'id': 'VARCHAR', 'title': 'VARCHAR', 'author': 'VARCHAR',
+    'created': 'VARCHAR', 'updated': 'VARCHAR', 'center': 'DOUBLE[]',
+    'format': 'VARCHAR', 'public': 'BOOLEAN', 'height': 'INTEGER', 'width': 'INTEGER',
+    'description': 'VARCHAR', 'rate': 'DOUBLE', 'zoom': 'DOUBLE',
+    'my_framecount': 'INTEGER'
+}'''
+
+# last occurrence of an id wins, matching the old INSERT OR REPLACE behaviour;
+# rows are stored newest first so created-range scans can skip row groups
+TABLE_BULK_INSERT_STATEMENT = '''
+    INSERT INTO {table}
+    SELECT
+        id, title, author,
+        CAST(created AS TIMESTAMP), CAST(updated AS TIMESTAMP),
+        CASE WHEN len(center) = 2 THEN center[1] END AS center_lon,
+        CASE WHEN len(center) = 2 THEN center[2] END AS center_lat,
+        format, public, height, width, description, rate, zoom, my_framecount
+    FROM (
+        SELECT *, row_number() OVER () AS source_row
+        FROM {reader}
     )
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    WHERE id IS NOT NULL
+    QUALIFY row_number() OVER (PARTITION BY id ORDER BY source_row DESC) = 1
+    ORDER BY created DESC
 '''
 
 
+def _sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def source_reader(filename):
+    '''table function call reading the source file (JSON array, NDJSON or Parquet)'''
+    path = _sql_string(os.path.abspath(filename))
+    if filename.endswith('.parquet'):
+        return f"read_parquet({path})"
+    return f"read_json({path}, format='auto', columns={JSON_COLUMNS})"
+
+
+def source_signature(filename):
+    st = os.stat(filename)
+    return (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+
+
+def bulk_load(conn, filename, table="stories"):
+    '''vectorized load of the source file into an existing table'''
+    conn.execute(TABLE_BULK_INSERT_STATEMENT.format(
+        table=table, reader=source_reader(filename)))
+
+
+def create_table(conn, table="stories"):
+    conn.execute(TABLE_CREATE_STATEMENT.format(table=table))
+
+
+def record_source(conn, signature):
+    '''remember which file version (source_signature) stories was loaded from'''
+    conn.execute("DELETE FROM source_info")
+    conn.execute("INSERT INTO source_info VALUES (?, ?, ?)", list(signature))
+
+
 def create_and_load_table(conn, filename):
-    conn.execute(TABLE_CREATE_STATEMENT)
-
-    with open(filename, 'r') as f:
-        stories_json = json.load(f)
-
-    batch_insert_rows = []
-
-    for story in stories_json:
-        center_lon, center_lat = (None, None)
-        if "center" in story and isinstance(story["center"], (list, tuple)) and len(story["center"]) == 2:
-            center_lon, center_lat = story["center"]
-
-        batch_insert_rows.append((
-            story.get("id"),
-            story.get("title"),
-            story.get("author"),
-            story.get("created"),
-            story.get("updated"),
-            center_lon,
-            center_lat,
-            story.get("format"),
-            story.get("height"),
-            story.get("width"),
-            story.get("description"),
-            story.get("rate"),
-            story.get("zoom"),
-            story.get("my_framecount")
-        ))
-
-    conn.executemany(TABLE_INSERT_STATEMENT, batch_insert_rows)
+    create_table(conn)
+    bulk_load(conn, filename)
+
+    conn.execute(SOURCE_INFO_CREATE_STATEMENT)
+    record_source(conn, source_signature(filename))
+
+
+def loaded_signature(conn):
+    row = conn.execute("SELECT path, size, mtime_ns FROM source_info").fetchone()
+    return tuple(row) if row is not None else None
+
+
+STAGING_TABLE = "stories_staging"
+
+# rows of the staging table that are new or differ from stories
+CHANGED_ROWS = f'''
+    SELECT * FROM {STAGING_TABLE}
+    EXCEPT
+    SELECT * FROM stories
+'''
+
+
+def load_staging(conn, filename):
+    '''load filename into a fresh staging table next to stories'''
+    drop_staging(conn)
+    create_table(conn, STAGING_TABLE)
+    bulk_load(conn, filename, STAGING_TABLE)
+    return conn.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE}").fetchone()[0]
+
+
+def swap_in_staging(conn):
+    '''replace stories with the staging table; call inside a transaction'''
+    conn.execute("DROP TABLE stories")
+    conn.execute(f"ALTER TABLE {STAGING_TABLE} RENAME TO stories")
+
+
+def merge_staging(conn):
+    '''
+    apply the staging table to stories by id: changed and new rows are
+    replaced, ids no longer in the file are deleted. call inside a
+    transaction. returns (upserted, deleted).
+    '''
+    upserted = conn.execute(
+        f"INSERT OR REPLACE INTO stories SELECT * FROM ({CHANGED_ROWS})").fetchone()[0]
+    deleted = conn.execute(f'''
+        DELETE FROM stories
+        WHERE NOT EXISTS (SELECT 1 FROM {STAGING_TABLE} s WHERE s.id = stories.id)
+    ''').fetchone()[0]
+    drop_staging(conn)
+    return upserted, deleted
+
+
+def drop_staging(conn):
+    conn.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+
+
+def is_fresh(db_file, data_file):
+    '''true if db_file exists and was built from the current data_file'''
+    if not os.path.exists(db_file):
+        return False
+    try:
+        conn = duckdb.connect(db_file, read_only=True)
+        try:
+            loaded = loaded_signature(conn)
+        finally:
+            conn.close()
+    except duckdb.Error:
+        return False
+    return loaded == source_signature(data_file)
+
+
+def open_database(db_file, data_file):
+    '''
+    open the persistent database, rebuilding it from data_file first if it is
+    missing or stale. the rebuild goes to a temp file that is renamed into
+    place, so a crash never leaves a half-loaded database behind.
+    '''
+    if not is_fresh(db_file, data_file):
+        tmp_file = db_file + ".tmp"
+        for path in (tmp_file, tmp_file + ".wal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+        conn = duckdb.connect(tmp_file)
+        create_and_load_table(conn, data_file)
+        fts.build_index(conn)
+        rollups.build(conn)
+        dedupe.build(conn)
+        conn.execute("CHECKPOINT")
+        conn.close()
+        if os.path.exists(db_file + ".wal"):
+            os.remove(db_file + ".wal")
+        os.replace(tmp_file, db_file)
+
+    return duckdb.connect(db_file)
@@ -0,0 +1,187 @@
+'''
+runs DuckDB queries off the event loop.
+- a fixed pool of cursors (each its own connection to the same database), so
+  concurrent requests never share a connection.
+- queries run on a thread pool sized to the cores; DuckDB releases the GIL
+  while executing, so scans from different requests run in parallel.
+- every query has a timeout, counted from when it starts waiting for a
+  cursor; on expiry the cursor is interrupted and the request fails instead
+  of holding a worker forever. A request cancelled while waiting for a
+  cursor gives up its place in the queue without taking one.
+- large results can be streamed in batches (row tuples or Arrow record
+  batches) instead of being materialized as one DataFrame.
+- queries given as SQL are reported to an optional QueryLog (query_log.py)
+  with the time spent executing and fetching them.
+'''
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+DEFAULT_TIMEOUT = 30.0  # seconds
+
+logger = logging.getLogger("viewer-server.db_pool")
+
+
+class QueryTimeout(Exception):
+    """Raised when a query exceeds its timeout and was interrupted"""
+
+
+class QueryPool:
+    def __init__(self, conn, workers=None, timeout=DEFAULT_TIMEOUT, query_log=None):
+        self.conn = conn
+        self.workers = workers or os.cpu_count() or 4
+        self.timeout = timeout
+        self.query_log = query_log
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="duckdb")
+        # idle cursors; an asyncio queue so waiting for one is cancellable
+        self._cursors = asyncio.Queue()
+        for _ in range(self.workers):
+            self._cursors.put_nowait(conn.cursor())
+
+    async def _lease(self, timeout):
+        if timeout <= 0:
+            raise QueryTimeout("query exceeded its timeout")
+        try:
+            cursor = await asyncio.wait_for(self._cursors.get(), timeout)
+        except asyncio.TimeoutError:
+            raise QueryTimeout(f"no cursor free within {timeout:.1f}s") from None
+        return _Lease(self, cursor)
+
+    async def run(self, fn, timeout=None, sql=None, params=None, count=None):
+        """
+        Run fn(cursor) on a pooled cursor in a worker thread and return its result.
+        Several statements inside fn see the same cursor.
+        sql/params describe the query for the query log; count(result) its rows.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        lease = await self._lease(deadline - loop.time())
+        result = error = None
+        try:
+            result = await lease.call(fn, deadline - loop.time())
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            lease.release()
+            if sql is not None:
+                rows = count(result) if count is not None and error is None else None
+                self._record(sql, params, lease.elapsed, rows, error)
+
+    def _record(self, sql, params, seconds, rows, error):
+        if self.query_log is not None:
+            self.query_log.record(sql, params, seconds, rows, error)
+
+    async def stream(self, sql, params=None, batch_rows=1000, arrow=False,
+                     timeout=None):
+        """
+        Async generator over a result in batches of up to batch_rows: lists of
+        row tuples, or pyarrow RecordBatches with arrow=True (an empty result
+        yields one empty Table so the schema is known). The cursor is held
+        until the generator finishes or is closed; timeout covers the whole result.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        lease = await self._lease(deadline - loop.time())
+        rows = 0
+        error = None
+        try:
+            def start(cur):
+                result = cur.execute(sql, params or [])
+                return result.fetch_record_batch(batch_rows) if arrow else result
+
+            reader = await lease.call(start, deadline - loop.time())
+
+            def next_batch(cur):
+                if not arrow:
+                    return cur.fetchmany(batch_rows)
+                try:
+                    return reader.read_next_batch()
+                except StopIteration:
+                    return None
+
+            empty = True
+            while True:
+                batch = await lease.call(next_batch, deadline - loop.time())
+                if batch is None or (not arrow and not batch):
+                    break
+                empty = False
+                rows += len(batch)
+                yield batch
+            if arrow and empty:
+                # callers still need the schema of an empty result
+                yield reader.schema.empty_table()
+        except GeneratorExit:
+            # consumer stopped early, e.g. the client disconnected
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            lease.release()
+            self._record(sql, params, lease.elapsed, rows, error)
+
+    async def fetchdf(self, sql, params=None, timeout=None):
+        return await self.run(lambda cur: cur.execute(sql, params or []).fetchdf(),
+                              timeout, sql, params, count=len)
+
+    async def fetchone(self, sql, params=None, timeout=None):
+        return await self.run(lambda cur: cur.execute(sql, params or []).fetchone(),
+                              timeout, sql, params,
+                              count=lambda row: int(row is not None))
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        while not self._cursors.empty():
+            self._cursors.get_nowait().close()
+
+
+class _Lease:
+    """a cursor checked out of a QueryPool, with the last call made on it"""
+
+    def __init__(self, pool, cursor):
+        self.pool = pool
+        self.cursor = cursor
+        self.future = None
+        # seconds spent in calls on this cursor
+        self.elapsed = 0.0
+
+    async def call(self, fn, timeout):
+        loop = asyncio.get_running_loop()
+        if timeout <= 0:
+            raise QueryTimeout("query exceeded its timeout")
+        self.future = loop.run_in_executor(self.pool._executor, fn, self.cursor)
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.future), timeout)
+        except asyncio.TimeoutError:
+            self.cursor.interrupt()
+            # wait for the interrupted query to unwind before reusing the cursor
+            try:
+                await self.future
+            except duckdb.InterruptException:
+                pass
+            except Exception:
+                logger.warning("query failed while being interrupted", exc_info=True)
+            raise QueryTimeout(f"query exceeded {timeout:.1f}s") from None
+        except asyncio.CancelledError:
+            # client went away; don't keep scanning for nobody
+            self.cursor.interrupt()
+            raise
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def release(self):
+        cursor, cursors = self.cursor, self.pool._cursors
+        if self.future is None or self.future.done():
+            cursors.put_nowait(cursor)
+        else:
+            # still unwinding after an interrupt; hand the cursor back once it has
+            self.future.add_done_callback(lambda _: cursors.put_nowait(cursor))
@@ -0,0 +1,258 @@
+'''
+near-duplicate story detection (re-posts: same title pattern, same place,
+close in time) with MinHash signatures and locality-sensitive hashing.
+- a story's text (title + start of the description) is normalized (case,
+  punctuation, digit runs -> "#", so "Fire 2023" and "Fire 2024" match) and
+  turned into word and word-pair shingles.
+- one-permutation MinHash: every shingle is hashed once into one of
+  BANDS * ROWS bins and each bin keeps its minimum, so a signature costs
+  O(shingles) instead of O(shingles * hash functions). empty bins are
+  filled from other bins (densification) so short titles still compare.
+- the signature is cut into BANDS bands of ROWS values; stories sharing any
+  band land in the same bucket and become candidates. only candidates are
+  compared (estimated text similarity, great-circle distance, time apart),
+  so the index scales with the number of candidates, not stories squared.
+- matching stories are merged into clusters (union-find); the newest story
+  of a cluster is kept, the others are its duplicates.
+- build() stores the duplicates in a story_duplicates table next to stories,
+  rebuilt with the database and on reload, and /api/all?dedupe=true hides them.
+- the analysis scripts use signature(), to_seconds() and DedupeIndex directly.
+the algorithm is a copy of fastapi_backend/app/dedupe.py (same constants,
+same hashes), so the viewer-server runs without the backend checkout while
+both sides still agree on what a duplicate is; change them together.
+'''
+
+import math
+import operator
+import random
+import re
+import zlib
+from datetime import datetime, timezone
+
+from geo_index import EARTH_RADIUS_KM, haversine_km
+
+BANDS = 16
+ROWS = 4
+BINS = BANDS * ROWS
+# estimated shingle Jaccard similarity for two stories to be duplicates
+TEXT_THRESHOLD = 0.7
+MAX_DISTANCE_KM = 25.0
+MAX_DAYS = 60
+# words of a description that go into its signature
+MAX_WORDS = 100
+# a new story is compared with at most this many recent stories per bucket,
+# so a very common title ("Untitled") can't make indexing quadratic
+MAX_BUCKET_CHECKS = 16
+
+_BIN_SHIFT = 32 - (BINS.bit_length() - 1)
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_EMPTY = 1 << _BIN_SHIFT
+# fixed pseudo-random order in which an empty bin borrows from the others
+_random = random.Random(1)
+_PROBES = [_random.sample([j for j in range(BINS) if j != i], BINS - 1)
+           for i in range(BINS)]
+
+_SPLIT = re.compile(r"[^\w#]+")
+_DIGITS = re.compile(r"\d+")
+
+
+
+def words(text):
+    text = _DIGITS.sub("#", (text or "").lower())
+    return [w for w in _SPLIT.split(text) if w]
+
+
+def shingle_hashes(title, description=None):
+    '''32-bit hashes of the word and word-pair shingles of a story's text'''
+    hashes = set()
+    for tokens in (words(title), words(description)[:MAX_WORDS]):
+        # crc32 rather than hash(): signatures must agree across processes
+        word_hashes = [zlib.crc32(token.encode()) for token in tokens]
+        hashes.update(word_hashes)
+        for a, b in zip(word_hashes, word_hashes[1:]):
+            hashes.add(((a * 0x9E3779B1) ^ b) * 0x85EBCA6B & 0xFFFFFFFF)
+    return hashes
+
+
+def signature(title, description=None):
+    '''MinHash signature (tuple of BINS ints) of a story's text, None if it has none'''
+    hashes = shingle_hashes(title, description)
+    if not hashes:
+        return None
+    bins = [_EMPTY] * BINS
+    for h in hashes:
+        b, value = h >> _BIN_SHIFT, h & _VALUE_MASK
+        if value < bins[b]:
+            bins[b] = value
+    filled = bins[:]
+    for i in range(BINS):
+        if filled[i] == _EMPTY:
+            for j in _PROBES[i]:
+                if filled[j] != _EMPTY:
+                    bins[i] = filled[j]
+                    break
+    return tuple(bins)
+
+
+def similarity(a, b):
+    '''estimated Jaccard similarity of the texts behind two signatures'''
+    return sum(map(operator.eq, a, b)) / BINS
+
+
+def to_seconds(value):
+    '''datetime, ISO string or number to seconds since epoch (None if unknown)'''
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class DedupeIndex:
+    '''
+    incremental LSH index merging near-duplicate stories into clusters.
+    stories should be added oldest first, so the per-bucket cap keeps the
+    stories closest in time.
+    '''
+
+    def __init__(self, threshold=TEXT_THRESHOLD, max_km=MAX_DISTANCE_KM,
+                 max_days=MAX_DAYS):
+        self.threshold = threshold
+        self.max_km = max_km
+        self.max_seconds = max_days * 86400
+        self._max_lat_deg = math.degrees(max_km / EARTH_RADIUS_KM)
+        # key -> (signature, lon, lat, created)
+        self._stories = {}
+        self._buckets = {}
+        self._parent = {}
+        # cluster root -> (created, key) of the story it keeps
+        self._keep = {}
+        # candidate pairs compared so far
+        self.compared = 0
+
+    def __len__(self):
+        return len(self._stories)
+
+    def _find(self, key):
+        parent = self._parent
+        root = key
+        while parent[root] != root:
+            root = parent[root]
+        while parent[key] != root:
+            parent[key], key = root, parent[key]
+        return root
+
+    def _union(self, a, b):
+        a, b = self._find(a), self._find(b)
+        if a != b:
+            self._parent[b] = a
+            self._keep[a] = max(self._keep[a], self._keep.pop(b))
+
+    def _matches(self, a, b):
+        sig_a, lon_a, lat_a, t_a = a
+        sig_b, lon_b, lat_b, t_b = b
+        if (lon_a is None) != (lon_b is None):
+            return False
+        if t_a is not None and t_b is not None and abs(t_a - t_b) > self.max_seconds:
+            return False
+        if lon_a is not None and (
+                abs(lat_a - lat_b) > self._max_lat_deg or
+                haversine_km(lon_a, lat_a, lon_b, lat_b) > self.max_km):
+            return False
+        return similarity(sig_a, sig_b) >= self.threshold
+
+    def add(self, key, sig, lon=None, lat=None, created=None):
+        '''
+        index a story and merge it with the stories it duplicates; known keys
+        are ignored
+        '''
+        if key in self._stories:
+            return
+        if lon is None or lat is None or math.isnan(lon) or math.isnan(lat):
+            lon = lat = None
+        entry = (sig, lon, lat, created)
+        self._stories[key] = entry
+        self._parent[key] = key
+        self._keep[key] = (created if created is not None else float("-inf"), key)
+        if sig is None:
+            return
+
+        candidates = set()
+        for band in range(BANDS):
+            band_key = (band, sig[band * ROWS:(band + 1) * ROWS])
+            bucket = self._buckets.setdefault(band_key, [])
+            candidates.update(bucket[-MAX_BUCKET_CHECKS:])
+            bucket.append(key)
+
+        root = key
+        for other in candidates:
+            if self._find(other) == root:
+                continue
+            self.compared += 1
+            if self._matches(entry, self._stories[other]):
+                self._union(other, key)
+                root = self._find(key)
+
+    def representative(self, key):
+        '''key of the story kept for key's cluster (key itself if it is unique)'''
+        return self._keep[self._find(key)][1]
+
+    def duplicates(self):
+        '''{key: key of the story kept instead} for every story that is a duplicate'''
+        result = {}
+        for key in self._stories:
+            keep = self._keep[self._find(key)][1]
+            if keep != key:
+                result[key] = keep
+        return result
+
+    def clusters(self):
+        '''keys of every cluster with duplicates, the kept story first'''
+        groups = {}
+        for key in self._stories:
+            groups.setdefault(self._find(key), []).append(key)
+        result = []
+        for root, keys in groups.items():
+            if len(keys) > 1:
+                keep = self._keep[root][1]
+                result.append([keep] + sorted(k for k in keys if k != keep))
+        return result
+
+
+DUPLICATES_TABLE = "story_duplicates"
+# for where-clauses over stories
+EXCLUDE_DUPLICATES = (f"NOT EXISTS (SELECT 1 FROM {DUPLICATES_TABLE} d "
+                      "WHERE d.id = stories.id)")
+
+
+def build(conn):
+    '''(re)build story_duplicates from stories; returns the index'''
+    rows = conn.execute(
+        "SELECT id, title, description, center_lon, center_lat, epoch(created) "
+        "FROM stories ORDER BY created NULLS FIRST, id").fetchall()
+    index = DedupeIndex()
+    for story_id, title, description, lon, lat, created in rows:
+        index.add(story_id, signature(title, description), lon, lat, created)
+
+    duplicates = index.duplicates()
+    conn.execute(f"CREATE OR REPLACE TABLE {DUPLICATES_TABLE} "
+                 "(id VARCHAR PRIMARY KEY, duplicate_of VARCHAR)")
+    if duplicates:
+        conn.execute(f"INSERT INTO {DUPLICATES_TABLE} "
+                     "SELECT unnest(?::VARCHAR[]), unnest(?::VARCHAR[])",
+                     [list(duplicates), list(duplicates.values())])
+    return index
+
+
+def has_duplicates_table(conn):
+    found = conn.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?",
+        [DUPLICATES_TABLE]).fetchone()[0]
+    return found == 1
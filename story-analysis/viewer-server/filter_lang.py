@@ -0,0 +1,380 @@
+'''
+filter language for /api/all, compiled to a parameterized SQL where-clause.
+
+    filter   := or_expr
+    or_expr  := and_expr ("OR" and_expr)*
+    and_expr := unary (["AND"] unary)*          juxtaposition means AND
+    unary    := ("NOT" | "-") unary | primary
+    primary  := "(" filter ")" | key:value | "quoted text" | word
+
+keys:
+    before:<date>  after:<date>  author:<name> / author:"<name>"
+    desc_length:>N  desc_length:<N  type:compare / type:mp4
+    location:<lon>,<lat>,<distance_km>  nearest:<lon>,<lat>,<k>
+
+consecutive words form one free-text query (BM25 via fts.py). every filter
+may be repeated and combined, e.g.
+    (author:"NASA" OR author:"ESA") after:2025-01-01 NOT type:mp4 wildfire
+
+compilation is split in two: the SQL text depends only on the filter's shape
+(node kinds and structure) and is cached per shape, while the parameter
+values are collected from the tree on every call. parsed trees are cached
+per filter string. location and nearest values become id lists from the
+grid index (geo_index.py), except locations wider than
+geo_index.SQL_RADIUS_KM, which filter in SQL.
+'''
+
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import fts
+import geo_index
+
+# where-clause of an empty filter
+MATCH_ALL = "1=1"
+
+GEO_IDS_CLAUSE = "id IN (SELECT UNNEST(?::VARCHAR[]))"
+
+
+class FilterSyntaxError(ValueError):
+    """Raised for filters that can't be parsed"""
+
+
+# one pass tokenizer; group names are the token kinds
+TOKEN_RE = re.compile(r'''
+      (?P<ws>\s+)
+    | (?P<lparen>\()
+    | (?P<rparen>\))
+    | (?P<neg>-(?=[A-Za-z_("]))
+    | (?P<filter>(?P<key>[A-Za-z_]+):(?:"(?P<qvalue>[^"]*)"|(?P<value>[^\s()"]+)))
+    | (?P<quoted>"(?P<phrase>[^"]*)")
+    | (?P<word>[^\s()"]+)
+    | (?P<error>.)
+''', re.VERBOSE)
+
+KEYWORDS = {"OR", "AND", "NOT"}
+
+NUMBER = r'-?\d+(?:\.\d+)?'
+VALUE_PATTERNS = {
+    'before': re.compile(r'\S+'),
+    'after': re.compile(r'\S+'),
+    'author': re.compile(r'.+'),
+    'desc_length': re.compile(r'([<>])(\d+)'),
+    'type': re.compile(r'(compare|mp4)'),
+    'location': re.compile(rf'({NUMBER}),({NUMBER}),(\d+(?:\.\d+)?)'),
+    'nearest': re.compile(rf'({NUMBER}),({NUMBER}),(\d+)'),
+}
+
+TYPE_FORMATS = {'compare': 'raw', 'mp4': 'mp4'}
+
+
+# AST nodes are tuples: ("filter", key, value), ("text", string),
+# ("not", node), ("and", (nodes...)), ("or", (nodes...))
+
+def tokenize(text):
+    tokens = []
+    for m in TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "ws":
+            continue
+        if kind == "error":
+            raise FilterSyntaxError(f"unexpected {m.group()!r} at {m.start()}")
+        if kind == "filter":
+            key = m.group("key").lower()
+            value = m.group("qvalue")
+            if value is None:
+                value = m.group("value")
+            if key in VALUE_PATTERNS:
+                tokens.append(("filter", (key, value)))
+            else:
+                # not one of ours (e.g. a url): plain text
+                tokens.append(("word", m.group("filter")))
+        elif kind == "quoted":
+            if m.group("phrase").strip():
+                tokens.append(("word", m.group("phrase")))
+        elif kind == "word":
+            word = m.group("word")
+            tokens.append((word if word in KEYWORDS else "word", word))
+        elif kind == "neg":
+            tokens.append(("NOT", "-"))
+        else:
+            tokens.append((kind, m.group()))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            return None
+        node = self.or_expr()
+        if self.peek() is not None:
+            raise FilterSyntaxError(f"unexpected {self.tokens[self.pos][1]!r}")
+        return node
+
+    def or_expr(self):
+        nodes = [self.and_expr()]
+        while self.peek() == "OR":
+            self.take()
+            nodes.append(self.and_expr())
+        return nodes[0] if len(nodes) == 1 else ("or", tuple(nodes))
+
+    def and_expr(self):
+        nodes = []
+        words = []
+        while self.peek() not in (None, "OR", "rparen"):
+            if self.peek() == "AND":
+                self.take()
+                continue
+            if self.peek() == "word":
+                words.append(self.take()[1])
+                continue
+            if words:
+                nodes.append(("text", " ".join(words)))
+                words = []
+            nodes.append(self.unary())
+        if words:
+            nodes.append(("text", " ".join(words)))
+        if not nodes:
+            raise FilterSyntaxError("expected a filter or search text")
+        return nodes[0] if len(nodes) == 1 else ("and", tuple(nodes))
+
+    def unary(self):
+        if self.peek() == "NOT":
+            self.take()
+            if self.peek() in (None, "OR", "rparen"):
+                raise FilterSyntaxError("NOT needs an operand")
+            return ("not", self.unary())
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "lparen":
+            node = self.or_expr()
+            if self.peek() != "rparen":
+                raise FilterSyntaxError("missing ')'")
+            self.take()
+            return node
+        if kind == "filter":
+            key, raw = value
+            return _filter_node(key, raw)
+        if kind == "word":
+            return ("text", value)
+        raise FilterSyntaxError(f"unexpected {value!r}")
+
+
+def _filter_node(key, raw):
+    m = VALUE_PATTERNS[key].fullmatch(raw)
+    if not m:
+        raise FilterSyntaxError(f"invalid value for {key}: {raw!r}")
+    if key == 'desc_length':
+        kind = "desc_length_gt" if m.group(1) == ">" else "desc_length_lt"
+        return ("filter", kind, int(m.group(2)))
+    if key == 'type':
+        return ("filter", "type", TYPE_FORMATS[m.group(1)])
+    if key == 'location':
+        lon, lat, km = (float(g) for g in m.groups())
+        return ("filter", "location", (lon, lat, km))
+    if key == 'nearest':
+        return ("filter", "nearest",
+                (float(m.group(1)), float(m.group(2)), int(m.group(3))))
+    return ("filter", key, raw)
+
+
+@lru_cache(maxsize=4096)
+def parse(filter_str):
+    """parse a filter string into an AST (None for an empty filter)"""
+    return _Parser(tokenize(filter_str or "")).parse()
+
+
+# SQL per filter kind; every clause is wrapped in parentheses when combined
+FILTER_SQL = {
+    'before': "created < ?",
+    'after': "created > ?",
+    'author': "author ILIKE ?",
+    'desc_length_gt': "LENGTH(COALESCE(description, '')) > ?",
+    'desc_length_lt': "LENGTH(COALESCE(description, '')) < ?",
+    'type': "format = ?",
+    'location': GEO_IDS_CLAUSE,
+    'location_wide': geo_index.RADIUS_CLAUSE,
+    'nearest': GEO_IDS_CLAUSE,
+}
+# filter kinds whose params come from the geo index
+GEO_KEYS = {'location', 'nearest'}
+
+
+def _filter_kind(node):
+    """FILTER_SQL key of a filter node: wide location searches filter in SQL"""
+    key = node[1]
+    if key == 'location' and node[2][2] > geo_index.SQL_RADIUS_KM:
+        return 'location_wide'
+    return key
+
+
+def shape(node):
+    """structure of the tree with values removed; equal shapes compile to equal SQL"""
+    if node is None:
+        return None
+    kind = node[0]
+    if kind == "filter":
+        return _filter_kind(node)
+    if kind == "text":
+        return "text"
+    if kind == "not":
+        return ("not", shape(node[1]))
+    return (kind, tuple(shape(child) for child in node[1]))
+
+
+def _sql(node, use_fts):
+    kind = node[0]
+    if kind == "filter":
+        return FILTER_SQL[_filter_kind(node)]
+    if kind == "text":
+        return fts.text_filter("", use_fts)[0]
+    if kind == "not":
+        return f"NOT ({_sql(node[1], use_fts)})"
+    joiner = " AND " if kind == "and" else " OR "
+    return joiner.join(f"({_sql(child, use_fts)})" for child in node[1])
+
+
+def _params(node, use_fts, out):
+    kind = node[0]
+    if kind == "filter":
+        key, value = node[1], node[2]
+        if key == 'author':
+            out.append(f'%{value}%')
+        elif key == 'location':
+            lon, lat, km = value
+            if _filter_kind(node) == 'location_wide':
+                out.extend(geo_index.radius_params(lon, lat, km))
+            else:
+                out.append([i for i, _ in geo_index.get_index().within(lon, lat, km)])
+        elif key == 'nearest':
+            lon, lat, k = value
+            out.append([i for i, _ in geo_index.get_index().nearest(lon, lat, k)])
+        else:
+            out.append(value)
+    elif kind == "text":
+        out.extend(fts.text_filter(node[1], use_fts)[1])
+    elif kind == "not":
+        _params(node[1], use_fts, out)
+    else:
+        for child in node[1]:
+            _params(child, use_fts, out)
+    return out
+
+
+def _quote(value):
+    return f'"{value}"' if re.search(r'[\s()"]', value) else value
+
+
+def unparse(node, parent=None):
+    """
+    canonical filter string for a tree: explicit AND/OR/NOT, parentheses
+    only where needed, normalized values. equivalent filters unparse equally
+    up to operand order.
+    """
+    if node is None:
+        return ""
+    kind = node[0]
+    if kind == "filter":
+        key, value = node[1], node[2]
+        if key.startswith("desc_length"):
+            return f"desc_length:{'>' if key.endswith('gt') else '<'}{value}"
+        if key == "type":
+            return "type:" + next(k for k, v in TYPE_FORMATS.items() if v == value)
+        if key in ("location", "nearest"):
+            return f"{key}:" + ",".join(f"{v:.10g}" for v in value)
+        return f"{key}:{_quote(value)}"
+    if kind == "text":
+        return f'"{node[1]}"'
+    if kind == "not":
+        return f"NOT {unparse(node[1], 'not')}"
+    text = f" {kind.upper()} ".join(unparse(child, kind) for child in node[1])
+    # an OR inside an AND, and any AND/OR under NOT, needs parentheses
+    needs_parens = parent is not None and (parent == "not" or kind == "or")
+    return f"({text})" if needs_parens else text
+
+
+def normalize(filter_str):
+    """canonical form of a filter string, for logs; raises FilterSyntaxError"""
+    return unparse(parse(filter_str))
+
+
+def has_geo(filter_str):
+    """whether compiling the filter searches the geo index; raises FilterSyntaxError"""
+    return _has_geo(parse(filter_str))
+
+
+def _has_geo(node):
+    if node is None or node[0] == "text":
+        return False
+    if node[0] == "filter":
+        return _filter_kind(node) in GEO_KEYS
+    if node[0] == "not":
+        return _has_geo(node[1])
+    return any(_has_geo(child) for child in node[1])
+
+
+def positive_text(node):
+    """free text not under a NOT, joined; used as the relevance query"""
+    if node is None or node[0] in ("filter", "not"):
+        return ""
+    if node[0] == "text":
+        return node[1]
+    return " ".join(t for t in (positive_text(child) for child in node[1]) if t)
+
+
+class CompiledCache:
+    """LRU of where-clause SQL per (shape, use_fts)"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compile(self, node, use_fts):
+        key = (shape(node), use_fts)
+        with self._lock:
+            sql = self._entries.get(key)
+            if sql is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return sql
+        sql = _sql(node, use_fts)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = sql
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return sql
+
+
+compiled_cache = CompiledCache()
+
+
+def compile_filter(filter_str, use_fts):
+    """
+    compile a filter string to (where_sql, params, relevance_text).
+    raises FilterSyntaxError for invalid filters.
+    """
+    node = parse(filter_str)
+    if node is None:
+        return MATCH_ALL, [], ""
+    where_sql = compiled_cache.get_or_compile(node, use_fts)
+    return where_sql, _params(node, use_fts, []), positive_text(node)
@@ -0,0 +1,269 @@
+'''
+columnar store of story frames, memory-mapped by the viewer-server.
+- preprocess.py drops frames from the story rows; this file keeps them, so
+  /api/story/{id}/frames never needs the raw dump.
+- frames of all stories live in contiguous arrays: an int64 acquisition time
+  column and the remaining per-frame fields as compact JSON (offsets + blob).
+  each story has a start and count into those arrays.
+- story ids are sorted for binary search; a lookup and a slice of frames
+  touch only the pages they need, and the file is shared between processes
+  through the page cache.
+- FrameStoreWriter streams: frames are appended to temp files as chunks of
+  stories arrive, in any order, and the file is assembled and renamed into
+  place on close.
+
+file layout (little-endian):
+
+    header        magic, version, story count, frame count, (offset, length) per section
+    id_offsets    uint64 per story + 1, into ids
+    ids           story ids, sorted
+    frame_starts  uint64 per story (same order as ids), index of its first frame
+    frame_counts  uint32 per story
+    dates         int64 per frame, ms since epoch (MISSING_DATE if unknown)
+    meta_offsets  uint64 per frame + 1, into meta
+    meta          JSON object of each frame without its date
+'''
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+
+MAGIC = b"PFS1"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ")
+SECTION = struct.Struct("<QQ")
+SECTIONS = ["id_offsets", "ids", "frame_starts", "frame_counts", "dates",
+            "meta_offsets", "meta"]
+
+MISSING_DATE = -(2 ** 63)
+DATE_FIELD = "date"
+
+
+def parse_date(value):
+    '''frame date (ISO 8601 string) to ms since epoch'''
+    if not isinstance(value, str):
+        return MISSING_DATE
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return MISSING_DATE
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def format_date(ms):
+    if ms == MISSING_DATE:
+        return None
+    text = datetime.fromtimestamp(ms / 1000, timezone.utc).isoformat()
+    return text.replace("+00:00", "Z")
+
+
+def encode_frames(stories):
+    '''
+    columns for the frames of a chunk of stories, cheap to pickle from a
+    worker process: (ids, counts, dates bytes, meta lengths bytes, meta bytes)
+    '''
+    ids, counts = [], array("I")
+    dates, lengths = array("q"), array("Q")
+    meta = []
+    for story in stories:
+        frames = story.get("frames") or []
+        ids.append(story["id"])
+        counts.append(len(frames))
+        for frame in frames:
+            if isinstance(frame, dict):
+                dates.append(parse_date(frame.get(DATE_FIELD)))
+                rest = {k: v for k, v in frame.items() if k != DATE_FIELD}
+            else:
+                dates.append(MISSING_DATE)
+                rest = {"value": frame}
+            blob = json.dumps(rest, separators=(",", ":")).encode() if rest else b""
+            lengths.append(len(blob))
+            meta.append(blob)
+    return ids, counts.tobytes(), dates.tobytes(), lengths.tobytes(), b"".join(meta)
+
+
+class FrameStoreWriter:
+    def __init__(self, path):
+        self.path = path
+        self._stories = {}  # id -> (first frame, count); a later duplicate wins
+        self._frames = 0
+        self._meta_size = 0
+        self._dates = open(path + ".dates.tmp", "wb")
+        self._meta_offsets = open(path + ".meta_offsets.tmp", "wb")
+        self._meta = open(path + ".meta.tmp", "wb")
+        self._meta_offsets.write(array("Q", [0]).tobytes())
+
+    def add(self, encoded):
+        '''add the output of encode_frames'''
+        ids, counts, dates, lengths, meta = encoded
+        counts = array("I", counts)
+        for story_id, count in zip(ids, counts):
+            self._stories[story_id] = (self._frames, count)
+            self._frames += count
+
+        offsets = array("Q")
+        total = self._meta_size
+        for length in array("Q", lengths):
+            total += length
+            offsets.append(total)
+        self._meta_size = total
+
+        self._dates.write(dates)
+        self._meta_offsets.write(offsets.tobytes())
+        self._meta.write(meta)
+
+    def close(self):
+        '''assemble the store and atomically replace path'''
+        temp_files = [self._dates, self._meta_offsets, self._meta]
+        for f in temp_files:
+            f.close()
+
+        ids = sorted(self._stories)
+        encoded_ids = [i.encode() for i in ids]
+        id_offsets = array("Q", [0])
+        for encoded in encoded_ids:
+            id_offsets.append(id_offsets[-1] + len(encoded))
+        starts = array("Q", (self._stories[i][0] for i in ids))
+        counts = array("I", (self._stories[i][1] for i in ids))
+
+        in_memory = {
+            "id_offsets": id_offsets.tobytes(),
+            "ids": b"".join(encoded_ids),
+            "frame_starts": starts.tobytes(),
+            "frame_counts": counts.tobytes(),
+        }
+        on_disk = {
+            "dates": self._dates.name,
+            "meta_offsets": self._meta_offsets.name,
+            "meta": self._meta.name,
+        }
+        lengths = {name: len(data) for name, data in in_memory.items()}
+        lengths.update({name: os.path.getsize(path) for name, path in on_disk.items()})
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as out:
+            offset = HEADER.size + SECTION.size * len(SECTIONS)
+            out.write(HEADER.pack(MAGIC, VERSION, len(ids), self._frames))
+            for name in SECTIONS:
+                # 8-byte alignment so sections can be cast to typed views
+                offset += -offset % 8
+                out.write(SECTION.pack(offset, lengths[name]))
+                offset += lengths[name]
+            for name in SECTIONS:
+                out.write(b"\0" * (-out.tell() % 8))
+                if name in in_memory:
+                    out.write(in_memory[name])
+                else:
+                    with open(on_disk[name], "rb") as src:
+                        shutil.copyfileobj(src, out, 1 << 20)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self.path)
+
+        for path in on_disk.values():
+            os.remove(path)
+        return len(ids), self._frames
+
+
+class FrameStore:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._mm, 0)
+        magic, version, self.story_count, self.frame_count = header
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a frame store (version {VERSION})")
+
+        view = memoryview(self._mm)
+        self._sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(
+                self._mm, HEADER.size + i * SECTION.size)
+            self._sections[name] = view[offset:offset + length]
+        self._id_offsets = self._sections["id_offsets"].cast("Q")
+        self._ids = self._sections["ids"]
+        self._starts = self._sections["frame_starts"].cast("Q")
+        self._counts = self._sections["frame_counts"].cast("I")
+        self._dates = self._sections["dates"].cast("q")
+        self._meta_offsets = self._sections["meta_offsets"].cast("Q")
+        self._meta = self._sections["meta"]
+
+    def _id(self, i):
+        return bytes(self._ids[self._id_offsets[i]:self._id_offsets[i + 1]])
+
+    def find(self, story_id):
+        '''position of story_id in the id table, or None'''
+        key = story_id.encode()
+        lo, hi = 0, self.story_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.story_count and self._id(lo) == key:
+            return lo
+        return None
+
+    def count(self, story_id):
+        i = self.find(story_id)
+        return None if i is None else self._counts[i]
+
+    def frames(self, story_id, start=0, stop=None):
+        '''
+        (total, frames[start:stop]) for a story, each frame a dict with its
+        index in the story, date and remaining fields; None if unknown
+        '''
+        i = self.find(story_id)
+        if i is None:
+            return None
+        first, total = self._starts[i], self._counts[i]
+        start, stop, _ = slice(start, stop).indices(total)
+
+        frames = []
+        for n in range(start, stop):
+            f = first + n
+            frame = {"index": n, DATE_FIELD: format_date(self._dates[f])}
+            blob = self._meta[self._meta_offsets[f]:self._meta_offsets[f + 1]]
+            if len(blob):
+                frame.update(json.loads(bytes(blob)))
+            frames.append(frame)
+        return total, frames
+
+
+class FrameStoreReader:
+    '''the current FrameStore for a path, reopened when the file is replaced'''
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._store = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        '''the store, or None if the file doesn't exist'''
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return self._store
+        with self._lock:
+            self._checked = now
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                self._store = None
+                return None
+            if self._store is None or self._store.mtime_ns != mtime_ns:
+                # the old mapping stays valid for requests still using it
+                self._store = FrameStore(self.path)
+            return self._store
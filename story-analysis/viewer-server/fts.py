@@ -0,0 +1,57 @@
+'''
+BM25 full-text search over story title, author and description.
+- uses DuckDB's fts extension (porter stemming, english stopwords).
+- the index lives in the persistent database, so it is only rebuilt when
+  data_insert rebuilds the database from a changed data file.
+- falls back to ILIKE substring matching if the extension can't be loaded.
+'''
+
+import duckdb
+
+FTS_SCHEMA = "fts_main_stories"
+
+CREATE_INDEX_STATEMENT = '''
+    PRAGMA create_fts_index(
+        'stories', 'id', 'title', 'author', 'description',
+        stemmer = 'porter', stopwords = 'english', strip_accents = 1,
+        lower = 1, overwrite = 1
+    )
+'''
+
+# BM25 score of a row for a query string, NULL when no term matches
+SCORE_EXPR = f"{FTS_SCHEMA}.match_bm25(id, ?)"
+
+ILIKE_CLAUSE = "(title ILIKE ? OR author ILIKE ? OR description ILIKE ?)"
+
+
+def load(conn):
+    """load the fts extension; returns False if it isn't available"""
+    try:
+        conn.execute("INSTALL fts")
+        conn.execute("LOAD fts")
+        return True
+    except duckdb.Error as e:
+        print(f"fts extension unavailable, free text falls back to ILIKE: {e}")
+        return False
+
+
+def build_index(conn):
+    """(re)build the BM25 index over the stories table"""
+    if not load(conn):
+        return False
+    conn.execute(CREATE_INDEX_STATEMENT)
+    return True
+
+
+def has_index(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM duckdb_schemas() WHERE schema_name = ?",
+        [FTS_SCHEMA]).fetchone()[0] > 0
+
+
+def text_filter(text, use_fts):
+    """(where_clause, params) matching free text"""
+    if use_fts:
+        return f"{SCORE_EXPR} IS NOT NULL", [text]
+    pattern = f'%{text}%'
+    return ILIKE_CLAUSE, [pattern, pattern, pattern]
@@ -0,0 +1,171 @@
+'''
+in-memory grid index over story centers for radius and nearest-neighbour search.
+- distances are great-circle (haversine) kilometres, not planar degrees.
+- a query only visits grid cells overlapping the search bounding box and
+  computes exact distances for the stories in those cells.
+- large radii are better answered by DuckDB than by a long id list:
+  radius_clause() is the same search as SQL, a bounding box plus the
+  haversine_km macro.
+'''
+
+import math
+import threading
+from collections import defaultdict
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEG = 1.0
+# radius searches wider than this filter in SQL (radius_clause) rather than by id
+SQL_RADIUS_KM = 250.0
+
+# same formula for SQL, used to return distance_km columns
+HAVERSINE_MACRO = f'''
+    CREATE OR REPLACE MACRO haversine_km(lon1, lat1, lon2, lat2) AS
+        2 * {EARTH_RADIUS_KM} * asin(sqrt(
+            pow(sin(radians(lat2 - lat1) / 2), 2) +
+            cos(radians(lat1)) * cos(radians(lat2)) *
+            pow(sin(radians(lon2 - lon1) / 2), 2)
+        ))
+'''
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = (math.sin(dphi / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lon, lat, radius_km):
+    """
+    (min_lon, min_lat, max_lon, max_lat) containing every point within
+    radius_km. min_lon > max_lon means the box crosses the antimeridian;
+    a box touching a pole spans all longitudes.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return -180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0)
+
+    ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))
+    if ratio >= 1:
+        return -180.0, min_lat, 180.0, max_lat
+    dlon = math.degrees(math.asin(ratio))
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lon, min_lat, max_lon, max_lat
+
+
+# stories within a radius, given radius_params(); the longitude test is two
+# ranges so a box crossing the antimeridian has the same SQL
+RADIUS_CLAUSE = (
+    "center_lat BETWEEN ? AND ? "
+    "AND (center_lon BETWEEN ? AND ? OR center_lon BETWEEN ? AND ?) "
+    "AND haversine_km(?, ?, center_lon, center_lat) <= ?")
+
+
+def radius_params(lon, lat, radius_km):
+    """parameters of RADIUS_CLAUSE for stories within radius_km of a point"""
+    min_lon, min_lat, max_lon, max_lat = bounding_box(lon, lat, radius_km)
+    if min_lon <= max_lon:
+        lon_ranges = [min_lon, max_lon, min_lon, max_lon]
+    else:
+        lon_ranges = [min_lon, 180.0, -180.0, max_lon]
+    return [min_lat, max_lat, *lon_ranges, lon, lat, radius_km]
+
+
+def _cell(value):
+    return int(math.floor(value / CELL_DEG))
+
+
+class GridIndex:
+    def __init__(self, rows=()):
+        """rows: iterable of (id, lon, lat); rows without coordinates are skipped"""
+        self.ids = []
+        self.lons = []
+        self.lats = []
+        self.cells = defaultdict(list)
+        for story_id, lon, lat in rows:
+            if lon is None or lat is None or math.isnan(lon) or math.isnan(lat):
+                continue
+            i = len(self.ids)
+            self.ids.append(story_id)
+            self.lons.append(lon)
+            self.lats.append(lat)
+            self.cells[(_cell(lon), _cell(lat))].append(i)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _lon_cells(self, min_lon, max_lon):
+        if min_lon <= max_lon:
+            return range(_cell(min_lon), _cell(max_lon) + 1)
+        # crosses the antimeridian
+        return list(range(_cell(min_lon), _cell(180.0) + 1)) + \
+            list(range(_cell(-180.0), _cell(max_lon) + 1))
+
+    def _box_cells(self, lon, lat, radius_km):
+        """grid cells overlapping the bounding box of a radius search"""
+        min_lon, min_lat, max_lon, max_lat = bounding_box(lon, lat, radius_km)
+        lat_cells = range(_cell(min_lat), _cell(max_lat) + 1)
+        for cx in self._lon_cells(min_lon, max_lon):
+            for cy in lat_cells:
+                yield cx, cy
+
+    def _distances(self, lon, lat, cells):
+        """[(distance_km, i)] for the stories in the given cells"""
+        return [(haversine_km(lon, lat, self.lons[i], self.lats[i]), i)
+                for cell in cells for i in self.cells.get(cell, ())]
+
+    def within(self, lon, lat, radius_km):
+        """[(id, distance_km)] within radius_km, nearest first"""
+        cells = self._box_cells(lon, lat, radius_km)
+        hits = [(d, i) for d, i in self._distances(lon, lat, cells) if d <= radius_km]
+        hits.sort()
+        return [(self.ids[i], d) for d, i in hits]
+
+    def nearest(self, lon, lat, k):
+        """[(id, distance_km)] of the k nearest stories"""
+        if k <= 0 or not self.ids:
+            return []
+        radius = 25.0
+        max_radius = math.pi * EARTH_RADIUS_KM
+        # each growth of the radius only measures the stories of newly reached cells
+        visited = set()
+        measured = []
+        while True:
+            cells = [c for c in self._box_cells(lon, lat, radius) if c not in visited]
+            visited.update(cells)
+            measured.extend(self._distances(lon, lat, cells))
+            hits = [(d, i) for d, i in measured if d <= radius]
+            if len(hits) >= k or radius >= max_radius:
+                hits.sort()
+                return [(self.ids[i], d) for d, i in hits[:k]]
+            radius = min(radius * 4, max_radius)
+
+
+_index = GridIndex()
+_lock = threading.Lock()
+
+
+def build(conn):
+    """build the index from the stories table and make it current"""
+    rows = conn.execute(
+        "SELECT id, center_lon, center_lat FROM stories "
+        "WHERE center_lon IS NOT NULL AND center_lat IS NOT NULL").fetchall()
+    set_index(GridIndex(rows))
+    return _index
+
+
+def set_index(index):
+    global _index
+    with _lock:
+        _index = index
+
+
+def get_index():
+    return _index
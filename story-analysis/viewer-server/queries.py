@@ -0,0 +1,210 @@
+'''
+SQL for the /api/all listing.
+- the first page of a filter gets its rows, total and distinct-author count
+  from one statement: the id, author and created of the filtered rows are
+  materialized once, the totals and the page's ids read from that, and only
+  the page's rows are fetched in full. Without a filter nothing is
+  materialized.
+- later pages of the same filter reuse cached totals and only run the page.
+- statement text is cached per (where-clause, sort), and where-clauses are
+  themselves cached per filter shape (filter_lang.py), so a repeated query
+  shape reuses the same SQL string.
+'''
+
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import filter_lang
+
+STORY_COLUMN_NAMES = [
+    "id", "title", "author", "description", "created", "updated",
+    "center_lat", "center_lon",
+    "format", "height", "width", "zoom", "rate", "my_framecount",
+]
+STORY_COLUMNS = ", ".join(STORY_COLUMN_NAMES)
+# the story columns of the page rows joined back in page_with_totals_sql
+PAGE_COLUMNS = ", ".join(f"s.{name}" for name in STORY_COLUMN_NAMES)
+
+# columns only used to compute a page_with_totals_sql result
+HELPER_COLUMNS = ["total", "unique_authors", "sort_key"]
+
+TIMESTAMP_COLUMNS = {"created", "updated"}
+# matches the isoformat() the pandas/FastAPI path produces
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def json_row_expr(alias=None):
+    """
+    SQL expression rendering one story row as a JSON object string, so rows
+    go from DuckDB to the response body without pandas or python dicts
+    """
+    prefix = f"{alias}." if alias else ""
+    fields = []
+    for name in STORY_COLUMN_NAMES:
+        value = f"{prefix}{name}"
+        if name in TIMESTAMP_COLUMNS:
+            value = f"strftime({value}, '{TIMESTAMP_FORMAT}')"
+        fields.append(f"{name} := {value}")
+    return f"to_json(struct_pack({', '.join(fields)}))::VARCHAR"
+
+
+def json_rows_sql(sql, timestamps=()):
+    """
+    sql with each of its rows rendered as one JSON object string (column j),
+    in the same order; timestamps names the TIMESTAMP columns, formatted like
+    json_row_expr does
+    """
+    replace = ""
+    if timestamps:
+        formatted = ", ".join(f"strftime({name}, '{TIMESTAMP_FORMAT}') AS {name}"
+                              for name in timestamps)
+        replace = f" REPLACE ({formatted})"
+    return f"SELECT to_json(r)::VARCHAR AS j FROM (SELECT *{replace} FROM ({sql})) r"
+
+
+# sort key expression for each supported sort; params are bound after the
+# where-clause params and before limit/offset
+SORT_CREATED = "created"
+
+
+@lru_cache(maxsize=1024)
+def page_sql(where_sql, sort_expr=SORT_CREATED, as_json=False):
+    """
+    page of stories only (totals already known), sorted by sort_expr DESC.
+    as_json: a single column with each row rendered by json_row_expr
+    """
+    if as_json:
+        # render only the rows on the page, not every filtered row
+        return f"""
+        WITH page AS (
+            SELECT {STORY_COLUMNS}, {sort_expr} AS sort_key
+            FROM stories
+            WHERE {where_sql}
+            ORDER BY sort_key DESC NULLS LAST, created DESC
+            LIMIT ? OFFSET ?
+        )
+        SELECT {json_row_expr('page')} AS j
+        FROM page
+        ORDER BY sort_key DESC NULLS LAST, created DESC
+    """
+    return f"""
+        SELECT {STORY_COLUMNS}
+        FROM stories
+        WHERE {where_sql}
+        ORDER BY {sort_expr} DESC NULLS LAST, created DESC
+        LIMIT ? OFFSET ?
+    """
+
+
+@lru_cache(maxsize=1024)
+def page_with_totals_sql(where_sql, sort_expr=SORT_CREATED, as_json=False):
+    """
+    page of stories plus total and unique_authors columns, from one statement.
+    always returns at least one row; when the page is empty that row has a
+    NULL id and only carries the totals.
+    as_json: columns are (total, unique_authors, j) with j the row as JSON,
+    NULL for the empty-page row
+    sort_expr may only use the id and created columns.
+    """
+    if where_sql == filter_lang.MATCH_ALL:
+        # nothing to materialize: the totals read only author, and the page
+        # is a plain top-N over the table
+        return f"""
+        WITH totals AS (
+            SELECT COUNT(*) AS total, COUNT(DISTINCT author) AS unique_authors
+            FROM stories
+        ),
+        page AS (
+            SELECT {STORY_COLUMNS}, {sort_expr} AS sort_key FROM stories
+            ORDER BY sort_key DESC NULLS LAST, created DESC
+            LIMIT ? OFFSET ?
+        )
+        {_page_and_totals(as_json)}
+    """
+    # only the columns the totals and the sort need are materialized; the
+    # page's rows are joined back from stories
+    return f"""
+        WITH filtered AS MATERIALIZED (
+            SELECT id, author, created
+            FROM stories
+            WHERE {where_sql}
+        ),
+        totals AS (
+            SELECT COUNT(*) AS total, COUNT(DISTINCT author) AS unique_authors
+            FROM filtered
+        ),
+        page_keys AS (
+            SELECT id, {sort_expr} AS sort_key FROM filtered
+            ORDER BY sort_key DESC NULLS LAST, created DESC
+            LIMIT ? OFFSET ?
+        ),
+        page AS (
+            SELECT {PAGE_COLUMNS}, page_keys.sort_key
+            FROM page_keys JOIN stories s ON s.id = page_keys.id
+        )
+        {_page_and_totals(as_json)}
+    """
+
+
+def _page_and_totals(as_json):
+    """final SELECT of page_with_totals_sql over its totals and page CTEs"""
+    if as_json:
+        select = f"""totals.total, totals.unique_authors,
+               CASE WHEN page.id IS NULL THEN NULL
+                    ELSE {json_row_expr('page')} END AS j"""
+    else:
+        select = "page.*, totals.total, totals.unique_authors"
+    return f"""SELECT {select}
+        FROM totals LEFT JOIN page ON TRUE
+        ORDER BY page.sort_key DESC NULLS LAST, page.created DESC"""
+
+
+def split_totals(df):
+    """split a page_with_totals_sql result into (page_df, total, unique_authors)"""
+    total = int(df["total"].iloc[0])
+    unique_authors = int(df["unique_authors"].iloc[0])
+    page = df[df["id"].notna()].drop(columns=HELPER_COLUMNS)
+    return page.reset_index(drop=True), total, unique_authors
+
+
+class TotalsCache:
+    """
+    LRU of (total, unique_authors) per normalized filter, i.e. the parsed
+    where-clause and its params, so equivalent filter strings share an entry.
+    Cleared whenever the stories table changes; a put carrying the generation
+    from before a clear is dropped, since its totals may be from the old data.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    @staticmethod
+    def key(where_sql, params):
+        # list params (e.g. geo id lists) aren't hashable
+        values = tuple(tuple(p) if isinstance(p, list) else p for p in params)
+        return (" ".join(where_sql.split()), values)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, total, unique_authors, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (total, unique_authors)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
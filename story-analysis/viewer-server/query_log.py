@@ -0,0 +1,90 @@
+'''
+per-query timing and the slow-query log.
+- QueryPool reports every query it runs (SQL, params, time spent in DuckDB,
+  rows, error) to a QueryLog.
+- endpoints tag the queries they run with annotate(); the tags (endpoint,
+  normalized filter) travel in a context variable, so they stay attached to
+  the right request while many run concurrently.
+- every query is logged at DEBUG as one JSON object; queries slower than
+  slow_ms are logged at WARNING and kept for GET /api/admin/queries.
+'''
+
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("viewer-server.queries")
+
+# tags of the current request; each annotate() sets a new dict, so requests
+# never share one
+_context = contextvars.ContextVar("query_context", default=None)
+
+# longer lists (e.g. geo id lists) are summarized in log entries
+MAX_LOGGED_LIST = 20
+
+
+def annotate(**tags):
+    """attach tags to every query run by the current request"""
+    _context.set({**(_context.get() or {}), **tags})
+
+
+def loggable(value):
+    if isinstance(value, (list, tuple)) and len(value) > MAX_LOGGED_LIST:
+        return f"<{len(value)} values>"
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class QueryLog:
+    def __init__(self, slow_ms=500.0, keep=100):
+        self.slow_ms = slow_ms
+        self.slow = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, sql, params, seconds, rows=None, error=None):
+        ms = seconds * 1000
+        entry = {
+            **(_context.get() or {}),
+            "ms": round(ms, 2),
+            "rows": rows,
+            "sql": " ".join(sql.split()),
+            "params": [loggable(p) for p in params or []],
+        }
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+
+        endpoint = entry.get("endpoint", "-")
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                "queries": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0})
+            stats["queries"] += 1
+            if error is not None:
+                stats["errors"] += 1
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+            if ms >= self.slow_ms:
+                stats["slow"] += 1
+                entry["at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                self.slow.append(entry)
+
+        if ms >= self.slow_ms:
+            logger.warning("slow query %s", json.dumps(entry, default=str))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("query %s", json.dumps(entry, default=str))
+
+    def stats(self):
+        with self._lock:
+            per_endpoint = {
+                endpoint: {**s,
+                           "total_ms": round(s["total_ms"], 2),
+                           "max_ms": round(s["max_ms"], 2),
+                           "mean_ms": round(s["total_ms"] / s["queries"], 2)}
+                for endpoint, s in self._stats.items()
+            }
+            return {"slow_ms": self.slow_ms, "endpoints": per_endpoint,
+                    "slow": list(self.slow)}
@@ -0,0 +1,143 @@
+'''
+hot reload of the stories table while the server keeps answering queries.
+- the changed data file is loaded into a staging table on its own cursor in
+  a background thread; queries keep reading the current table meanwhile.
+- "full" replaces stories with the staging table; "merge" only rewrites the
+  ids whose row changed and deletes ids that are no longer in the file.
+- the swap or merge, source_info, the full-text index, the statistics
+  rollups and the near-duplicate table commit in one transaction, so a query
+  sees either the old data or the new, never a mix.
+- after the commit the geo index is rebuilt and the on_reload callbacks run,
+  to drop anything cached from the old data.
+- watch() polls the data file's size/mtime and merges once it has stopped
+  changing; POST /api/admin/reload does the same on demand.
+'''
+
+import asyncio
+import os
+import threading
+import time
+
+import data_insert
+import dedupe
+import fts
+import geo_index
+import rollups
+
+MODES = ("merge", "full")
+
+
+class ReloadInProgress(Exception):
+    """Raised when a reload is requested while another one is running"""
+
+
+class DataReloader:
+    def __init__(self, conn, data_file, use_fts=False, on_reload=()):
+        self.conn = conn
+        self.data_file = data_file
+        self.use_fts = use_fts
+        self.on_reload = list(on_reload)
+        self.last_result = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def current_signature(self):
+        """signature of the data file, None if it is missing"""
+        if not os.path.exists(self.data_file):
+            return None
+        return data_insert.source_signature(self.data_file)
+
+    def loaded_signature(self):
+        cur = self.conn.cursor()
+        try:
+            return data_insert.loaded_signature(cur)
+        finally:
+            cur.close()
+
+    def reload(self, mode="merge"):
+        """load the data file and swap or merge it in; blocks until done"""
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if not self._lock.acquire(blocking=False):
+            raise ReloadInProgress("a reload is already running")
+        try:
+            return self._reload(mode)
+        finally:
+            self._lock.release()
+
+    def _reload(self, mode):
+        start = time.perf_counter()
+        # taken before reading, so a write during the load triggers another reload
+        signature = data_insert.source_signature(self.data_file)
+        upserted = deleted = None
+
+        cur = self.conn.cursor()
+        try:
+            rows = data_insert.load_staging(cur, self.data_file)
+            cur.execute("BEGIN TRANSACTION")
+            try:
+                if mode == "full":
+                    data_insert.swap_in_staging(cur)
+                else:
+                    upserted, deleted = data_insert.merge_staging(cur)
+                data_insert.record_source(cur, signature)
+                if self.use_fts and (mode == "full" or upserted or deleted):
+                    fts.build_index(cur)
+                rollups.build(cur)
+                duplicates = dedupe.build(cur)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            index = geo_index.build(cur)
+        finally:
+            data_insert.drop_staging(cur)
+            cur.close()
+
+        for callback in self.on_reload:
+            callback()
+
+        self.last_result = {
+            "mode": mode,
+            "rows": rows,
+            "upserted": upserted,
+            "deleted": deleted,
+            "geo_points": len(index),
+            "duplicates": len(duplicates.duplicates()),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        changes = "" if mode == "full" else f", {upserted} upserted, {deleted} deleted"
+        print(f"✓ Reloaded {rows} stories from {self.data_file} ({mode}{changes}) "
+              f"in {self.last_result['seconds']}s")
+        return self.last_result
+
+    async def reload_async(self, mode="merge"):
+        """reload in a worker thread so the event loop keeps serving"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.reload, mode)
+
+    async def watch(self, interval):
+        """merge the data file whenever it changes; run as a background task"""
+        loop = asyncio.get_running_loop()
+        seen = None
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                current = self.current_signature()
+                if current is None or current == await loop.run_in_executor(
+                        None, self.loaded_signature):
+                    seen = None
+                    continue
+                # only load once the file has stopped changing between two polls
+                if current != seen:
+                    seen = current
+                    continue
+                await self.reload_async("merge")
+                seen = None
+            except ReloadInProgress:
+                pass
+            except Exception as e:
+                print(f"reload of {self.data_file} failed: {e}")
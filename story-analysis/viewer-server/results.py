@@ -0,0 +1,149 @@
+'''
+/api/all pages, and the rows of the other JSON endpoints, encoded straight
+from DuckDB results, without a pandas DataFrame or a list of python dicts in
+between (which also turned NULLs into NaN, not valid JSON).
+- JSON: each row is rendered to a JSON string inside DuckDB
+  (queries.json_row_expr) and the body is the envelope plus those strings.
+- Arrow IPC: DuckDB's Arrow record batches go to the IPC writer as they are,
+  with the envelope in the schema metadata.
+- pages of STREAM_MIN_ROWS or more are streamed batch by batch, so a request
+  holds one batch rather than the whole page.
+the first batch is read before the response starts, so totals from a
+page_with_totals_sql query are known and query errors still get a status code.
+- other endpoints fetch their rows as JSON strings (json_rows) and splice them
+  into the body (json_response).
+'''
+
+import io
+import json
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+import queries
+import wire_format
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+STREAM_MIN_ROWS = 1000
+BATCH_ROWS = 1000
+
+
+async def _next(batches):
+    try:
+        return await batches.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def _totals(first, fmt):
+    """(total, unique_authors) from the first batch of a page_with_totals_sql result"""
+    if fmt == wire_format.ARROW_STREAM:
+        return (int(first.column("total")[0].as_py()),
+                int(first.column("unique_authors")[0].as_py()))
+    row = first[0]
+    return int(row[0]), int(row[1])
+
+
+async def _json_chunks(first, batches, envelope):
+    # envelope first, then the rows; key order doesn't matter to clients
+    head = json.dumps(envelope, separators=(",", ":"))
+    yield (head[:-1] + ',"stories":[').encode()
+    sep = ""
+    batch = first
+    while batch is not None:
+        # the row JSON is the last column; NULL is the empty-page totals row
+        rows = [row[-1] for row in batch if row[-1] is not None]
+        if rows:
+            yield (sep + ",".join(rows)).encode()
+            sep = ","
+        batch = await _next(batches)
+    yield b"]}"
+
+
+async def _arrow_chunks(first, batches, envelope):
+    columns = [name for name in first.schema.names
+               if name not in queries.HELPER_COLUMNS]
+    has_totals = len(columns) != len(first.schema.names)
+    schema = first.select(columns).schema.with_metadata(
+        {"envelope": json.dumps(envelope)})
+
+    sink = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    batch = first
+    while batch is not None:
+        if has_totals:
+            # drop the empty-page totals row and the helper columns
+            batch = batch.filter(pyarrow.compute.is_valid(batch.column("id")))
+        writer.write(batch.select(columns).replace_schema_metadata(schema.metadata))
+        yield drain()
+        batch = await _next(batches)
+    writer.close()
+    yield drain()
+
+
+async def json_rows(pool, sql, params=None, timestamps=()):
+    """rows of a query as JSON object strings rendered by DuckDB, in order"""
+    sql = queries.json_rows_sql(sql, timestamps)
+    rows = await pool.run(lambda cur: cur.execute(sql, params or []).fetchall(),
+                          sql=sql, params=params, count=len)
+    return [row[0] for row in rows]
+
+
+def json_array(rows):
+    return "[" + ",".join(rows) + "]"
+
+
+def json_response(envelope, **members):
+    """
+    JSON response of envelope plus members that are already encoded JSON
+    (json_rows rows, json_array arrays)
+    """
+    head = json.dumps(envelope, separators=(",", ":"))[:-1]
+    for key, value in members.items():
+        sep = "," if len(head) > 1 else ""
+        head += f"{sep}{json.dumps(key)}:{value}"
+    return Response(content=(head + "}").encode(), media_type=wire_format.JSON)
+
+
+async def page_response(pool, sql, params, envelope, fmt, limit):
+    """
+    Run an /api/all page query and encode it as JSON or Arrow IPC.
+    sql is a queries.page_sql / page_with_totals_sql built with
+    as_json=(fmt == JSON). When envelope["total"] is None the totals are read
+    from the result. Returns (response, total, unique_authors).
+    """
+    arrow = fmt == wire_format.ARROW_STREAM
+    batches = pool.stream(sql, params, BATCH_ROWS, arrow=arrow)
+    try:
+        first = await _next(batches)
+        if envelope["total"] is None and first is not None:
+            envelope["total"], envelope["unique_authors"] = _totals(first, fmt)
+    except BaseException:
+        await batches.aclose()
+        raise
+
+    if arrow:
+        chunks = _arrow_chunks(first, batches, envelope)
+    else:
+        chunks = _json_chunks(first, batches, envelope)
+    headers = {"Vary": "Accept"}
+
+    if limit >= STREAM_MIN_ROWS:
+        response = StreamingResponse(chunks, media_type=fmt, headers=headers)
+    else:
+        body = b"".join([chunk async for chunk in chunks])
+        response = Response(content=body, media_type=fmt, headers=headers)
+    return response, envelope["total"], envelope["unique_authors"]
@@ -0,0 +1,135 @@
+'''
+pre-aggregated catalogue statistics (reports/Stats.md) for /api/analytics.
+- rollup tables are computed from stories once at load, stored in the
+  database next to it, and recomputed in the same transaction as a reload,
+  so they always match the table they describe.
+- they are at the finest grain served (day, DESCRIPTION_BUCKET chars,
+  GEO_CELL_DEG degrees); coarser buckets are summed from them at request time,
+  which only touches a few thousand rows instead of the whole table.
+'''
+
+# descriptions longer than this count as "interesting"
+INTERESTING_LENGTH = 500
+DESCRIPTION_BUCKET = 50  # chars
+GEO_CELL_DEG = 1
+
+INTERVALS = ("day", "week", "month", "year")
+
+DESCRIPTION_LENGTH = "LENGTH(COALESCE(description, ''))"
+
+ROLLUP_STATEMENTS = {
+    "rollup_summary": f'''
+        SELECT
+            COUNT(*) AS total_stories,
+            COUNT(DISTINCT author) AS unique_authors,
+            MIN(created) AS min_created,
+            MAX(created) AS max_created,
+            COUNT(*) FILTER (WHERE {DESCRIPTION_LENGTH} > {INTERESTING_LENGTH})
+                AS interesting,
+            MEDIAN({DESCRIPTION_LENGTH}) AS median_description_length,
+            COUNT(*) FILTER (WHERE center_lon IS NULL OR center_lat IS NULL)
+                AS without_location
+        FROM stories
+    ''',
+    "rollup_daily": f'''
+        SELECT
+            CAST(created AS DATE) AS day,
+            COUNT(*) AS stories,
+            COUNT(*) FILTER (WHERE {DESCRIPTION_LENGTH} > {INTERESTING_LENGTH})
+                AS interesting
+        FROM stories
+        WHERE created IS NOT NULL
+        GROUP BY day
+        ORDER BY day
+    ''',
+    "rollup_description_length": f'''
+        SELECT
+            {DESCRIPTION_LENGTH} // {DESCRIPTION_BUCKET} * {DESCRIPTION_BUCKET}
+                AS min_length,
+            COUNT(*) AS stories
+        FROM stories
+        GROUP BY min_length
+        ORDER BY min_length
+    ''',
+    "rollup_authors": '''
+        SELECT
+            author,
+            COUNT(*) AS stories,
+            MIN(created) AS first_created,
+            MAX(created) AS last_created
+        FROM stories
+        WHERE author IS NOT NULL
+        GROUP BY author
+        ORDER BY stories DESC, author
+    ''',
+    "rollup_geo": f'''
+        SELECT
+            CAST(floor(center_lon / {GEO_CELL_DEG}) * {GEO_CELL_DEG} AS INTEGER)
+                AS cell_lon,
+            CAST(floor(center_lat / {GEO_CELL_DEG}) * {GEO_CELL_DEG} AS INTEGER)
+                AS cell_lat,
+            COUNT(*) AS stories
+        FROM stories
+        WHERE center_lon IS NOT NULL AND center_lat IS NOT NULL
+        GROUP BY cell_lon, cell_lat
+        ORDER BY cell_lon, cell_lat
+    ''',
+}
+
+
+def build(conn):
+    '''(re)compute every rollup table from stories'''
+    for table, select in ROLLUP_STATEMENTS.items():
+        conn.execute(f"CREATE OR REPLACE TABLE {table} AS {select}")
+
+
+def has_rollups(conn):
+    found = conn.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name IN "
+        f"({', '.join('?' for _ in ROLLUP_STATEMENTS)})",
+        list(ROLLUP_STATEMENTS)).fetchone()[0]
+    return found == len(ROLLUP_STATEMENTS)
+
+
+def timeline_sql(interval):
+    '''stories per interval bucket, summed from the daily rollup'''
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    return f'''
+        SELECT
+            strftime(date_trunc('{interval}', day), '%Y-%m-%d') AS bucket,
+            SUM(stories)::BIGINT AS stories,
+            SUM(interesting)::BIGINT AS interesting
+        FROM rollup_daily
+        WHERE (CAST(? AS DATE) IS NULL OR day >= ?)
+          AND (CAST(? AS DATE) IS NULL OR day < ?)
+        GROUP BY bucket
+        ORDER BY bucket
+    '''
+
+
+# bucket width is a multiple of DESCRIPTION_BUCKET
+DESCRIPTION_HISTOGRAM = '''
+    SELECT min_length // ? * ? AS min_length, SUM(stories)::BIGINT AS stories
+    FROM rollup_description_length
+    GROUP BY 1
+    ORDER BY 1
+'''
+
+# cell size is a multiple of GEO_CELL_DEG
+GEO_GRID = '''
+    SELECT
+        CAST(floor(cell_lon / ?) * ? AS INTEGER) AS lon,
+        CAST(floor(cell_lat / ?) * ? AS INTEGER) AS lat,
+        SUM(stories)::BIGINT AS stories
+    FROM rollup_geo
+    GROUP BY 1, 2
+    ORDER BY stories DESC, lon, lat
+'''
+
+AUTHORS_PAGE = '''
+    SELECT author, stories, first_created, last_created
+    FROM rollup_authors
+    ORDER BY stories DESC, author
+    LIMIT ? OFFSET ?
+'''
@@ -5,21 +5,78 @@ Usage: uvicorn server:app --reload
 Or: python server.py
 """
 
+import asyncio
+import hmac
+import ipaddress
 import json
-import re
-import duckdb
-from fastapi import FastAPI, HTTPException
+import os
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional
 from datetime import datetime
 import uvicorn
 import data_insert
+import dedupe
+import filter_lang
+import frame_store
+import fts
+import geo_index
+import db_pool
+import queries
+import query_log
+import reload
+import results
+import rollups
+import wire_format
 
 # DATA_FILE = "data/10_stories_preprocessed.json"
 DATA_FILE = "data/planet_stories_preprocessed.json"
+# persistent database, rebuilt only when DATA_FILE changes
+DB_FILE = "data/stories.duckdb"
+# frames of every story, built by preprocess.py next to DATA_FILE
+FRAMES_FILE = "data/planet_stories_frames.bin"
+# how often a running server checks DATA_FILE for changes (0: never)
+RELOAD_POLL_SECONDS = 10
+# if set, the /api/admin endpoints require it in the X-Admin-Token header;
+# if not, they only answer requests from this machine (loopback)
+ADMIN_TOKEN = os.environ.get("VIEWER_ADMIN_TOKEN")
+# most rows a listing returns per request (limit of /api/all and friends)
+MAX_PAGE_SIZE = 50000
+# queries slower than this are logged with their filter, SQL and params
+SLOW_QUERY_MS = float(os.environ.get("VIEWER_SLOW_QUERY_MS", "500"))
+# GET /api/admin/explain runs EXPLAIN ANALYZE; off unless asked for
+EXPLAIN_ENABLED = os.environ.get("VIEWER_ENABLE_EXPLAIN") == "1"
+
+
+def is_loopback(request: Request):
+    host = request.client.host if request.client else None
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_admin_token(request: Request, x_admin_token: Optional[str]):
+    """deny by default: a matching token, or a local request when none is set"""
+    if ADMIN_TOKEN:
+        given = (x_admin_token or "").encode()
+        if not hmac.compare_digest(given, ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="invalid admin token")
+    elif not is_loopback(request):
+        raise HTTPException(
+            status_code=403,
+            detail="admin endpoints are local-only unless VIEWER_ADMIN_TOKEN is set")
+
 
-app = FastAPI(title="Planet Stories API", version="1.0.0")
+async def tag_queries(request: Request):
+    """label the queries of a request with its route, for the query log"""
+    route = request.scope.get("route")
+    query_log.annotate(endpoint=route.path if route else request.url.path)
+
+
+app = FastAPI(title="Planet Stories API", version="1.0.0",
+              dependencies=[Depends(tag_queries)])
 
 # Enable CORS
 app.add_middleware(
@@ -30,118 +87,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global database connection
+# Global database connection and the cursor pool queries run on
 conn = None
+pool = None
 
-# Filter parsing utilities
+# (total, unique_authors) per normalized /api/all filter
+totals_cache = queries.TotalsCache()
 
+# per-query timing and the slow-query log
+query_stats = query_log.QueryLog(SLOW_QUERY_MS)
 
-class FilterParser:
-    """Parse filter string into SQL clauses"""
+# memory-mapped frame store, reopened when preprocess.py replaces it
+frames_reader = frame_store.FrameStoreReader(FRAMES_FILE)
 
-    @staticmethod
-    def parse_filter_string(filter_str: str) -> Tuple[List[str], List[Any], str]:
-        """
-        Parse filter string and return (where_clauses, params, remaining_text)
-
-        Supported filters:
-        - before:<date>
-        - after:<date>
-        - author:"<string>"
-        - desc_length:>N or desc_length:<N
-        - location:<lon>,<lat>,<distance_km>
-        - type:<compare/mp4>
-        """
-        where_clauses = []
-        params = []
+# whether free text uses the BM25 index (False: ILIKE fallback)
+fts_enabled = False
 
-        if not filter_str:
-            return where_clauses, params, ""
-
-        # Pattern for special filters
-        patterns = {
-            'before': r'before:(\S+)',
-            'after': r'after:(\S+)',
-            'author': r'author:"([^"]+)"',
-            'desc_length_gt': r'desc_length:>(\d+)',
-            'desc_length_lt': r'desc_length:<(\d+)',
-            'location': r'location:([-\d.]+),([-\d.]+),([\d.]+)',
-            'type': r'type:(compare|mp4)',
-        }
+# swaps in a changed DATA_FILE without a restart, and the task watching it
+reloader = None
+watch_task = None
 
-        text = filter_str
-
-        # Extract before: filter
-        match = re.search(patterns['before'], text)
-        if match:
-            date_str = match.group(1)
-            where_clauses.append("created < ?")
-            params.append(date_str)
-            text = text.replace(match.group(0), '')
-
-        # Extract after: filter
-        match = re.search(patterns['after'], text)
-        if match:
-            date_str = match.group(1)
-            where_clauses.append("created > ?")
-            params.append(date_str)
-            text = text.replace(match.group(0), '')
-
-        # Extract author: filter
-        match = re.search(patterns['author'], text)
-        if match:
-            author_str = match.group(1)
-            where_clauses.append("author ILIKE ?")
-            params.append(f'%{author_str}%')
-            text = text.replace(match.group(0), '')
-
-        # Extract desc_length:> filter
-        match = re.search(patterns['desc_length_gt'], text)
-        if match:
-            length = int(match.group(1))
-            where_clauses.append("LENGTH(COALESCE(description, '')) > ?")
-            params.append(length)
-            text = text.replace(match.group(0), '')
-
-        # Extract desc_length:< filter
-        match = re.search(patterns['desc_length_lt'], text)
-        if match:
-            length = int(match.group(1))
-            where_clauses.append("LENGTH(COALESCE(description, '')) < ?")
-            params.append(length)
-            text = text.replace(match.group(0), '')
-
-        # Extract location: filter
-        match = re.search(patterns['location'], text)
-        if match:
-            lon = float(match.group(1))
-            lat = float(match.group(2))
-            distance_km = float(match.group(3))
-            where_clauses.append("""
-                ST_Distance(
-                    ST_Point(?, ?),
-                    ST_Point(center_lon, center_lat)
-                ) / 1000 <= ?
-            """)
-            params.extend([lon, lat, distance_km])
-            text = text.replace(match.group(0), '')
-
-        # Extract type: filter
-        match = re.search(patterns['type'], text)
-        if match:
-            type_val = match.group(1)
-            if type_val == "compare":
-                where_clauses.append("format = ?")
-                params.append("raw")
-            elif type_val == "mp4":
-                where_clauses.append("format = ?")
-                params.append("mp4")
-            text = text.replace(match.group(0), '')
-
-        # Remaining text is free-text search
-        remaining_text = text.strip()
-
-        return where_clauses, params, remaining_text
+SORT_OPTIONS = ("created", "relevance")
 
 # Request models
 
@@ -150,6 +116,7 @@ class GeoFilter(BaseModel):
     lat: float
     lng: float
     radius: float = 50  # km
+    k: Optional[int] = None  # if set, only the k nearest stories within radius
 
 
 class DateFilter(BaseModel):
@@ -165,104 +132,175 @@ class SearchRequest(BaseModel):
     status: Optional[str] = None  # Filter by status
     format: Optional[str] = None  # Filter by format (mp4, raw, etc)
     public: Optional[bool] = None  # Filter by public status
+    sort: Optional[str] = None  # "relevance" ranks text matches by BM25 score
 
 
 @app.on_event("startup")
 async def startup():
     """Load data into DuckDB on startup"""
 
-    global conn
+    global conn, pool, fts_enabled, reloader, watch_task
     print("Loading data into DuckDB...")
 
-    conn = duckdb.connect(':memory:')
+    conn = data_insert.open_database(DB_FILE, DATA_FILE)
+
+    conn.execute(geo_index.HAVERSINE_MACRO)
+    # the index is normally built with the database; older databases get it now
+    fts_enabled = fts.load(conn) and (fts.has_index(conn) or fts.build_index(conn))
+    print(f"✓ Full-text search: {'BM25' if fts_enabled else 'ILIKE fallback'}")
+    index = geo_index.build(conn)
+    print(f"✓ Indexed {len(index)} story locations")
+    if not rollups.has_rollups(conn):
+        rollups.build(conn)
+    if not dedupe.has_duplicates_table(conn):
+        dedupe.build(conn)
 
-    data_insert.create_and_load_table(conn, DATA_FILE)
+    pool = db_pool.QueryPool(conn, query_log=query_stats)
 
-    conn.execute("INSTALL spatial")
-    conn.execute("LOAD spatial")
+    reloader = reload.DataReloader(
+        conn, DATA_FILE, fts_enabled, on_reload=[totals_cache.clear])
+    if RELOAD_POLL_SECONDS:
+        watch_task = asyncio.create_task(reloader.watch(RELOAD_POLL_SECONDS))
 
     count = conn.execute("SELECT COUNT(*) FROM stories").fetchone()[0]
     print(f"✓ Loaded {count} stories into DuckDB")
+    print(f"✓ Serving queries on {pool.workers} worker threads")
     print(f"✓ Server ready at http://localhost:8000")
     print(f"✓ API docs at http://localhost:8000/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the query workers and close the database"""
+    if watch_task is not None:
+        watch_task.cancel()
+    if pool is not None:
+        pool.close()
+    if conn is not None:
+        conn.close()
+
+
 @app.get("/")
 async def root():
     """API info"""
     return "this is an API. go to /docs for documentation."
 
 
+async def compile_listing(filter: str, sort: str, dedupe_stories: bool = False):
+    """
+    Compile an /api/all filter and sort to (where_sql, params, sort_expr, sort_params)
+    and tag the request's queries with the normalized filter
+    """
+    # Compile filter string (cached per filter shape); geo index searches are
+    # pure Python, so they run off the event loop
+    if filter_lang.has_geo(filter):
+        where_sql, params, free_text = await asyncio.to_thread(
+            filter_lang.compile_filter, filter, fts_enabled)
+    else:
+        where_sql, params, free_text = filter_lang.compile_filter(
+            filter, fts_enabled)
+    if dedupe_stories:
+        where_sql = f"({where_sql}) AND {dedupe.EXCLUDE_DUPLICATES}"
+    query_log.annotate(filter=filter_lang.normalize(filter), sort=sort,
+                       dedupe=dedupe_stories)
+
+    sort_expr, sort_params = queries.SORT_CREATED, []
+    if sort == "relevance" and free_text and fts_enabled:
+        sort_expr, sort_params = fts.SCORE_EXPR, [free_text]
+    return where_sql, params, sort_expr, sort_params
+
+
 @app.get("/api/all")
-async def get_all(limit: int = 100, offset: int = 0, filter: str = ""):
+async def get_all(request: Request, limit: int = Query(100, ge=0, le=MAX_PAGE_SIZE),
+                  offset: int = Query(0, ge=0), filter: str = "", sort: str = "created",
+                  dedupe: bool = False):
     """
     Get all stories with pagination and filtering
 
-    Filter syntax:
+    Filter syntax (see filter_lang.py; every filter can be repeated, grouped
+    with parentheses, combined with OR and negated with NOT or a leading -):
     - before:<date> - stories created before date (e.g., before:2025-10-01)
     - after:<date> - stories created after date (e.g., after:2025-09-01)
-    - author:"<name>" - filter by author containing name (e.g., author:"NASA")
+    - author:"<name>" - filter by author containing name
+      (e.g., author:"NASA" or author:NASA)
     - desc_length:>N - description longer than N chars (e.g., desc_length:>100)
     - desc_length:<N - description shorter than N chars (e.g., desc_length:<50)
-    - location:<lon>,<lat>,<distance_km> - stories within distance of location (e.g., location:-122.4,37.8,50)
+    - location:<lon>,<lat>,<distance_km> - stories within great-circle distance of
+      location (e.g., location:-122.4,37.8,50)
+    - nearest:<lon>,<lat>,<k> - the k stories nearest to location
+      (e.g., nearest:-122.4,37.8,20)
     - type:<compare/mp4> - filter by story type (e.g., type:mp4 or type:compare)
-    - Any remaining text searches in title, author, and description
+    - Any remaining text searches in title, author, and description (BM25 ranked,
+      stemmed, any of the terms)
 
     Example: filter=after:2025-10-01 author:"John" location:-122.4,37.8,50 type:mp4 climate
-    """
-    try:
-        # Parse filter string
-        where_clauses, params, free_text = FilterParser.parse_filter_string(
-            filter)
-
-        print(where_clauses, params, free_text)
+    Example: filter=(author:"NASA" OR author:"ESA") NOT type:mp4 wildfire
 
-        # Add free-text search if present
-        if free_text:
-            where_clauses.append(
-                "(title ILIKE ? OR author ILIKE ? OR description ILIKE ?)")
-            text_pattern = f'%{free_text}%'
-            params.extend([text_pattern, text_pattern, text_pattern])
+    sort: created (newest first, default) or relevance (BM25 score of the free text)
 
-        # Build WHERE clause
-        where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+    dedupe: hide near-duplicates (re-posts of the same title at the same place
+    and time, see dedupe.py); only the newest story of each group is listed
 
-        # Execute main query
-        query = f"""
-            SELECT id, title, author, description, created, updated,
-                   center_lat, center_lon,
-                   format, height, width, zoom, rate, my_framecount
-            FROM stories
-            WHERE {where_sql}
-            ORDER BY created DESC
-            LIMIT ? OFFSET ?
-        """
-        params.extend([limit, offset])
-        result = conn.execute(query, params).fetchdf()
+    Response format is chosen with the Accept header:
+    - application/json (default)
+    - application/vnd.planet.columnar+json - one array per column
+    - application/msgpack - columnar, binary (requires msgpack)
+    - application/vnd.apache.arrow.stream - Arrow IPC stream (requires pyarrow)
+    """
+    if sort not in SORT_OPTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"sort must be one of {', '.join(SORT_OPTIONS)}")
 
-        # Get total count with same filters
-        count_query = f"""
-            SELECT COUNT(*) FROM stories
-            WHERE {where_sql}
-        """
-        total = conn.execute(
-            count_query, params[:-2]).fetchone()[0]  # exclude limit/offset
+    try:
+        where_sql, params, sort_expr, sort_params = await compile_listing(
+            filter, sort, dedupe)
 
-        # Get unique authors with same filters
-        authors_query = f"""
-            SELECT COUNT(DISTINCT author) FROM stories
-            WHERE {where_sql} AND author IS NOT NULL
-        """
-        unique_authors = conn.execute(authors_query, params[:-2]).fetchone()[0]
+        # Totals only depend on the filter, so later pages reuse them
+        totals_key = queries.TotalsCache.key(where_sql, params)
+        generation = totals_cache.generation
+        cached = totals_cache.get(totals_key)
+        total, unique_authors = cached if cached is not None else (None, None)
 
-        return {
-            "stories": result.to_dict(orient='records'),
+        fmt = wire_format.negotiate_format(request.headers.get("accept"))
+        envelope = {
             "total": total,
             "unique_authors": unique_authors,
             "limit": limit,
             "offset": offset,
-            "filter": filter
+            "filter": filter,
+            "dedupe": dedupe
         }
+
+        if fmt in (wire_format.JSON, wire_format.ARROW_STREAM):
+            # Rows go from DuckDB to the body without pandas; streamed for large limits
+            as_json = fmt == wire_format.JSON
+            if cached is not None:
+                sql = queries.page_sql(where_sql, sort_expr, as_json)
+            else:
+                # Page, total and unique authors from one scan
+                sql = queries.page_with_totals_sql(where_sql, sort_expr, as_json)
+            response, total, unique_authors = await results.page_response(
+                pool, sql, params + sort_params + [limit, offset], envelope, fmt, limit)
+            if cached is None:
+                totals_cache.put(totals_key, total, unique_authors, generation)
+            return response
+
+        if cached is not None:
+            result = await pool.fetchdf(
+                queries.page_sql(where_sql, sort_expr),
+                params + sort_params + [limit, offset])
+        else:
+            combined = await pool.fetchdf(
+                queries.page_with_totals_sql(where_sql, sort_expr),
+                params + sort_params + [limit, offset])
+            result, total, unique_authors = queries.split_totals(combined)
+            totals_cache.put(totals_key, total, unique_authors, generation)
+            envelope.update(total=total, unique_authors=unique_authors)
+        return wire_format.columnar_response(result, envelope, fmt)
+    except filter_lang.FilterSyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Filter error: {str(e)}") from e
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Filter error: {str(e)}")
 
@@ -271,22 +309,124 @@ async def get_all(limit: int = 100, offset: int = 0, filter: str = ""):
 async def get_stats():
     """Get database statistics"""
     try:
-        total = conn.execute("SELECT COUNT(*) FROM stories").fetchone()[0]
-        authors = conn.execute(
-            "SELECT COUNT(DISTINCT author) FROM stories").fetchone()[0]
-        date_range = conn.execute("""
-            SELECT MIN(created) as min_date, MAX(created) as max_date 
-            FROM stories
-        """).fetchone()
+        total, authors, min_date, max_date = await pool.fetchone("""
+            SELECT total_stories, unique_authors, min_created, max_created
+            FROM rollup_summary
+        """)
 
         return {
             "total_stories": total,
             "unique_authors": authors,
             "date_range": {
-                "min": date_range[0],
-                "max": date_range[1]
+                "min": min_date,
+                "max": max_date
             }
         }
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+# Analytics (served from the rollup tables, see rollups.py)
+
+@app.get("/api/analytics/summary")
+async def get_analytics_summary():
+    """Catalogue totals, interesting (long description) count and database size"""
+    try:
+        (summary,) = await results.json_rows(pool, """
+            SELECT *, ? AS interesting_length,
+                   (SELECT database_size FROM pragma_database_size() LIMIT 1)
+                       AS database_size
+            FROM rollup_summary
+        """, [rollups.INTERESTING_LENGTH], timestamps=("min_created", "max_created"))
+        return Response(content=summary.encode(), media_type=wire_format.JSON)
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/api/analytics/timeline")
+async def get_analytics_timeline(interval: str = "day", start: Optional[str] = None,
+                                 end: Optional[str] = None):
+    """
+    Stories (and interesting stories) per day, week, month or year.
+    start/end: optional ISO dates, start inclusive, end exclusive
+    """
+    if interval not in rollups.INTERVALS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"interval must be one of {', '.join(rollups.INTERVALS)}")
+    try:
+        buckets = await results.json_rows(
+            pool, rollups.timeline_sql(interval), [start, start, end, end])
+        return results.json_response(
+            {"interval": interval}, buckets=results.json_array(buckets))
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/api/analytics/description-lengths")
+async def get_analytics_description_lengths(bucket: int = rollups.DESCRIPTION_BUCKET):
+    """Histogram of description lengths; bucket is a multiple of 50 chars"""
+    if bucket <= 0 or bucket % rollups.DESCRIPTION_BUCKET:
+        raise HTTPException(
+            status_code=400,
+            detail="bucket must be a positive multiple of "
+                   f"{rollups.DESCRIPTION_BUCKET}")
+    try:
+        histogram = await results.json_rows(
+            pool, rollups.DESCRIPTION_HISTOGRAM, [bucket, bucket])
+        interesting, median = await pool.fetchone(
+            "SELECT interesting, median_description_length FROM rollup_summary")
+        return results.json_response({
+            "bucket": bucket,
+            "interesting_length": rollups.INTERESTING_LENGTH,
+            "interesting": interesting,
+            "median": median,
+        }, histogram=results.json_array(histogram))
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/api/analytics/authors")
+async def get_analytics_authors(limit: int = Query(50, ge=0, le=MAX_PAGE_SIZE),
+                                offset: int = Query(0, ge=0)):
+    """Post counts per author, most prolific first"""
+    try:
+        authors = await results.json_rows(
+            pool, rollups.AUTHORS_PAGE, [limit, offset],
+            timestamps=("first_created", "last_created"))
+        (total,) = await pool.fetchone("SELECT unique_authors FROM rollup_summary")
+        return results.json_response({
+            "total": total,
+            "limit": limit,
+            "offset": offset
+        }, authors=results.json_array(authors))
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/api/analytics/geo")
+async def get_analytics_geo(cell: int = rollups.GEO_CELL_DEG):
+    """Story counts per lon/lat grid cell (south-west corner, cell degrees wide)"""
+    if cell <= 0 or cell % rollups.GEO_CELL_DEG or cell > 180:
+        raise HTTPException(
+            status_code=400,
+            detail="cell must be a whole number of degrees between 1 and 180")
+    try:
+        cells = await results.json_rows(
+            pool, rollups.GEO_GRID, [cell, cell, cell, cell])
+        return results.json_response({"cell": cell}, cells=results.json_array(cells))
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -296,25 +436,27 @@ async def get_schema():
     """Get the database schema with column types and sample data"""
     try:
         # Get column info
-        schema = conn.execute("""
+        columns = await results.json_rows(pool, """
             SELECT column_name, data_type, is_nullable
-            FROM information_schema.columns 
+            FROM information_schema.columns
             WHERE table_name = 'stories'
             ORDER BY ordinal_position
-        """).fetchdf()
+        """)
 
         # Get row count
-        count = conn.execute("SELECT COUNT(*) FROM stories").fetchone()[0]
+        (count,) = await pool.fetchone("SELECT COUNT(*) FROM stories")
 
         # Get sample row
-        sample = conn.execute("SELECT * FROM stories LIMIT 1").fetchdf()
+        sample = await results.json_rows(pool, "SELECT * FROM stories LIMIT 1",
+                                          timestamps=("created", "updated"))
 
-        return {
+        return results.json_response({
             "table_name": "stories",
             "row_count": count,
-            "columns": schema.to_dict(orient='records'),
-            "sample_row": sample.to_dict(orient='records')[0] if len(sample) > 0 else None
-        }
+        }, columns=results.json_array(columns),
+            sample_row=sample[0] if sample else "null")
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -332,6 +474,9 @@ async def search(request: SearchRequest):
     2. Text + geo:
     {"text": "deforestation", "geo": {"lat": -3.0, "lng": -60.0, "radius": 100}}
 
+    2b. 10 nearest stories within 500 km:
+    {"geo": {"lat": -3.0, "lng": -60.0, "radius": 500, "k": 10}}
+
     3. Date range + author:
     {"date": {"start": "2025-01-01", "end": "2025-12-31"}, "author": "NASA"}
 
@@ -352,29 +497,35 @@ async def search(request: SearchRequest):
 
         # Text search in title, author, description
         if request.text:
-            where_clauses.append(
-                "(title ILIKE ? OR author ILIKE ? OR description ILIKE ?)")
-            text_pattern = f'%{request.text}%'
-            params.extend([text_pattern, text_pattern, text_pattern])
+            text_clause, text_params = fts.text_filter(request.text, fts_enabled)
+            where_clauses.append(text_clause)
+            params.extend(text_params)
 
-        # Geographic filter
+        # Geographic filter: ids from the grid index (searched off the event
+        # loop), or for wide radii a SQL bounding box; exact distance in SQL
         geo_select = ""
+        select_params = []
         if request.geo:
-            where_clauses.append("""
-                ST_Distance(
-                    ST_Point(?, ?),
-                    ST_Point(center_lon, center_lat)
-                ) / 1000 <= ?
-            """)
-            params.extend(
-                [request.geo.lng, request.geo.lat, request.geo.radius])
+            lng, lat, radius = request.geo.lng, request.geo.lat, request.geo.radius
+            geo = geo_index.get_index()
+            if request.geo.k:
+                hits = await asyncio.to_thread(geo.nearest, lng, lat, request.geo.k)
+                hits = [h for h in hits if h[1] <= radius]
+            elif radius > geo_index.SQL_RADIUS_KM:
+                hits = None
+            else:
+                hits = await asyncio.to_thread(geo.within, lng, lat, radius)
+            if hits is None:
+                where_clauses.append(geo_index.RADIUS_CLAUSE)
+                params.extend(geo_index.radius_params(lng, lat, radius))
+            else:
+                where_clauses.append(filter_lang.GEO_IDS_CLAUSE)
+                params.append([story_id for story_id, _ in hits])
             # Add distance to select for sorting
-            geo_select = f""",
-                ST_Distance(
-                    ST_Point({request.geo.lng}, {request.geo.lat}),
-                    ST_Point(center_lon, center_lat)
-                ) / 1000 as distance_km
+            geo_select = """,
+                haversine_km(?, ?, center_lon, center_lat) as distance_km
             """
+            select_params = [request.geo.lng, request.geo.lat]
 
         # Date range filter
         if request.date:
@@ -403,8 +554,12 @@ async def search(request: SearchRequest):
         # Build WHERE clause
         where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
 
-        # Order by distance if geo search, otherwise by date
-        order_by = "distance_km" if request.geo else "created DESC"
+        # Order by distance if geo search, relevance if asked, otherwise by date
+        order_by, order_params = "created DESC", []
+        if request.geo:
+            order_by = "distance_km"
+        elif request.sort == "relevance" and request.text and fts_enabled:
+            order_by, order_params = f"{fts.SCORE_EXPR} DESC", [request.text]
 
         # Execute query
         query = f"""
@@ -417,12 +572,14 @@ async def search(request: SearchRequest):
             LIMIT 100
         """
 
-        result = conn.execute(query, params).fetchdf()
+        rows = await results.json_rows(
+            pool, query, select_params + params + order_params,
+            timestamps=("created", "updated"))
 
-        return {
-            "count": len(result),
-            "results": result.to_dict(orient='records')
-        }
+        return results.json_response({"count": len(rows)},
+                                     results=results.json_array(rows))
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -431,22 +588,134 @@ async def search(request: SearchRequest):
 async def get_story(story_id: str):
     """Get a single story by ID"""
     try:
-        result = conn.execute("""
-            SELECT id, title, author, description, created, updated,
-                   center_lat, center_lon,
-                   format, height, width, zoom, rate, my_framecount
+        rows = await results.json_rows(pool, f"""
+            SELECT {queries.STORY_COLUMNS}
             FROM stories
             WHERE id = ?
-        """, [story_id]).fetchdf()
+        """, [story_id], timestamps=("created", "updated"))
 
-        if len(result) == 0:
+        if not rows:
             raise HTTPException(status_code=404, detail="Story not found")
 
-        return result.to_dict(orient='records')[0]
+        return Response(content=rows[0].encode(), media_type=wire_format.JSON)
     except HTTPException:
         raise
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.get("/api/story/{story_id}/frames")
+async def get_story_frames(story_id: str, offset: int = 0, limit: Optional[int] = None):
+    """
+    Frames of a story in their original order: index, acquisition date and
+    the remaining frame fields, served from the memory-mapped frame store.
+    offset/limit select a range of frames (default: all of them)
+    """
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(
+            status_code=400, detail="offset and limit must not be negative")
+
+    store = frames_reader.get()
+    if store is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Frame store not available (run preprocess.py)")
+
+    result = store.frames(story_id, offset, None if limit is None else offset + limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+
+    total, frames = result
+    return {
+        "id": story_id,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "frames": frames
+    }
+
+
+@app.post("/api/admin/reload")
+async def reload_data(request: Request, mode: str = "merge",
+                      x_admin_token: Optional[str] = Header(None)):
+    """
+    Load DATA_FILE into a staging table and swap it in while queries keep
+    being served. The server also does this on its own when the file changes.
+
+    mode: merge (default) - only rows whose id is new, changed or removed
+          full - replace the whole table
+    """
+    check_admin_token(request, x_admin_token)
+    if mode not in reload.MODES:
+        raise HTTPException(
+            status_code=400, detail=f"mode must be one of {', '.join(reload.MODES)}")
+    try:
+        return await reloader.reload_async(mode)
+    except reload.ReloadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {str(e)}") from e
+
+
+@app.get("/api/admin/reload")
+async def reload_status(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Whether a reload is running, and the result of the last one"""
+    check_admin_token(request, x_admin_token)
+    return {
+        "running": reloader.running,
+        "loaded": reloader.loaded_signature(),
+        "last": reloader.last_result,
+    }
+
+
+@app.get("/api/admin/queries")
+async def get_query_stats(request: Request,
+                          x_admin_token: Optional[str] = Header(None)):
+    """Query timing per endpoint and the most recent slow queries"""
+    check_admin_token(request, x_admin_token)
+    return query_stats.stats()
+
+
+@app.get("/api/admin/explain")
+async def explain_listing(request: Request, filter: str = "", sort: str = "created",
+                          limit: int = Query(100, ge=0, le=MAX_PAGE_SIZE),
+                          offset: int = Query(0, ge=0), dedupe: bool = False,
+                          x_admin_token: Optional[str] = Header(None)):
+    """
+    DuckDB's EXPLAIN ANALYZE profile of the /api/all query for a filter (the
+    first-page query, which also computes the totals). Only available when
+    the server runs with VIEWER_ENABLE_EXPLAIN=1.
+    """
+    if not EXPLAIN_ENABLED:
+        raise HTTPException(
+            status_code=404, detail="EXPLAIN is disabled (set VIEWER_ENABLE_EXPLAIN=1)")
+    check_admin_token(request, x_admin_token)
+    if sort not in SORT_OPTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"sort must be one of {', '.join(SORT_OPTIONS)}")
+
+    try:
+        where_sql, params, sort_expr, sort_params = await compile_listing(
+            filter, sort, dedupe)
+        sql = queries.page_with_totals_sql(where_sql, sort_expr)
+        all_params = params + sort_params + [limit, offset]
+        rows = await pool.run(
+            lambda cur: cur.execute("EXPLAIN ANALYZE " + sql, all_params).fetchall())
+        return {
+            "filter": filter_lang.normalize(filter),
+            "sql": " ".join(sql.split()),
+            "params": [query_log.loggable(p) for p in all_params],
+            "plan": "\n".join(row[-1] for row in rows)
+        }
+    except filter_lang.FilterSyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Filter error: {str(e)}") from e
+    except db_pool.QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
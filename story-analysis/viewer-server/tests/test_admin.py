@@ -0,0 +1,31 @@
+import pytest
+from fastapi import HTTPException, Request
+
+import server
+
+
+def request_from(host):
+    return Request({"type": "http", "client": (host, 50000), "headers": []})
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1", "::1"])
+def test_no_token_allows_local_requests(monkeypatch, host):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", None)
+    server.check_admin_token(request_from(host), None)
+
+
+@pytest.mark.parametrize("host", ["203.0.113.7", "testclient"])
+def test_no_token_denies_remote_requests(monkeypatch, host):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", None)
+    with pytest.raises(HTTPException) as e:
+        server.check_admin_token(request_from(host), None)
+    assert e.value.status_code == 403
+
+
+def test_token_is_required_even_locally(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    server.check_admin_token(request_from("203.0.113.7"), "secret")
+    for token in (None, "wrong"):
+        with pytest.raises(HTTPException) as e:
+            server.check_admin_token(request_from("127.0.0.1"), token)
+        assert e.value.status_code == 403
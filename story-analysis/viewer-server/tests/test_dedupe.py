@@ -0,0 +1,56 @@
+import zlib
+
+import duckdb
+
+import dedupe
+from dedupe import BINS, DedupeIndex, signature, similarity, to_seconds
+
+DAY = 86400
+
+
+def test_signature_matches_the_backend():
+    # fastapi_backend/tests/test_dedupe.py pins the same value
+    sig = signature("Wildfire near Lyon, 2023", "Smoke over the Rhone valley")
+    assert sig[:4] == (36221080, 35064922, 17688677, 16556889)
+    assert zlib.crc32(repr(sig).encode()) == 2304290133
+
+
+def test_signature_ignores_case_punctuation_and_numbers():
+    assert signature("Wildfire near Lyon, 2023") == signature("WILDFIRE near lyon 2024")
+    assert len(signature("Wildfire")) == BINS
+    assert signature(None) is None
+    assert similarity(signature("Glacier retreat"), signature("Glacier retreat")) == 1.0
+
+
+def test_to_seconds():
+    assert to_seconds("1970-01-02T00:00:00Z") == DAY
+    assert to_seconds(5) == 5.0
+    assert to_seconds("not a date") is None
+
+
+def test_merges_reposts_and_keeps_the_newest():
+    index = DedupeIndex()
+    title = "Flooding along the Po river delta"
+    index.add("old", signature(title), 12.0, 45.0, 0)
+    index.add("new", signature(title + " 2024"), 12.05, 45.02, 10 * DAY)
+    index.add("far", signature(title), 20.0, 45.0, 5 * DAY)
+    assert index.duplicates() == {"old": "new"}
+    assert index.clusters() == [["new", "old"]]
+
+
+def test_build_stores_duplicates():
+    conn = duckdb.connect()
+    conn.execute("""
+        CREATE TABLE stories AS SELECT * FROM (VALUES
+            ('old', 'Wildfire near Marseille 2023', NULL, 5.4, 43.3,
+             TIMESTAMP '2025-03-01 10:00:00'),
+            ('new', 'Wildfire near Marseille 2024', NULL, 5.4, 43.3,
+             TIMESTAMP '2025-03-20 10:00:00'),
+            ('other', 'Desert bloom in the Atacama', NULL, -70.0, -24.0,
+             TIMESTAMP '2025-03-10 10:00:00')
+        ) t(id, title, description, center_lon, center_lat, created)
+    """)
+    dedupe.build(conn)
+    assert dedupe.has_duplicates_table(conn)
+    rows = conn.execute(f"SELECT * FROM {dedupe.DUPLICATES_TABLE}").fetchall()
+    assert [row[:2] for row in rows] == [("old", "new")]
@@ -0,0 +1,36 @@
+import pytest
+
+import filter_lang
+
+
+@pytest.mark.parametrize("filter_str, message", [
+    ("(type:mp4", "missing ')'"),
+    ("type:mp4)", "unexpected ')'"),
+    ("()", "expected a filter or search text"),
+    ("OR wildfire", "expected a filter or search text"),
+    ("wildfire OR", "expected a filter or search text"),
+    ("NOT", "NOT needs an operand"),
+    ("NOT OR wildfire", "NOT needs an operand"),
+    ('"unclosed', "unexpected '\"' at 0"),
+    ("type:gif", "invalid value for type: 'gif'"),
+    ("desc_length:5", "invalid value for desc_length: '5'"),
+    ("location:1,2", "invalid value for location: '1,2'"),
+    ("nearest:1,2,3.5", "invalid value for nearest: '1,2,3.5'"),
+])
+def test_syntax_errors(filter_str, message):
+    with pytest.raises(filter_lang.FilterSyntaxError) as excinfo:
+        filter_lang.compile_filter(filter_str, False)
+    assert str(excinfo.value) == message
+
+
+def test_unknown_keys_are_text():
+    assert filter_lang.parse("https://example.com") == ("text", "https://example.com")
+
+
+def test_empty_filter_matches_all():
+    assert filter_lang.compile_filter("", False) == (filter_lang.MATCH_ALL, [], "")
+
+
+def test_normalize():
+    assert filter_lang.normalize('author:NASA -type:mp4 (fire OR flood)') == \
+        'author:NASA AND NOT type:mp4 AND ("fire" OR "flood")'
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import duckdb
+import pytest
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import data_insert
+import db_pool
+import server
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    conn = duckdb.connect()
+    conn.execute(data_insert.TABLE_CREATE_STATEMENT.format(table="stories"))
+    conn.execute("""
+        INSERT INTO stories (id, title, author, created, public, description)
+        VALUES ('a', 'No description', 'NASA', TIMESTAMP '2025-10-31 20:43:57.039',
+                true, NULL)
+    """)
+    pool = db_pool.QueryPool(conn, workers=1)
+    monkeypatch.setattr(server, "pool", pool)
+    yield pool
+    pool.close()
+    conn.close()
+
+
+def body(result):
+    """the JSON a handler's result is sent as"""
+    if not isinstance(result, Response):
+        result = JSONResponse(jsonable_encoder(result))
+    return json.loads(result.body)
+
+
+@pytest.mark.parametrize("request_body", [{}, {"public": True}])
+def test_search_keeps_null_description(pool, request_body):
+    result = body(asyncio.run(server.search(server.SearchRequest(**request_body))))
+    assert result["count"] == 1
+    story = result["results"][0]
+    assert story["description"] is None
+    assert story["created"] == "2025-10-31T20:43:57.039000"
+
+
+def test_story_keeps_null_fields(pool):
+    story = body(asyncio.run(server.get_story("a")))
+    assert story["id"] == "a"
+    assert story["description"] is None
+    assert story["rate"] is None
+
+
+class TimingOutPool:
+    async def run(self, *args, **kwargs):
+        raise db_pool.QueryTimeout("query exceeded its timeout")
+
+    async def fetchone(self, *args, **kwargs):
+        raise db_pool.QueryTimeout("query exceeded its timeout")
+
+
+@pytest.mark.parametrize("call", [
+    lambda: server.get_story("a"),
+    server.get_schema,
+    lambda: server.search(server.SearchRequest()),
+])
+def test_timeouts_are_504(monkeypatch, call):
+    monkeypatch.setattr(server, "pool", TimingOutPool())
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(call())
+    assert e.value.status_code == 504
+
+
+@pytest.mark.parametrize("query", [
+    "limit=-1", "offset=-1", f"limit={server.MAX_PAGE_SIZE + 1}"])
+def test_listing_bounds_are_validated(query):
+    # rejected before the handler runs, so no database is needed
+    assert TestClient(server.app).get(f"/api/all?{query}").status_code == 422
@@ -0,0 +1,101 @@
+'''
+content-negotiated response formats for bulk story listing.
+- application/json (default): list of row objects
+- application/vnd.planet.columnar+json: one array per column
+- application/msgpack: same columnar layout, binary (needs msgpack)
+- application/vnd.apache.arrow.stream: arrow IPC stream (needs pyarrow)
+'''
+
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.planet.columnar+json"
+MSGPACK = "application/msgpack"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+MEDIA_TYPES = {
+    JSON: JSON,
+    COLUMNAR_JSON: COLUMNAR_JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    ARROW_STREAM: ARROW_STREAM,
+}
+
+
+def supported_formats():
+    formats = [JSON, COLUMNAR_JSON]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    if pyarrow is not None:
+        formats.append(ARROW_STREAM)
+    return formats
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Pick the response format from an Accept header, defaulting to JSON"""
+    if not accept:
+        return JSON
+
+    supported = supported_formats()
+    best, best_q = JSON, 0.0
+    for part in accept.split(","):
+        token, _, params = part.strip().partition(";")
+        fmt = MEDIA_TYPES.get(token.strip().lower())
+        if fmt is None or fmt not in supported:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def columnar_response(df, envelope: Dict[str, Any], fmt: str,
+                      rows_key: str = "stories") -> Response:
+    """
+    Encode a result DataFrame plus its envelope fields (total, limit, ...) in a
+    compact format. Rows are sent as {"columns": [...], rows_key: {col: [...]}}
+    instead of one object per row, so column names are sent once.
+    """
+    if fmt == ARROW_STREAM:
+        table = pyarrow.Table.from_pandas(df, preserve_index=False)
+        # envelope travels in the schema metadata so the body stays a plain IPC stream
+        table = table.replace_schema_metadata(
+            {"envelope": json.dumps(jsonable_encoder(envelope))})
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM,
+                        headers={"Vary": "Accept"})
+
+    body = dict(envelope)
+    body["columns"] = list(df.columns)
+    # NaN (missing numbers) is not valid JSON/msgpack null
+    body[rows_key] = df.astype(object).where(df.notna(), None).to_dict(orient="list")
+    body = jsonable_encoder(body)
+
+    if fmt == MSGPACK:
+        content = msgpack.packb(body, use_bin_type=True)
+    else:
+        content = json.dumps(body, separators=(",", ":")).encode()
+    return Response(content=content, media_type=fmt, headers={"Vary": "Accept"})